@@ -0,0 +1,175 @@
+"""
+Client-side overhead microbenchmarks for jrivermcws
+
+Measures the library's own costs without a network: command resolution,
+MCC name lookup, request preparation through Client.request (sent to a
+transport adapter returning a canned response) and parsing of synthetic MPL
+payloads with Result.json, parsed, parse_json, iter_items and table.
+
+    python benchmarks/overhead.py [--sizes 10,1000,100000] [--output results.json]
+    python benchmarks/overhead.py --compare before.json
+
+Results are written as JSON, one record per benchmark with the seconds per
+call, so runs from different commits can be compared with --compare.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import timeit
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+from requests.adapters import BaseAdapter  # noqa: E402
+from jrivermcws import cmds, mcc  # noqa: E402
+from jrivermcws.api import Client, resolve_command  # noqa: E402
+from jrivermcws.models import Result, build_response  # noqa: E402
+
+default_sizes = [10, 100, 1000, 10000, 100000, 1000000]
+
+_response = (b'<?xml version="1.0" encoding="UTF-8" standalone="yes" ?>\n'
+             b'<Response Status="OK">\n<Item Name="State">2</Item>\n<Item Name="Name">Song</Item>\n</Response>')
+
+
+class CannedAdapter(BaseAdapter):
+    """Answers every request with the same response without touching the network"""
+
+    def send(self, request, **kwargs):
+        return build_response(request.url, 200, 'OK', {'Content-Type': 'text/xml'}, 'utf-8', _response)
+
+    def close(self):
+        pass
+
+
+def mpl(n):
+    """A synthetic MPL of n items with typical fields"""
+    item = ('<Item>\n<Field Name="Key">{0}</Field>\n<Field Name="Filename">/music/Artist {1}/Album {2}/{0:02d} Track.flac</Field>\n'
+            '<Field Name="Name">Track {0}</Field>\n<Field Name="Artist">Artist {1}</Field>\n<Field Name="Album">Album {2}</Field>\n'
+            '<Field Name="Genre">Rock; Alternative</Field>\n<Field Name="Date">{3}</Field>\n<Field Name="Bitrate">{4}</Field>\n'
+            '<Field Name="Duration">{5:.6f}</Field>\n<Field Name="Track #">{6}</Field>\n<Field Name="Rating">{7}</Field>\n'
+            '<Field Name="Media Type">Audio</Field>\n</Item>\n')
+    parts = ['<?xml version="1.0" encoding="UTF-8" standalone="yes" ?>\n<MPL Version="2.0" Title="MCWS - Files" PathSeparator="/">\n']
+    parts.extend(item.format(i, i % 997, i % 4001, 30000 + i % 15000, 128 + i % 1200, 60 + (i % 600) * 0.5, i % 20 + 1, i % 6)
+                 for i in range(n))
+    parts.append('</MPL>\n')
+    return ''.join(parts).encode('utf-8')
+
+
+def values(n):
+    """A synthetic Library/Values response of n items"""
+    parts = ['<?xml version="1.0" encoding="UTF-8" standalone="yes" ?>\n<Response Status="OK">\n']
+    parts.extend('<Item>Artist {}</Item>\n'.format(i) for i in range(n))
+    parts.append('</Response>\n')
+    return ''.join(parts).encode('utf-8')
+
+
+def measure(name, fn, size=None, min_time=0.2):
+    """Times fn, repeating it until min_time has elapsed, and returns a result record"""
+    timer = timeit.Timer(fn)
+    number, elapsed = timer.autorange()
+    repeat = max(1, min(5, int(min_time / elapsed) if elapsed else 5))
+    best = min([elapsed] + timer.repeat(repeat=repeat - 1, number=number)) / number if repeat > 1 else elapsed / number
+    record = {'name': name, 'size': size, 'number': number, 'seconds': best}
+    if size:
+        record['per_item_us'] = best / size * 1e6
+    print('{:<32} {:>9} {:>12.3f} us'.format(name, size or '', best * 1e6), file=sys.stderr)
+    return record
+
+
+def lookup_benchmarks():
+    details = cmds.details
+    return [
+        measure('cmds.categoryof', lambda: cmds.categoryof('Info')),
+        measure('cmds.lookup', lambda: cmds.lookup('Info', 'Playback')),
+        measure('cmds.details', lambda: details['Playback']['Info']),
+        measure('mcc.mcc_codes', lambda: mcc.mcc_codes['MCC_VOLUME_UP']),
+        measure('resolve_command', lambda: resolve_command('Info', 'Playback', Zone=-1)),
+        measure('resolve_command.mcc', lambda: resolve_command('MCC', Command='MCC_VOLUME_UP', Parameter=10)),
+    ]
+
+
+def request_benchmarks():
+    c = Client(token='benchmark')
+    c.session.mount('http://', CannedAdapter())
+    return [
+        measure('Client.request', lambda: c.request('Info', cat='Playback', Zone=-1)),
+        measure('Client.request.search', lambda: c.request('Search', cat='Files', Query='[Artist]=[Radio Head] [Rating]=>3')),
+    ]
+
+
+def parse_benchmarks(sizes):
+    records = []
+    for n in sizes:
+        body = mpl(n)
+
+        def result(body=body):
+            return Result('Files', 'Search', build_response('', 200, 'OK', {}, 'utf-8', body))
+
+        records.append(measure('Result.json', lambda: result().json(), n))
+        # parsed() does not recognise MPL documents, so parse_json is timed on the items directly
+        items = result().json()['MPL']['Item']
+        records.append(measure('Result.parse_json', lambda: Result().parse_json(items), n))
+        records.append(measure('Result.iter_items', lambda: sum(1 for _ in result().iter_items()), n))
+        records.append(measure('Result.table', lambda: result().table(), n))
+
+        body = values(n)
+        records.append(measure('Result.parsed.values',
+                               lambda: Result('Library', 'Values', build_response('', 200, 'OK', {}, 'utf-8', body)).parsed(), n))
+    return records
+
+
+def commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=root, stderr=subprocess.DEVNULL, universal_newlines=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old, new):
+    """Prints the ratio of new to old timings for matching benchmarks"""
+    before = {(r['name'], r['size']): r['seconds'] for r in old['results']}
+    print('{:<32} {:>9} {:>12} {:>12} {:>8}'.format('benchmark', 'size', 'before us', 'after us', 'ratio'), file=sys.stderr)
+    for r in new['results']:
+        key = (r['name'], r['size'])
+        if key in before:
+            print('{:<32} {:>9} {:>12.3f} {:>12.3f} {:>8.2f}'.format(
+                r['name'], r['size'] or '', before[key] * 1e6, r['seconds'] * 1e6, r['seconds'] / before[key]), file=sys.stderr)
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    p.add_argument('--sizes', default=','.join(str(s) for s in default_sizes), help='Comma separated MPL item counts')
+    p.add_argument('--output', help='Write the JSON results to a file instead of stdout')
+    p.add_argument('--compare', help='JSON results of an earlier run to compare against')
+    opts = p.parse_args()
+
+    sizes = [int(s) for s in opts.sizes.split(',') if s]
+    results = lookup_benchmarks() + request_benchmarks() + parse_benchmarks(sizes)
+    doc = {
+        'meta': {
+            'commit': commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        },
+        'results': results,
+    }
+
+    if opts.output:
+        with open(opts.output, 'w') as f:
+            json.dump(doc, f, indent=1)
+    else:
+        print(json.dumps(doc, indent=1))
+
+    if opts.compare:
+        with open(opts.compare) as f:
+            compare(json.load(f), doc)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Startup time regression benchmark for jriverctl
+
+Measures the time to import the CLI and resolve a command, which is
+everything jriverctl does before opening a connection, in fresh interpreters
+and subtracts the time of an empty interpreter. Fails if the overhead
+exceeds --max-ms or if requests gets imported before a Client is created.
+
+    python benchmarks/startup.py [--runs 20] [--max-ms 25]
+
+Prints the results as JSON.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+startup = (
+    "import sys\n"
+    "import jrivermcws.__main__\n"
+    "from jrivermcws.api import resolve_command\n"
+    "resolve_command('Next', 'Playback')\n"
+    "resolve_command('MCC', Command='MCC_NEXT')\n"
+    "print(int('requests' in sys.modules))\n"
+)
+
+
+def run(code, runs):
+    env = dict(os.environ, PYTHONPATH=root)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    times = []
+    out = ''
+    for _ in range(runs):
+        start = time.perf_counter()
+        out = subprocess.run([sys.executable, '-c', code], env=env, check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times), out.strip()
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    p.add_argument('--runs', type=int, default=20)
+    p.add_argument('--max-ms', type=float, default=25.0, help='Maximum allowed overhead over an empty interpreter')
+    opts = p.parse_args()
+
+    # Warm up once so bytecode is compiled and cached
+    run(startup, 1)
+    empty, _ = run('pass', opts.runs)
+    cli, imported = run(startup, opts.runs)
+
+    result = {
+        'benchmark': 'startup',
+        'runs': opts.runs,
+        'interpreter_ms': round(empty, 2),
+        'cli_ms': round(cli, 2),
+        'overhead_ms': round(cli - empty, 2),
+        'max_ms': opts.max_ms,
+        'requests_imported': imported == '1',
+    }
+    result['ok'] = result['overhead_ms'] <= opts.max_ms and not result['requests_imported']
+    print(json.dumps(result))
+    return 0 if result['ok'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
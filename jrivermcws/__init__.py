@@ -1,3 +1,23 @@
-from .api import request, authenticate
-from . import cmds
+import importlib
 from . import exceptions
+
+# The api and command tables are loaded on first use so that importing the
+# package, e.g. for jriverctl, stays fast
+_api = ('request', 'authenticate', 'Client', 'get_client')
+
+
+def __getattr__(name):
+    if name in _api:
+        return getattr(importlib.import_module('.api', __name__), name)
+    if not name.startswith('_'):
+        # Submodules such as jr.api, jr.cmds and jr.models, imported on first access
+        try:
+            return importlib.import_module('.' + name, __name__)
+        except ModuleNotFoundError as e:
+            if e.name != '{}.{}'.format(__name__, name):
+                raise
+    raise AttributeError("module '{}' has no attribute '{}'".format(__name__, name))
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_api) + ['cmds'])
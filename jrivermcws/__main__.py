@@ -9,10 +9,14 @@ def setup_parser():
         argument_default=False,)
     p.add_argument('cmd', nargs='?')
     p.add_argument(*['-a', '--auth'], nargs=2, metavar=('USERNAME', 'PASSWORD'), type=str, help='Authentication username and password')
-    p.add_argument(*['-s', '--server'], nargs=2, metavar=('SERVER'), type=str, help='The http url of the mcws server')
+    p.add_argument(*['-s', '--server'], metavar='SERVER', type=str, help='The http url of the mcws server')
     p.add_argument(*['-m', '--mcc'], nargs=2, metavar=('COMMAND', 'PARAMETER'), help='Send to mcc handler')
     p.add_argument(*['-p', '--print'], action='store_true', default=False, help='Print results')
     p.add_argument(*['-c', '--current'], action='store_true', default=False, help='Print the current track information')
+    p.add_argument('--agent', action='store_true', default=False, help='Run in the foreground as an agent that later calls are forwarded to')
+    p.add_argument(*['-b', '--batch'], metavar='FILE', type=str, help="Run the commands in FILE ('-' for stdin), one per line, printing results as JSON lines")
+    p.add_argument(*['-j', '--jobs'], metavar='N', type=int, default=1, help='Run up to N batch commands at once')
+    p.add_argument('--no-agent', action='store_true', default=False, help='Send commands directly even if an agent is running')
     return p
 
 
@@ -20,14 +24,58 @@ def main():
     parser = setup_parser()
     opts = parser.parse_args()
 
+    if opts.agent:
+        import signal
+        from .agent import Agent
+        # Exit normally on SIGTERM so the socket is removed
+        signal.signal(signal.SIGTERM, lambda *args: sys.exit(0))
+        try:
+            Agent().serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return
+
+    server = opts.server or default_server
+    username, password = opts.auth or (default_username, default_password)
+
+    if opts.batch:
+        from . import batch
+        f = sys.stdin if opts.batch == '-' else open(opts.batch)
+        try:
+            with Client(server, username, password, pool_size=max(opts.jobs, 1)) as c:
+                failed = batch.run(f, c.request, jobs=opts.jobs)
+        finally:
+            if f is not sys.stdin:
+                f.close()
+        if failed:
+            sys.exit(1)
+        return
+
+    conn = None
+    if not opts.no_agent:
+        from . import agent
+        try:
+            conn = agent.connect()
+        except PermissionError as e:
+            print('Not using the agent:', e, file=sys.stderr)
+
+    if conn is not None:
+        # The agent holds an authenticated session, so skip the checks
+        try:
+            run(opts, lambda cmd, cat=None, **kwargs: conn.request(cmd, cat, server=server, username=username, password=password, **kwargs))
+        except FailedAuthenticationException as e:
+            print("Failed to authenticate connection to JRiver\n", e)
+        except ConnectionError as e:
+            print("Could not establish connection to JRiver. Verify MCWS is running.\n", e)
+        finally:
+            conn.close()
+        return
+
     token = None
     if opts.auth:
         username, password = opts.auth
         try:
-            if opts.server:
-                token = authenticate(username, password, opts.server)
-            else:
-                token = authenticate(username, password)
+            token = authenticate(username, password, server)
         except FailedAuthenticationException as e:
             print("Failed to authenticate connection to JRiver\n", e)
             return
@@ -36,27 +84,32 @@ def main():
             return
     else:
         try:
-            request('Alive')
+            request('Alive', server=server)
         except Exception as e:
             print("Could not establish connection to JRiver. Verify MCWS is running and authentication is not required.\n", e)
             return
 
+    run(opts, lambda cmd, cat=None, **kwargs: request(cmd, cat, server=server, username=username, password=password, token=token, **kwargs))
+
+
+def run(opts, send):
+    """Sends the commands given on the command line with send(cmd, cat=None, **kwargs)"""
     r = None
 
     if opts.mcc:
-        r = request(cmd='MCC', Command=opts.mcc[0], Parameter=opts.mcc[1], token=token)
+        r = send('MCC', Command=opts.mcc[0], Parameter=opts.mcc[1])
 
     if opts.cmd:
         scmd = opts.cmd.split("/")
         if len(scmd) > 1:
             cmd = scmd[1]
             cat = scmd[0]
-            r = request(cmd, cat=cat, token=token)
+            r = send(cmd, cat=cat)
         else:
-            r = request(opts.cmd, token=token)
+            r = send(opts.cmd)
 
     if opts.current:
-        r = request("Info", cat="Playback", token=token)
+        r = send("Info", cat="Playback")
         s = '      JRiver '
         p = r.parsed()
         if p['State'] == 0 or 'Status' not in p:    # Handle startup stopped, status key doesn't exist
@@ -76,7 +129,7 @@ def main():
     if r is None or not opts.print:
         return
 
-    print(r.response.text)
+    print(r.text)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,285 @@
+"""
+jrivermcws.agent
+~~~~~~~~~~~~~~~~
+
+A background process holding authenticated sessions for jriverctl
+
+~~~~~~~~~~~~~~~
+
+Copyright Michael Adkins 2017
+Distributed under the MIT License.
+See accompanying file LICENSE.md file or copy at http://opensource.org/licenses/MIT
+
+"""
+
+import base64
+import json
+import os
+import socket
+import socketserver
+import stat
+import struct
+import tempfile
+from . import exceptions
+from .api import get_client, default_server, default_username, default_password
+from .models import Result
+
+
+def default_path():
+    """Returns where the agent socket lives
+
+    In the runtime directory when there is one, which only the user can
+    access, and otherwise in a jriverctl-<uid> directory of the temporary
+    directory which the agent creates with mode 0700.
+    """
+    base = os.environ.get('XDG_RUNTIME_DIR')
+    if base:
+        return os.path.join(base, 'jriverctl.sock')
+    return os.path.join(tempfile.gettempdir(), 'jriverctl-{}'.format(os.getuid()), 'agent.sock')
+
+
+def check_owner(path, private=False):
+    """Raises a PermissionError unless path is owned by the current user and not a link
+
+    With private set the path must also be inaccessible to other users.
+    Every forwarded command carries the user's credentials, so they must
+    never be sent to a socket another user could have put in place.
+    """
+    st = os.lstat(path)
+    if st.st_uid != os.getuid():
+        raise PermissionError('{} is owned by another user'.format(path))
+    if stat.S_ISLNK(st.st_mode):
+        raise PermissionError('{} is a symbolic link'.format(path))
+    if private and st.st_mode & 0o077:
+        raise PermissionError('{} is accessible by other users'.format(path))
+
+
+def peer_uid(sock):
+    """Returns the user ID of the process at the other end of a Unix socket, or None where unsupported"""
+    if not hasattr(socket, 'SO_PEERCRED'):
+        return None
+    creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+    return struct.unpack('3i', creds)[1]
+
+
+class Reply(object):
+    """A response relayed by the agent
+
+    Provides the parts of requests.Response used by Result, so forwarding a
+    command does not need to import requests.
+    """
+
+    def __init__(self, url, status_code, reason, headers, encoding, content):
+        self.url = url
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = headers
+        self.encoding = encoding
+        self._content = content
+
+    def __repr__(self):
+        return '<Reply [{}]>'.format(self.status_code)
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    @property
+    def content(self):
+        return self._content
+
+    @property
+    def text(self):
+        return self._content.decode(self.encoding or 'utf-8', errors='replace')
+
+    def iter_content(self, chunk_size=1):
+        for i in range(0, len(self._content), chunk_size):
+            yield self._content[i:i + chunk_size]
+
+    def close(self):
+        pass
+
+
+def _error_name(e):
+    """Names an exception for a reply, every transport error is sent as a ConnectionError"""
+    from requests.exceptions import RequestException
+    if isinstance(e, (RequestException, OSError)):
+        return 'ConnectionError'
+    return type(e).__name__
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        uid = peer_uid(self.request)
+        if uid is not None and uid != os.getuid():
+            return
+        # Requests and replies are single lines of JSON, many per connection
+        for line in self.rfile:
+            try:
+                reply = self.server.agent.handle(json.loads(line))
+            except Exception as e:
+                reply = {'error': _error_name(e), 'message': str(e)}
+            self.wfile.write(json.dumps(reply).encode() + b'\n')
+            self.wfile.flush()
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class Agent(object):
+    """Serves commands from jriverctl over a Unix domain socket
+
+    Commands are sent through the shared pooled clients of jrivermcws.api,
+    so the agent keeps connections open and tokens cached between
+    invocations. A jriverctl call then costs one local round trip to the
+    agent and one to the server, instead of starting up, authenticating and
+    checking the server is alive each time.
+
+    The socket is only accessible by the user running the agent, and
+    connect refuses a socket owned by anyone else.
+
+    Arguments
+    ----------
+    path (optional) : string
+        the socket path, see default_path
+
+    Examples
+    --------
+    # In one terminal or from a login script
+    jriverctl --agent
+
+    # Later calls are forwarded to the agent automatically
+    jriverctl --auth mz pass next
+
+    """
+
+    def __init__(self, path=None):
+        self.path = default_path() if path is None else path
+        self._server = None
+
+    def __repr__(self):
+        return '<Agent {}>'.format(self.path)
+
+    def handle(self, msg):
+        """Sends one forwarded command and returns the reply message"""
+        client = get_client(msg.get('server') or default_server, msg.get('username', default_username), msg.get('password', default_password))
+        r = client.request(msg['cmd'], msg.get('cat'), token=msg.get('token'), **msg.get('params', {}))
+        resp = r.response
+        if resp is None:
+            return {'status': None}
+        return {
+            'url': resp.url,
+            'status': resp.status_code,
+            'reason': resp.reason,
+            'headers': dict(resp.headers),
+            'encoding': resp.encoding,
+            'content': base64.b64encode(resp.content).decode('ascii'),
+        }
+
+    def serve_forever(self):
+        """Listens on the socket until shutdown() is called
+
+        Raises an OSError if another agent is already listening on the path,
+        or a PermissionError if the default socket directory or an existing
+        socket belongs to another user.
+        """
+        if self.path == default_path() and not os.environ.get('XDG_RUNTIME_DIR'):
+            directory = os.path.dirname(self.path)
+            try:
+                os.mkdir(directory, 0o700)
+            except FileExistsError:
+                pass
+            check_owner(directory, private=True)
+        if os.path.lexists(self.path):
+            if connect(self.path) is not None:
+                raise OSError('An agent is already running on {}'.format(self.path))
+            # Left behind by an agent that did not exit cleanly
+            os.unlink(self.path)
+        old = os.umask(0o177)
+        try:
+            self._server = _Server(self.path, _Handler)
+        finally:
+            os.umask(old)
+        self._server.agent = self
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+    def shutdown(self):
+        if self._server is not None:
+            self._server.shutdown()
+
+
+class Connection(object):
+    """A connection from a front end to a running Agent, see connect"""
+
+    def __init__(self, sock):
+        self._sock = sock
+        self._file = sock.makefile('rb')
+
+    def __repr__(self):
+        return '<Connection {}>'.format(self._sock.getpeername())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._file.close()
+        self._sock.close()
+
+    def request(self, cmd, cat=None, server=default_server, username=default_username, password=default_password, token=None, **kwargs):
+        """Forwards a command to the agent
+
+        Takes the same arguments as jrivermcws.api.request and returns a
+        Result in the same way. Exceptions raised by the command in the agent,
+        such as a BadCommandException, are raised again here. A failure to
+        reach the server raises a ConnectionError.
+        """
+        msg = {'cmd': cmd, 'cat': cat, 'server': server, 'username': username, 'password': password,
+               'token': token, 'params': kwargs}
+        self._sock.sendall(json.dumps(msg).encode() + b'\n')
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError('The agent closed the connection')
+        reply = json.loads(line)
+        if 'error' in reply:
+            if reply['error'] == 'ConnectionError':
+                raise ConnectionError(reply['message'])
+            raise getattr(exceptions, reply['error'], RuntimeError)(reply['message'])
+        if reply['status'] is None:
+            return Result(cat, cmd, None)
+        resp = Reply(reply['url'], reply['status'], reply['reason'], reply['headers'], reply['encoding'],
+                     base64.b64decode(reply['content']))
+        return Result(cat, cmd, resp)
+
+
+def connect(path=None):
+    """Returns a Connection to the agent listening on path, or None if none is running
+
+    Raises a PermissionError if the socket, or the agent listening on it,
+    belongs to another user.
+    """
+    path = default_path() if path is None else path
+    try:
+        check_owner(path)
+    except FileNotFoundError:
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return None
+    uid = peer_uid(sock)
+    if uid is not None and uid != os.getuid():
+        sock.close()
+        raise PermissionError('The agent on {} is run by another user'.format(path))
+    return Connection(sock)
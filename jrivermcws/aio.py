@@ -0,0 +1,169 @@
+"""
+jrivermcws.aio
+~~~~~~~~~~~~~~
+
+asyncio interface to the MCWS, requires the optional aiohttp package
+
+    pip install jrivermcws[async]
+
+~~~~~~~~~~~~~~~
+
+Copyright Michael Adkins 2017
+Distributed under the MIT License.
+See accompanying file LICENSE.md file or copy at http://opensource.org/licenses/MIT
+
+"""
+
+import asyncio
+from requests.models import PreparedRequest
+from .api import resolve_command, default_server, default_username, default_password, default_pool_size
+from .exceptions import FailedAuthenticationException
+from .models import Result, build_response
+from .tokens import token_cache as default_token_cache
+
+try:
+    import aiohttp
+    import yarl
+except ImportError:
+    aiohttp = None
+
+
+class AsyncClient(object):
+    """An asyncio counterpart of jrivermcws.api.Client
+
+    Commands are looked up and validated exactly as for Client.request and
+    return the same jrivermcws.models.Result objects. At most pool_size
+    connections are open at once, further requests wait for a free one, so
+    many commands can be sent with asyncio.gather.
+
+    The aiohttp session is created on first use and so must be used from a
+    single event loop.
+
+    Examples
+    --------
+    import asyncio
+    from jrivermcws.aio import AsyncClient
+
+    async def main():
+        async with AsyncClient(username='mz', password='pass') as c:
+            results = await asyncio.gather(*[c.request('Info', cat='Playback', Zone=z) for z in range(4)])
+
+    asyncio.run(main())
+
+    """
+
+    def __init__(self, server=default_server, username=default_username, password=default_password, token=None, pool_size=default_pool_size, token_cache=None, validate=True):
+        if aiohttp is None:
+            raise ImportError("AsyncClient requires aiohttp, install it with 'pip install jrivermcws[async]'")
+        self.server = server
+        self.username = username
+        self.password = password
+        self.token = token
+        self.pool_size = pool_size
+        self.token_cache = default_token_cache if token_cache is None else token_cache
+        self.validate = validate
+
+        self._session = None
+        self._auth_lock = None
+
+    def __repr__(self):
+        return '<AsyncClient {}>'.format(self.server)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    @property
+    def session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def close(self):
+        """Closes all pooled connections to the server"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def authenticate(self):
+        """Authenticate with the server using the client credentials
+
+        The token is stored in the client's token cache.
+
+        Returns the JRiver MCWS authentication token or raises an exception with the status code.
+        """
+        auth = aiohttp.BasicAuth(self.username, self.password)
+        r = Result(response=await self._get(self.server + 'Authenticate', auth=auth))
+        if r.response.status_code == 200:
+            token = r.parsed()['Token']
+            self.token_cache.set(self.server, self.username, token)
+            return token
+        else:
+            raise FailedAuthenticationException("HTTP status code: {} {}".format(r.response.status_code, r.response.reason))
+
+    async def get_token(self, refresh=False, rejected=None):
+        """Returns a cached token for the client credentials, authenticating only if there is none
+
+        With refresh a new token is requested. rejected is the token the
+        server refused, so callers whose token was already replaced by a
+        concurrent authentication are given the new one instead of sending
+        another round trip.
+        """
+        if self._auth_lock is None:
+            self._auth_lock = asyncio.Lock()
+        if rejected is None:
+            rejected = self.token_cache.get(self.server, self.username)
+            if rejected is not None and not refresh:
+                return rejected
+        async with self._auth_lock:
+            token = self.token_cache.get(self.server, self.username)
+            if token is not None and token != rejected:
+                # Another task authenticated since the token was rejected
+                return token
+            return await self.authenticate()
+
+    async def request(self, cmd, cat=None, token=None, **kwargs):
+        """Sends a command request, see jrivermcws.api.Client.request"""
+        if token is None:
+            token = self.token
+
+        cat, det, kwargs = resolve_command(cmd, cat, self.validate, **kwargs)
+
+        # Alive does not require authentication
+        cached = token is None and det['cmdstr'] != 'Alive'
+        params = {}
+        if cached:
+            params['Token'] = await self.get_token()
+        elif token is not None:
+            params['Token'] = token
+
+        params.update(kwargs)
+        url = self.server + det['cmdstr']
+
+        resp = await self._send(url, params)
+        if cached and resp is not None and resp.status_code == 401:
+            params['Token'] = await self.get_token(refresh=True, rejected=params['Token'])
+            resp = await self._send(url, params)
+
+        result = Result(cat, cmd, resp)
+        if det['cmdstr'] == 'Alive' and result:
+            self.token_cache.check_runtime(self.server, result.parsed().get('RuntimeGUID'))
+        return result
+
+    async def _send(self, url, params):
+        # Build the url as the blocking client does so '+' can be replaced with '%20'
+        prepped = PreparedRequest()
+        prepped.prepare_url(url, params)
+        try:
+            return await self._get(prepped.url.replace('+', '%20'))
+        except Exception as e:
+            print("An exception occured on the request for '{}'. Details: {}".format(url, e))
+            return None
+
+    async def _get(self, url, **kwargs):
+        async with self.session.get(yarl.URL(url, encoded=True), **kwargs) as resp:
+            body = await resp.read()
+            return build_response(str(resp.url), resp.status, resp.reason, resp.headers, resp.charset, body)
@@ -12,22 +12,473 @@ See accompanying file LICENSE.md file or copy at http://opensource.org/licenses/
 
 """
 
-import requests
-from requests import Request, Session
-from requests.auth import HTTPBasicAuth
+import random
+import threading
+import time
+from collections import deque
 from . import cmds
-from . import mcc
+from . import schema
 from .exceptions import BadCommandException, MissingParametersException, FailedAuthenticationException
-from .models import Result
+from .models import Result, build_response
+from .tokens import token_cache as default_token_cache
 
 default_server = 'http://localhost:52198/MCWS/v1/'
 default_username = ''
 default_password = ''
+default_pool_size = 10
+# (connect, read) seconds, the read timeout applies to each wait for data rather than the whole response
+default_timeout = (5.0, 60.0)
+default_retries = 2
+default_backoff = 0.1
 
+# Responses worth retrying for commands that are safe to repeat
+retry_statuses = frozenset((502, 503, 504))
+# Recent round trip times kept per command to pick the hedging threshold
+hedge_window = 200
+hedge_min_samples = 20
 
-def request(cmd, cat=None, server=default_server, username=default_username, password=default_password, token=None, **kwargs):
+# Seconds the current thread spent opening connections during its latest send
+_connects = threading.local()
+_TimedAdapter = None
+
+
+def _adapter_class():
+    """Returns a requests HTTPAdapter subclass whose new connections time themselves into _connects
+
+    Defined on first use as requests is slow to import. Requests sent
+    through a proxy count connecting as part of the wait instead.
+    """
+    global _TimedAdapter
+    if _TimedAdapter is None:
+        from requests.adapters import HTTPAdapter
+        from urllib3.connection import HTTPConnection, HTTPSConnection
+        from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+        def timed(connection_class):
+            class TimedConnection(connection_class):
+                def connect(self):
+                    start = time.perf_counter()
+                    try:
+                        super(TimedConnection, self).connect()
+                    finally:
+                        _connects.seconds = getattr(_connects, 'seconds', 0.0) + time.perf_counter() - start
+            return TimedConnection
+
+        class TimedHTTPConnectionPool(HTTPConnectionPool):
+            ConnectionCls = timed(HTTPConnection)
+
+        class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+            ConnectionCls = timed(HTTPSConnection)
+
+        class TimedAdapter(HTTPAdapter):
+            def init_poolmanager(self, *args, **kwargs):
+                super(TimedAdapter, self).init_poolmanager(*args, **kwargs)
+                self.poolmanager.pool_classes_by_scheme = {'http': TimedHTTPConnectionPool, 'https': TimedHTTPSConnectionPool}
+
+        _TimedAdapter = TimedAdapter
+    return _TimedAdapter
+
+
+def resolve_command(cmd, cat=None, validate=True, **kwargs):
+    """Looks up and validates a command before it is sent
+
+    Returns a (cat, details, kwargs) tuple where details is the entry from
+    jrivermcws.cmds.details and kwargs are the parameters to send, with MCC
+    command names replaced by their numeric code.
+
+    Unless validate is false the parameters are also checked against the
+    command's schema (see jrivermcws.schema) and given their documented names.
+
+    Raises a BadCommandException (or subclass) if the command is not valid.
+    """
+
+    # Validate the category of the command with automatic lookup if not supplied
+    given = cat
+    cat, det = cmds.lookup(cmd, cat)
+    if given is not None and cat is None:
+        raise BadCommandException('Category does not exist')
+    if det is None:
+        raise BadCommandException('Command could not be found')
+
+    if validate:
+        kwargs = schema.of(det).validate(kwargs)
+
+    # Validate MCC type commands
+    if det['cmdstr'] == 'Control/MCC':
+        from . import mcc
+        if 'Command' not in kwargs:
+            raise MissingParametersException('Command number must be included')
+        try:
+            cmdnum = int(kwargs['Command'])
+        # TODO: Choose a more specific exception to catch
+        except Exception as e:
+            if kwargs['Command'] in mcc.mcc_codes:
+                cmdnum = mcc.mcc_codes[kwargs['Command']]
+                kwargs['Command'] = str(cmdnum)
+            else:
+                raise BadCommandException("MCC command '{}' not found".format(kwargs['Command']))
+        if cmdnum not in mcc.mcc_cmds:
+            raise BadCommandException("MCC command '{}' not found".format(kwargs['Command']))
+
+    return cat, det, kwargs
+
+
+class Client(object):
+    """A long-lived connection to a JRiver MCWS server
+
+    Holds the server address and credentials along with a requests.Session
+    whose keep-alive connection pool is reused across commands, so repeated
+    calls do not pay for a new TCP connection each time.
+
+    Arguments
+    ----------
+    server (optional = 'http://localhost:52198/MCWS/v1/') : string, url
+        the address of the JRiver MCWS
+    username : string
+        the username to login to the server with
+    password : string
+        the password to login to the server with
+    token : string
+        A pre-authenticated token to use instead of username/password
+    pool_size (optional = 10) : integer
+        the maximum number of keep-alive connections held open to the server
+    token_cache (optional) : jrivermcws.tokens.TokenCache
+        where tokens are cached between commands, shared by all clients by default
+    cache (optional = None) : jrivermcws.cache.ResponseCache
+        caches responses of read-only commands until the library revision changes
+    validate (optional = True) : bool
+        check parameters against the command schemas before sending
+    instrument (optional = None) : jrivermcws.stats.Instrumentation
+        records per-command timings and payload sizes, nothing is timed without one
+    timeout (optional = (5.0, 60.0)) : float or (float, float)
+        the connect and read timeouts in seconds, None waits forever
+    retries (optional = 2) : integer
+        how many times a failed request is retried. Read-only commands are
+        retried after any error or a 502, 503 or 504 response, others only
+        when the connection could not be made so they are never sent twice
+    backoff (optional = 0.1) : float
+        the base delay in seconds between retries, doubled on each attempt
+        and jittered so clients do not retry in step
+    hedge (optional = None) : float
+        a percentile (e.g. 95) of recent round trip times, once a read-only
+        command has taken longer a second identical request is sent and
+        whichever answers first is used
+
+    Examples
+    --------
+    import jrivermcws as jr
+
+    with jr.Client(username='mz', password='pass') as c:
+        c.request('Next', cat='Playback')
+        p = c.request('Info', cat='Playback').parsed()
+
+    """
+
+    def __init__(self, server=default_server, username=default_username, password=default_password, token=None, pool_size=default_pool_size, token_cache=None, cache=None, validate=True, instrument=None, timeout=default_timeout, retries=default_retries, backoff=default_backoff, hedge=None):
+        self.server = server
+        self.username = username
+        self.password = password
+        self.token = token
+        self.pool_size = pool_size
+        self.token_cache = default_token_cache if token_cache is None else token_cache
+        self.cache = cache
+        self.validate = validate
+        self.instrument = instrument
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.hedge = hedge
+
+        # cmdstr -> deque of recent round trip times, used for hedging
+        self._latencies = {}
+        self._hedge_pool = None
+        self._lock = threading.Lock()
+
+        # requests is imported here rather than at module level to keep imports fast
+        from requests import Session
+
+        self.session = Session()
+        adapter = _adapter_class()(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def __repr__(self):
+        return '<Client {}>'.format(self.server)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Closes all pooled connections to the server"""
+        if self._hedge_pool is not None:
+            self._hedge_pool.shutdown(wait=False)
+            self._hedge_pool = None
+        self.session.close()
+
+    def authenticate(self):
+        """Authenticate with the server using the client credentials
+
+        The token is stored in the client's token cache.
+
+        Returns the JRiver MCWS authentication token or raises an exception with the status code.
+        """
+        from requests.auth import HTTPBasicAuth
+        r = Result(response=self.session.get(self.server + 'Authenticate', auth=HTTPBasicAuth(self.username, self.password), timeout=self.timeout))
+        if r.response.status_code == 200:
+            token = r.parsed()['Token']
+            self.token_cache.set(self.server, self.username, token)
+            return token
+        else:
+            raise FailedAuthenticationException("HTTP status code: {} {}".format(r.response.status_code, r.response.reason))
+
+    def get_token(self, refresh=False):
+        """Returns a cached token for the client credentials, authenticating only if there is none"""
+        if not refresh:
+            token = self.token_cache.get(self.server, self.username)
+            if token is not None:
+                return token
+        return self.authenticate()
+
+    def request(self, cmd, cat=None, token=None, stream=False, method='GET', headers=None, **kwargs):
+        """Sends a command request over the pooled session
+
+        Takes the same arguments as jrivermcws.api.request except for the
+        server and credentials, which are held by the client. With
+        method='POST' the parameters other than the token are sent as a form
+        body, for values too large for a url. headers are added to the HTTP
+        request, e.g. a Range header for File/GetFile.
+
+        Without an explicit token a cached one is used. If the server rejects
+        it with a 401 the client re-authenticates once and retries. Results of
+        the Alive command are checked for a new RuntimeGUID so tokens from
+        before a server restart are dropped.
+
+        Failed requests are retried and slow read-only ones hedged as set up
+        by the client's retries and hedge arguments. If every attempt fails
+        the error is printed and a Result without a response is returned.
+        """
+        if token is None:
+            token = self.token
+
+        cat, det, kwargs = resolve_command(cmd, cat, self.validate, **kwargs)
+
+        # Alive does not require authentication
+        cached = token is None and det['cmdstr'] != 'Alive'
+        params = {}
+        if cached:
+            params['Token'] = self.get_token()
+        elif token is not None:
+            params['Token'] = token
+
+        # Update arguments and construct a call url
+        params.update(kwargs)
+        url = self.server + det['cmdstr']
+
+        record = None
+        if self.instrument is not None:
+            record = self.instrument.recorder(det['cmdstr'])
+
+        key = None
+        if self.cache is not None and not stream and method == 'GET' and headers is None and cmds.is_readonly(det, kwargs):
+            self.cache.validate(self)
+            key = self.cache.key(self.server, det['cmdstr'], kwargs)
+            start = time.perf_counter() if record is not None else None
+            entry = self.cache.get(key)
+            if entry is not None:
+                if record is not None:
+                    record('cache', time.perf_counter() - start, len(entry[-1]))
+                return Result(cat, cmd, build_response(url, *entry), record)
+
+        # Commands which change nothing can be repeated safely
+        idempotent = cmds.is_idempotent(det, kwargs)
+        hedged = self.hedge is not None and idempotent and not stream and method == 'GET'
+
+        resp = self._fetch(record, det['cmdstr'], url, params, stream, method, headers, idempotent, hedged)
+        if cached and resp is not None and resp.status_code == 401:
+            resp.close()
+            self.token_cache.invalidate(self.server, self.username)
+            params['Token'] = self.get_token(refresh=True)
+            resp = self._fetch(record, det['cmdstr'], url, params, stream, method, headers, idempotent, hedged)
+
+        result = Result(cat, cmd, resp, record)
+        if key is not None and result:
+            self.cache.put(key, resp.status_code, resp.reason, resp.headers, resp.encoding, resp.content)
+        if det['cmdstr'] == 'Alive' and result:
+            self.token_cache.check_runtime(self.server, result.parsed().get('RuntimeGUID'))
+        return result
+
+    def _fetch(self, record, cmdstr, url, params, stream, method, headers, idempotent, hedged):
+        """Sends a request, hedging it if asked to and tracking its latency for later hedges"""
+        if not hedged:
+            return self._timed_send(record, url, params, stream, method, headers, idempotent)
+        start = time.perf_counter()
+        resp = self._hedged_send(record, cmdstr, url, params, headers)
+        if resp is not None:
+            with self._lock:
+                window = self._latencies.get(cmdstr)
+                if window is None:
+                    window = self._latencies[cmdstr] = deque(maxlen=hedge_window)
+                window.append(time.perf_counter() - start)
+        return resp
+
+    def hedge_after(self, cmdstr):
+        """Returns the seconds after which a command is hedged, None until enough round trips were seen"""
+        with self._lock:
+            window = self._latencies.get(cmdstr)
+            if window is None or len(window) < hedge_min_samples:
+                return None
+            times = sorted(window)
+        return times[min(len(times) - 1, int(len(times) * self.hedge / 100.0))]
+
+    def _hedged_send(self, record, cmdstr, url, params, headers):
+        threshold = self.hedge_after(cmdstr)
+        if threshold is None:
+            return self._timed_send(record, url, params, False, 'GET', headers, True)
+
+        from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+        with self._lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = ThreadPoolExecutor(max_workers=self.pool_size)
+            pool = self._hedge_pool
+
+        args = (record, url, params, False, 'GET', headers, True)
+        first = pool.submit(self._timed_send, *args)
+        done, pending = wait([first], timeout=threshold)
+        if done:
+            return first.result()
+
+        if record is not None:
+            record('hedge', threshold)
+        pending = {first, pool.submit(self._timed_send, *args)}
+        resp = None
+        while pending and resp is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for f in done:
+                if resp is None:
+                    resp = f.result()
+                elif f.result() is not None:
+                    f.result().close()
+        # Drop whichever request is still outstanding once it completes
+        for f in pending:
+            f.add_done_callback(_close_response)
+        return resp
+
+    def _timed_send(self, record, url, params, stream, method, headers, idempotent=False):
+        """Sends a request, recording its phases with record unless it is None"""
+        if record is None:
+            return self._send(url, params, stream, method, headers, idempotent)
+        start = time.perf_counter()
+        resp = self._send(url, params, stream, method, headers, idempotent, record)
+        total = time.perf_counter() - start
+        if resp is None:
+            record('error', total)
+            return resp
+        # elapsed runs from sending the request until the headers were parsed, including any new connection
+        connect = _connects.seconds
+        if connect:
+            record('connect', connect)
+        wait = min(resp.elapsed.total_seconds(), total)
+        record('wait', max(wait - connect, 0.0), request_size(resp.request))
+        if not stream:
+            record('download', total - wait, len(resp.content))
+            record('request', total)
+        return resp
+
+    def _send(self, url, params, stream=False, method='GET', headers=None, idempotent=False, record=None):
+        from requests import Request
+        if method == 'POST':
+            query = {k: v for (k, v) in params.items() if k == 'Token'}
+            data = {k: v for (k, v) in params.items() if k != 'Token'}
+            req = Request('POST', url, params=query, data=data, headers=headers)
+        else:
+            # Manually build request so we can replace '+' with '%20'
+            req = Request('GET', url, params=params, headers=headers)
+        prepped = self.session.prepare_request(req)
+        prepped.url = prepped.url.replace('+', '%20')
+
+        attempt = 0
+        while True:
+            _connects.seconds = 0.0
+            try:
+                resp = self.session.send(prepped, stream=stream, timeout=self.timeout)
+            except Exception as e:
+                if attempt < self.retries and (idempotent or not_sent(e)):
+                    attempt += 1
+                    self._wait_to_retry(attempt, record)
+                    continue
+                print("An exception occured on the request for '{}'. Details: {}".format(url, e.args[0]))
+                return None
+            if idempotent and resp.status_code in retry_statuses and attempt < self.retries:
+                resp.close()
+                attempt += 1
+                self._wait_to_retry(attempt, record)
+                continue
+            return resp
+
+    def _wait_to_retry(self, attempt, record):
+        # Exponential backoff with full jitter
+        delay = random.uniform(0, self.backoff * 2**(attempt - 1))
+        if record is not None:
+            record('retry', delay)
+        time.sleep(delay)
+
+
+def _close_response(future):
+    resp = future.result()
+    if resp is not None:
+        resp.close()
+
+
+def not_sent(e):
+    """Returns true if a requests exception means the request never reached the server"""
+    from requests.exceptions import ConnectTimeout, ConnectionError
+    if isinstance(e, ConnectTimeout):
+        return True
+    if isinstance(e, ConnectionError) and e.args:
+        from urllib3.exceptions import NewConnectionError
+        reason = getattr(e.args[0], 'reason', None)
+        return isinstance(reason, NewConnectionError)
+    return False
+
+
+def request_size(prepped):
+    """Approximate size in bytes of a prepared request as sent on the wire"""
+    size = len(prepped.method) + len(prepped.path_url) + 12
+    for (k, v) in prepped.headers.items():
+        size += len(k) + len(v) + 4
+    body = prepped.body
+    if body:
+        size += len(body)
+    return size
+
+
+# Clients shared by the module level functions, one per server and credentials
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(server=default_server, username=default_username, password=default_password):
+    """Returns the shared Client for a server and credentials, creating it if needed
+
+    The module level request() and authenticate() functions go through these
+    clients so that plain calls also reuse pooled connections.
+    """
+    key = (server, username, password)
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = Client(server, username, password)
+        return _clients[key]
+
+
+def request(cmd, cat=None, server=default_server, username=default_username, password=default_password, token=None, stream=False, **kwargs):
     """Sends a command request to the JRiver MCWS server
 
+    The request is sent through a shared Client for the server and credentials
+    (see get_client) so connections are kept alive between calls.
+
     Arguments
     ----------
     cmd : string, integer
@@ -42,6 +493,9 @@ def request(cmd, cat=None, server=default_server, username=default_username, pas
         the password to login to the server with
     token : string
         A pre-authenticated token to use instead of username/password
+    stream (optional = False) : bool
+        leave the response body unread so it can be consumed incrementally
+        with Result.iter_items
     kwargs :
         additional keyword arguments are passed as parameters with the command
 
@@ -74,62 +528,12 @@ def request(cmd, cat=None, server=default_server, username=default_username, pas
     p = r.parsed()
     print("Playing {} by {}".format(p['Name'], p['Artist']))
 
-    """
-
-    params = {'Token': authenticate(username, password, server=server) if token is None else token}
-
-    # Validate the category of the command with automatic lookup if not supplied
-    if cat is None:
-        cat = cmds.categoryof(cmd)
-    else:
-        if cat not in cmds.details:
-            raise BadCommandException('Category does not exist')
-    if (not cat) or (cmd not in cmds.details[cat]):
-        raise BadCommandException('Command could not be found')
-
-    det = cmds.details[cat][cmd]
-
-    # Commented until optional parametres handled
-    # if len(kwargs < cmds.param_count(cmd, cat)):
-        # Raise MissingParametersException()
-    #   pass
-
-    # Validate MCC type commands
-    if det['cmdstr'] == 'Control/MCC':
-        if 'Command' not in kwargs:
-            raise MissingParametersException('Command number must be included')
-        try:
-            cmdnum = int(kwargs['Command'])
-        # TODO: Choose a more specific exception to catch
-        except Exception as e:
-            if kwargs['Command'] in mcc.mcc_codes:
-                cmdnum = mcc.mcc_codes[kwargs['Command']]
-                kwargs['Command'] = str(cmdnum)
-            else:
-                raise BadCommandException("MCC command '{}' not found".format(kwargs['Command']))
-        if cmdnum not in mcc.mcc_cmds:
-            raise BadCommandException("MCC command '{}' not found".format(kwargs['Command']))
-
-    # Update arguments and construct a call url
-    params.update(kwargs)
-    url = server + det['cmdstr']
-
-    # Manually build request so we can replace '+' with '%20'
-    #       Session used in with to ensure the session closes
-    #       as recommended in the requests package
-    with Session() as s:
-        req = Request('GET', url, params=params)
-        prepped = s.prepare_request(req)
-        prepped.url = prepped.url.replace('+', '%20')
-        try:
-            resp = s.send(prepped)
-        except Exception as e:
-            print("An exception occured on the request for '{}'. Details: {}".format(url, e.args[0]))
-            resp = None
-            pass
+    # Walk the whole library without loading it into memory
+    for item in jr.request('Search', Query='', stream=True).iter_items():
+        print(item['Key'], item['Name'])
 
-    result = Result(cat, cmd, resp)
-    return result
+    """
+    return get_client(server, username, password).request(cmd, cat, token=token, stream=stream, **kwargs)
 
 
 def authenticate(username, password, server=default_server):
@@ -137,8 +541,4 @@ def authenticate(username, password, server=default_server):
 
     Returns the JRiver MCWS authentication token or raises an exception with the status code.
     """
-    r = Result(response=requests.get(server + 'Authenticate', auth=HTTPBasicAuth(username, password)))
-    if r.response.status_code == 200:
-        return r.parsed()['Token']
-    else:
-        raise FailedAuthenticationException("HTTP status code: {} {}".format(r.response.status_code, r.response.reason))
+    return get_client(server, username, password).authenticate()
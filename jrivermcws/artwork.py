@@ -0,0 +1,209 @@
+"""
+jrivermcws.artwork
+~~~~~~~~~~~~~~~~~~
+
+Disk-backed cache of File/GetImage and Browse/Image artwork
+
+~~~~~~~~~~~~~~~
+
+Copyright Michael Adkins 2017
+Distributed under the MIT License.
+See accompanying file LICENSE.md file or copy at http://opensource.org/licenses/MIT
+
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from .api import get_client
+
+_suffix = '.img'
+
+
+def _digest(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+class ArtworkCache(object):
+    """Serves artwork from memory or disk, only asking the server on a miss
+
+    Images are keyed on the item (file key or browse ID) and every sizing
+    parameter (Type, ThumbnailSize, Width, Height, Format, ...). Files on disk
+    are evicted least recently used first once max_bytes is exceeded and the
+    most recently used images are also kept in memory.
+
+    All artwork is dropped when the library revision changes, polled at most
+    every revision_interval seconds, and the images of a file are dropped
+    when it is given a new one with set_image.
+
+    Arguments
+    ----------
+    directory : string
+        where images are stored, created if it does not exist
+    client (optional = None) : jrivermcws.api.Client
+        the client to fetch through, the shared default server client if not given
+    max_bytes (optional = 256 MiB) : integer
+        the maximum total size of the images on disk
+    hot_items (optional = 128) : integer
+        the number of images also held in memory
+    revision_interval (optional = 30.0) : float
+        seconds between Library/GetRevision polls
+
+    Examples
+    --------
+    from jrivermcws.artwork import ArtworkCache
+
+    art = ArtworkCache('~/.cache/jriver-art', client=c)
+    jpg = art.file_image(6659617, ThumbnailSize='Large')
+    png = art.browse_image(12, Width=200, Height=200, Format='png')
+
+    """
+
+    def __init__(self, directory, client=None, max_bytes=256 * 2**20, hot_items=128, revision_interval=30.0):
+        self.directory = os.path.expanduser(directory)
+        self.client = get_client() if client is None else client
+        self.max_bytes = max_bytes
+        self.hot_items = hot_items
+        self.revision_interval = revision_interval
+
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._hot = OrderedDict()
+        self._revision = None
+        self._checked = None
+
+        # Index of the images on disk, least recently used first
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(_suffix):
+                st = os.stat(os.path.join(self.directory, name))
+                entries.append((st.st_mtime, name, st.st_size))
+        entries.sort()
+        self._disk = OrderedDict((name, size) for (_, name, size) in entries)
+        self._bytes = sum(self._disk.values())
+
+        revision_path = os.path.join(self.directory, 'revision')
+        if os.path.exists(revision_path):
+            with open(revision_path) as f:
+                self._revision = f.read().strip()
+
+    def __repr__(self):
+        return '<ArtworkCache {} [{} images, {} bytes]>'.format(self.directory, len(self._disk), self._bytes)
+
+    def __len__(self):
+        return len(self._disk)
+
+    @staticmethod
+    def _name(kind, item, params):
+        """Files are named by item then parameters so an item's images can be found by prefix"""
+        key = '&'.join('{}={}'.format(k, params[k]) for k in sorted(params))
+        return '{}-{}{}'.format(_digest('{}:{}'.format(kind, item)), _digest(key), _suffix)
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _validate(self):
+        now = time.monotonic()
+        if self._checked is not None and now - self._checked < self.revision_interval:
+            return
+        self._checked = now
+        r = self.client.request('GetRevision', cat='Library')
+        if not r:
+            return
+        revision = r.parsed().get('Master')
+        if revision != self._revision:
+            if self._revision is not None:
+                self.invalidate()
+            self._revision = revision
+            with open(self._path('revision'), 'w') as f:
+                f.write(str(revision))
+
+    def _get(self, kind, item, cmd, cat, params):
+        self._validate()
+        name = self._name(kind, item, params)
+        with self._lock:
+            data = self._hot.get(name)
+            if data is not None:
+                self._hot.move_to_end(name)
+                self._disk.move_to_end(name)
+                self.hits += 1
+                return data
+            if name in self._disk:
+                try:
+                    with open(self._path(name), 'rb') as f:
+                        data = f.read()
+                except OSError:
+                    self._bytes -= self._disk.pop(name)
+                else:
+                    os.utime(self._path(name))
+                    self._disk.move_to_end(name)
+                    self._remember(name, data)
+                    self.hits += 1
+                    return data
+            self.misses += 1
+
+        r = self.client.request(cmd, cat=cat, **params)
+        if not r:
+            return None
+        data = r.response.content
+        self._store(name, data)
+        return data
+
+    def _remember(self, name, data):
+        self._hot[name] = data
+        self._hot.move_to_end(name)
+        while len(self._hot) > self.hot_items:
+            self._hot.popitem(last=False)
+
+    def _store(self, name, data):
+        if len(data) > self.max_bytes:
+            return
+        tmp = self._path(name + '.tmp')
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, self._path(name))
+        with self._lock:
+            self._bytes += len(data) - self._disk.pop(name, 0)
+            self._disk[name] = len(data)
+            self._remember(name, data)
+            while self._bytes > self.max_bytes:
+                (evicted, size) = self._disk.popitem(last=False)
+                self._bytes -= size
+                self._hot.pop(evicted, None)
+                try:
+                    os.remove(self._path(evicted))
+                except OSError:
+                    pass
+
+    def file_image(self, file, FileType='Key', Type='Thumbnail', **kwargs):
+        """Returns the bytes of File/GetImage for a file, or None if the server has no image"""
+        params = dict(kwargs, File=file, FileType=FileType, Type=Type)
+        return self._get('file', '{}:{}'.format(FileType, file), 'GetImage', 'File', params)
+
+    def browse_image(self, ID, **kwargs):
+        """Returns the bytes of Browse/Image for a browse item, or None if the server has no image"""
+        params = dict(kwargs, ID=ID)
+        return self._get('browse', ID, 'Image', 'Browse', params)
+
+    def set_image(self, file, image, FileType='Key', Type='jpg'):
+        """Sends File/SetImage with a base 64 encoded image and drops the cached images of the file"""
+        r = self.client.request('SetImage', cat='File', File=file, FileType=FileType, Type=Type, Image=image, method='POST')
+        self.invalidate(file, FileType)
+        return r
+
+    def invalidate(self, file=None, FileType='Key'):
+        """Drops the images of a file, or every image"""
+        prefix = '' if file is None else _digest('file:{}:{}'.format(FileType, file))
+        with self._lock:
+            for name in [n for n in self._disk if n.startswith(prefix)]:
+                self._bytes -= self._disk.pop(name)
+                self._hot.pop(name, None)
+                try:
+                    os.remove(self._path(name))
+                except OSError:
+                    pass
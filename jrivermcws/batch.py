@@ -0,0 +1,149 @@
+"""
+jrivermcws.batch
+~~~~~~~~~~~~~~~~
+
+Runs scripts of jriverctl commands over a single session
+
+~~~~~~~~~~~~~~~
+
+Copyright Michael Adkins 2017
+Distributed under the MIT License.
+See accompanying file LICENSE.md file or copy at http://opensource.org/licenses/MIT
+
+"""
+
+import json
+import shlex
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from .exceptions import BadCommandException
+
+
+def parse_line(line):
+    """Parses a script line into a (cmd, cat, params) tuple
+
+    Lines hold a command, as 'Category/Command' or just 'Command', followed
+    by Name=Value parameters, or '-m COMMAND PARAMETER' for an MCC command.
+    Values may be quoted as in a shell. Returns None for blank lines and
+    comments starting with '#'.
+
+    Raises a BadCommandException if the line cannot be parsed.
+    """
+    try:
+        words = shlex.split(line, comments=True)
+    except ValueError as e:
+        raise BadCommandException('Could not parse line: {}'.format(e))
+    if not words:
+        return None
+
+    if words[0] in ('-m', '--mcc'):
+        if len(words) != 3:
+            raise BadCommandException('MCC lines take a command and a parameter')
+        return 'MCC', 'Control', {'Command': words[1], 'Parameter': words[2]}
+
+    cmd, cat = words[0], None
+    if '/' in cmd:
+        cat, cmd = cmd.split('/', 1)
+    params = {}
+    for w in words[1:]:
+        name, sep, value = w.partition('=')
+        if not sep or not name:
+            raise BadCommandException("Expected Name=Value but got '{}'".format(w))
+        params[name] = value
+    return cmd, cat, params
+
+
+def run_line(number, line, send):
+    """Runs one script line with send(cmd, cat, **params) and returns its output record"""
+    record = {'line': number}
+    try:
+        parsed = parse_line(line)
+        if parsed is None:
+            return None
+        cmd, cat, params = parsed
+        record['cmd'] = cmd if cat is None else '{}/{}'.format(cat, cmd)
+        r = send(cmd, cat, **params)
+    except Exception as e:
+        record['ok'] = False
+        record['error'] = '{}: {}'.format(type(e).__name__, e)
+        return record
+
+    record['ok'] = bool(r)
+    if r.response is None:
+        record['error'] = 'No response'
+        return record
+    record['status'] = r.response.status_code
+    try:
+        root = r.xml()
+    except Exception:
+        # Not XML, e.g. an Action=Serialize list
+        record['result'] = r.text
+        return record
+    if root.tag == 'MPL':
+        record['result'] = list(r.iter_items())
+    else:
+        record['result'] = r.parsed()
+    return record
+
+
+def run(lines, send, jobs=1, out=None):
+    """Runs script lines and writes one JSON object per command to out
+
+    Records are written in script order as soon as they and every earlier
+    line are done, even when commands run concurrently. Each holds the line
+    number, the command, whether it succeeded, the HTTP status and the
+    parsed result (a list of items for MPL responses), or an error message.
+
+    Arguments
+    ----------
+    lines : iterable
+        the script, consumed lazily so it can be read from a pipe
+    send : callable
+        sends a command as send(cmd, cat, **params) and returns a Result,
+        e.g. the request method of a jrivermcws.api.Client
+    jobs (optional = 1) : integer
+        the number of commands run at once, 1 runs them strictly in sequence
+    out (optional = sys.stdout) : file
+
+    Returns
+    -------
+    The number of commands that failed
+
+    Examples
+    --------
+    from jrivermcws import batch
+
+    with open('retag.txt') as f, jr.Client(pool_size=8) as c:
+        failures = batch.run(f, c.request, jobs=8)
+
+    """
+    out = sys.stdout if out is None else out
+    failed = 0
+
+    def emit(record):
+        nonlocal failed
+        if record is None:
+            return
+        if not record['ok']:
+            failed += 1
+        out.write(json.dumps(record) + '\n')
+        out.flush()
+
+    if jobs <= 1:
+        for (n, line) in enumerate(lines, 1):
+            emit(run_line(n, line, send))
+        return failed
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        # A bounded window of commands in flight, written out from the front in order
+        pending = deque()
+        for (n, line) in enumerate(lines, 1):
+            pending.append(executor.submit(run_line, n, line, send))
+            if len(pending) >= jobs * 2:
+                emit(pending.popleft().result())
+            while pending and pending[0].done():
+                emit(pending.popleft().result())
+        while pending:
+            emit(pending.popleft().result())
+    return failed
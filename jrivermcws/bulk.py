@@ -0,0 +1,142 @@
+"""
+jrivermcws.bulk
+~~~~~~~~~~~~~~~
+
+Sends many commands concurrently, e.g. for retagging a whole library
+
+~~~~~~~~~~~~~~~
+
+Copyright Michael Adkins 2017
+Distributed under the MIT License.
+See accompanying file LICENSE.md file or copy at http://opensource.org/licenses/MIT
+
+"""
+
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from .api import Client
+from .outcomes import Outcome as _Outcome, Report
+
+default_workers = 8
+
+
+class Outcome(_Outcome, namedtuple('Outcome', ['file', 'field', 'value', 'result', 'error'])):
+    """The result of writing a single (file, field, value) triple
+
+    result is the jrivermcws.models.Result or None if an exception was raised,
+    in which case error holds the exception.
+    """
+    __slots__ = ()
+
+
+class BulkResult(Report):
+    """Per-item outcomes, in input order, with throughput stats for a bulk write"""
+
+    def __init__(self, outcomes, elapsed, progress_error=None):
+        super(BulkResult, self).__init__(outcomes, elapsed)
+        # The exception raised by the progress callback, if any, after which it was no longer called
+        self.progress_error = progress_error
+
+    def __repr__(self):
+        return '<BulkResult {} ok, {} failed in {:.2f}s ({:.1f}/s)>'.format(
+            len(self.succeeded), len(self.failed), self.elapsed, self.rate)
+
+    @property
+    def outcomes(self):
+        return self.items
+
+    @property
+    def rate(self):
+        """Items processed per second"""
+        return len(self.items) / self.elapsed if self.elapsed else 0.0
+
+
+def set_info(items, client=None, workers=default_workers, file_type='Key', progress=None, **kwargs):
+    """Writes many File/SetInfo values concurrently
+
+    Arguments
+    ----------
+    items : iterable
+        (file, field, value) triples, consumed lazily so generators are fine
+    client (optional = None) : jrivermcws.api.Client
+        the client to send through, a local default server client is created if not given
+    workers (optional = 8) : integer
+        the number of commands in flight at once
+    file_type (optional = 'Key') : string
+        how 'file' is given, 'Key' or 'Filename'
+    progress (optional = None) : callable
+        called as progress(done, outcome) after each item finishes. If it
+        raises it is not called again and the exception is kept as
+        BulkResult.progress_error
+    kwargs :
+        additional parameters sent with every SetInfo, e.g. Formatted=0
+
+    Returns
+    -------
+    A BulkResult. Failures, including items which are not (file, field, value)
+    triples, are recorded per item and do not stop the batch.
+
+    Examples
+    --------
+    from jrivermcws import bulk
+
+    r = bulk.set_info(((f, 'Genre', 'GOOOD_MUSIC') for f in files), client=c, workers=16)
+    for o in r.failed:
+        print(o.file, o.error or o.result)
+
+    """
+    owned = client is None
+    if owned:
+        client = Client(pool_size=workers)
+
+    def write(item):
+        try:
+            f, field, value = item
+        except Exception as e:
+            return Outcome(item, None, None, None, e)
+        try:
+            r = client.request('SetInfo', cat='File', File=f, FileType=file_type, Field=field, Value=value, **kwargs)
+            return Outcome(f, field, value, r, None)
+        except Exception as e:
+            return Outcome(f, field, value, None, e)
+
+    outcomes = []
+    progress_error = None
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # Keep a bounded window of submitted items so huge iterables are not materialized
+            pending = {}
+            it = iter(items)
+            index = 0
+            done = 0
+            exhausted = False
+            while pending or not exhausted:
+                while not exhausted and len(pending) < workers * 2:
+                    try:
+                        item = next(it)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    pending[executor.submit(write, item)] = index
+                    outcomes.append(None)
+                    index += 1
+                if not pending:
+                    break
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    outcome = future.result()
+                    outcomes[pending.pop(future)] = outcome
+                    done += 1
+                    if progress is not None:
+                        try:
+                            progress(done, outcome)
+                        except Exception as e:
+                            progress_error = e
+                            progress = None
+    finally:
+        if owned:
+            client.close()
+
+    return BulkResult(outcomes, time.perf_counter() - start, progress_error)
@@ -0,0 +1,125 @@
+"""
+jrivermcws.cache
+~~~~~~~~~~~~~~~~
+
+Caches responses of read-only commands until the library revision changes
+
+~~~~~~~~~~~~~~~
+
+Copyright Michael Adkins 2017
+Distributed under the MIT License.
+See accompanying file LICENSE.md file or copy at http://opensource.org/licenses/MIT
+
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResponseCache(object):
+    """A bounded LRU cache of command responses
+
+    Entries are keyed on the server, command and parameters. Before serving
+    a server's entries the cache polls Library/GetRevision, at most once per
+    revision_interval seconds, and drops everything cached for that server
+    when the master revision has changed.
+
+    Only commands flagged read-only in jrivermcws.cmds.details are cached,
+    see cmds.is_readonly. Enable it by passing a cache to a Client
+
+    Arguments
+    ----------
+    max_entries (optional = 256) : integer
+        the maximum number of responses held
+    max_bytes (optional = 32 MiB) : integer
+        the maximum total size of the response bodies held
+    revision_interval (optional = 5.0) : float
+        seconds between Library/GetRevision polls, 0 polls before every lookup
+
+    Examples
+    --------
+    c = jr.Client(cache=ResponseCache(max_bytes=64 * 2**20))
+    c.request('Values', Field='Album Artist (auto)')    # sent to the server
+    c.request('Values', Field='Album Artist (auto)')    # served from the cache
+
+    # Cache the module level jr.request calls to the default server
+    jr.get_client().cache = ResponseCache()
+
+    """
+
+    def __init__(self, max_entries=256, max_bytes=32 * 2**20, revision_interval=5.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.revision_interval = revision_interval
+
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        # server -> (master revision, time of last poll)
+        self._revisions = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<ResponseCache [{} entries, {} bytes]>'.format(len(self._entries), self._bytes)
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def key(server, cmdstr, params):
+        """Builds the cache key for a command, the token is not part of it"""
+        return (server, cmdstr, tuple(sorted((k, str(v)) for (k, v) in params.items() if k != 'Token')))
+
+    def get(self, key):
+        """Returns the cached (status, reason, headers, encoding, content) tuple or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, status, reason, headers, encoding, content):
+        size = len(content)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[4])
+            self._entries[key] = (status, reason, headers, encoding, content)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted[4])
+
+    def invalidate(self, server=None):
+        """Drops the entries for a server, or every entry"""
+        with self._lock:
+            if server is None:
+                self._entries.clear()
+                self._bytes = 0
+                return
+            for key in [k for k in self._entries if k[0] == server]:
+                self._bytes -= len(self._entries.pop(key)[4])
+
+    def validate(self, client):
+        """Polls the library revision of the client's server if due, invalidating its entries on a change"""
+        now = time.monotonic()
+        revision, checked = self._revisions.get(client.server, (None, None))
+        if checked is not None and now - checked < self.revision_interval:
+            return
+        r = client.request('GetRevision', cat='Library')
+        if not r:
+            # Can't tell whether anything changed
+            self.invalidate(client.server)
+            return
+        current = r.parsed().get('Master')
+        self._revisions[client.server] = (current, now)
+        if current != revision:
+            self.invalidate(client.server)
@@ -758,33 +758,127 @@ _functions = {
 
 
 from .exceptions import BadCommandException, NullCommandException
-from requests.structures import CaseInsensitiveDict
 
 
-# Make function details available
-details = CaseInsensitiveDict(name='command_details')
-for cat in _functions:
-    details[cat] = CaseInsensitiveDict(name=cat + '_command_details')
-    for cmd in _functions[cat]:
+# Commands that only read library data, so their responses stay valid until
+# the library revision changes. Commands taking an Action are only read-only
+# when returning an MPL or serialized list, see is_readonly
+_readonly = {
+    'Browse/Children', 'Browse/Files', 'Browse/Image',
+    'File/GetImage', 'File/GetInfo',
+    'Files/Search',
+    'Library/Fields', 'Library/GetStats', 'Library/Values',
+    'Playlist/Files', 'Playlists/List',
+}
+_readonly_actions = {'mpl', 'serialize'}
+
+# Commands that only report state, so sending them twice has no effect,
+# but whose results change with playback and must not be cached
+_getters = {
+    'Alive', 'Authenticate',
+    'Audio/GetDevice', 'Audio/ListDevices',
+    'Library/GetRevision', 'Library/List',
+    'Playback/Info', 'Playback/Playlist', 'Playback/Zones',
+    'UserInterface/Info',
+}
+
+
+# Precomputed case-insensitive lookups, cheap enough to build at import
+#   _categories: lowercase category -> category
+#   _commands: lowercase command -> category (the last category wins for
+#              commands such as 'Info' that exist in several)
+#   _names: (category, lowercase command) -> command
+_categories = {}
+_commands = {}
+_names = {}
+for (cat, v) in _functions.items():
+    _categories[cat.lower()] = cat
+    for c in v:
+        _commands[c.lower()] = cat
+        _names[(cat, c.lower())] = c
+
+# Command details, built on first lookup
+_details = {}
+
+
+def _detail(cat, cmd):
+    key = (cat, cmd)
+    det = _details.get(key)
+    if det is None:
         if cat == 'Meta':
             cmdstr = cmd
         else:
             cmdstr = cat + '/' + cmd
-        details[cat][cmd] = {**_functions[cat][cmd], 'cmdstr': cmdstr}
+        det = _details[key] = {**_functions[cat][cmd], 'cmdstr': cmdstr, 'readonly': cmdstr in _readonly}
+    return det
 
 
+def lookup(cmd, cat=None):
+    """Finds a command, case-insensitively
+
+    Returns a (category, details) tuple. The category is None if it does not
+    exist, or could not be found from the command when not given, and the
+    details are None if the category has no such command.
+    """
+    cmd = str(cmd).lower()
+    if cat is None:
+        cat = _commands.get(cmd)
+    else:
+        cat = _categories.get(str(cat).lower())
+    if cat is None:
+        return (None, None)
+    name = _names.get((cat, cmd))
+    if name is None:
+        return (cat, None)
+    return (cat, _detail(cat, name))
+
+
+def __getattr__(name):
+    # details and categorybycommand are case-insensitive dictionaries from
+    # requests, which is slow to import, so they are only built when used
+    if name == 'details':
+        from requests.structures import CaseInsensitiveDict
+        d = CaseInsensitiveDict()
+        for cat in _functions:
+            d[cat] = CaseInsensitiveDict()
+            for cmd in _functions[cat]:
+                d[cat][cmd] = _detail(cat, cmd)
+        globals()['details'] = d
+        return d
+    if name == 'categorybycommand':
+        from requests.structures import CaseInsensitiveDict
+        d = CaseInsensitiveDict()
+        for (k, v) in _functions.items():
+            for c in v:
+                d[c] = k
+        globals()['categorybycommand'] = d
+        return d
+    raise AttributeError("module '{}' has no attribute '{}'".format(__name__, name))
+
+
+def is_readonly(det, params):
+    """Returns True if a command with these parameters only reads library data
+
+    det is an entry of details and params the parameters the command will be sent with.
+    """
+    if not det['readonly']:
+        return False
+    action = params.get('Action')
+    return action is None or str(action).lower() in _readonly_actions
+
+
+def is_idempotent(det, params):
+    """Returns True if a command with these parameters can safely be sent more than once
+
+    Read-only commands (see is_readonly) and commands which only report the
+    server's state qualify, anything else might change it again on a repeat.
+    """
+    return det['cmdstr'] in _getters or is_readonly(det, params)
 
-# Find the category by the command string
-categorybycommand = CaseInsensitiveDict(name='command_categories')
-for (k, v) in _functions.items():
-    for c in v:
-        categorybycommand[c] = k
 
+# Find the category by the command string
 def categoryof(cmd):
-    if cmd in categorybycommand:
-        return categorybycommand[cmd]
-    else:
-        return None
+    return _commands.get(str(cmd).lower())
 
 
 # Helper functions for command details
@@ -794,24 +888,22 @@ def param_count(command, category=None):
 
     if command == None:
         raise NullCommandException
-    if category == None:
-        category = categorybycommand(command)
-    if category == None:
+    category, det = lookup(command, category)
+    if det == None:
         raise BadCommandException
 
-    return len(details[category][command]['params'])
+    return len(det['params'])
 
 
 def expected_response_count(command, category=None):
 
     if command == None:
         raise NullCommandException
-    if category == None:
-        category = categorybycommand(command)
-    if category == None:
+    category, det = lookup(command, category)
+    if det == None:
         raise BadCommandException
 
-    return len(details[category][command]['response'])
+    return len(det['response'])
 
 
 """
@@ -0,0 +1,200 @@
+"""
+jrivermcws.columns
+~~~~~~~~~~~~~~~~~~
+
+Typed columns of selected fields from MPL file lists
+
+~~~~~~~~~~~~~~~
+
+Copyright Michael Adkins 2017
+Distributed under the MIT License.
+See accompanying file LICENSE.md file or copy at http://opensource.org/licenses/MIT
+
+"""
+
+from array import array
+from collections import OrderedDict
+from .api import get_client
+from .keys import numpy_backend
+from .schema import STRING, INTEGER, FLOAT
+from .table import Table
+
+# Types of the standard numeric fields as they appear in an MPL, all others are strings.
+# Date is a day count since 1899-12-30, the other dates are unix timestamps.
+field_types = {
+    'Key': INTEGER,
+    'Bit Depth': INTEGER,
+    'Bitrate': INTEGER,
+    'BPM': INTEGER,
+    'Channels': INTEGER,
+    'Date': FLOAT,
+    'Date Created': INTEGER,
+    'Date Imported': INTEGER,
+    'Date Modified': INTEGER,
+    'Disc #': INTEGER,
+    'Duration': FLOAT,
+    'File Size': INTEGER,
+    'Last Played': INTEGER,
+    'Last Skipped': INTEGER,
+    'Number Plays': INTEGER,
+    'Rating': INTEGER,
+    'Sample Rate': INTEGER,
+    'Skip Count': INTEGER,
+    'Track #': INTEGER,
+}
+
+
+def convert(values, type, np=None, missing=0):
+    """Converts a list of field value strings to a typed column
+
+    FLOAT columns become float64 arrays with NaN for missing values, INTEGER
+    columns int64 arrays with missing values set to missing. Both are NumPy
+    arrays if np is the numpy module and stdlib arrays otherwise. STRING
+    columns are returned as a list with None for missing values.
+    """
+    if type == FLOAT:
+        if np:
+            return np.array([v if v else 'nan' for v in values], dtype=np.float64)
+        return array('d', [float(v) if v else float('nan') for v in values])
+    if type == INTEGER:
+        if np:
+            # Parsed as floats so values written as '12.0' are accepted
+            a = np.array([v if v else 'nan' for v in values], dtype=np.float64)
+            a[np.isnan(a)] = missing
+            return a.astype(np.int64)
+        try:
+            return array('q', [int(v) if v else missing for v in values])
+        except ValueError:
+            return array('q', [int(float(v)) if v else missing for v in values])
+    return list(values)
+
+
+class Columns(object):
+    """Typed columns of the fields of an MPL file list
+
+    Numeric fields are held in NumPy arrays when numpy is installed, and in
+    stdlib arrays otherwise, so aggregates over a large library run on the
+    arrays rather than on millions of strings. See select.
+
+    Examples
+    --------
+    from jrivermcws import columns
+
+    cols = columns.select(['Artist', 'Duration', 'Rating'], query='[Media Type]=[Audio]', client=c)
+    cols['Duration'].sum() / 3600                       # hours of audio, with numpy
+    df = cols.to_dataframe()
+    df.groupby('Artist')['Rating'].mean()
+
+    """
+
+    def __init__(self, columns, length):
+        self.columns = columns
+        self._length = length
+
+    def __repr__(self):
+        return '<Columns [{} items, {} fields]>'.format(self._length, len(self.columns))
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def __iter__(self):
+        return iter(self.columns)
+
+    @property
+    def fields(self):
+        return list(self.columns)
+
+    def to_dict(self):
+        """Returns the columns as a dictionary of lists"""
+        return OrderedDict((name, c.tolist() if hasattr(c, 'tolist') else list(c)) for (name, c) in self.columns.items())
+
+    def to_dataframe(self):
+        """Returns the columns as a pandas.DataFrame
+
+        :raises ImportError: If pandas is not installed.
+        """
+        try:
+            import pandas
+        except ImportError:
+            raise ImportError('pandas is required for to_dataframe')
+        return pandas.DataFrame(self.columns)
+
+    @classmethod
+    def from_items(cls, items, fields=None, types=None, use_numpy=None, missing=0):
+        """Builds typed columns from an iterable of mappings, such as Result.iter_items()
+
+        Arguments
+        ----------
+        items : iterable
+            mappings of field name to value string
+        fields (optional = None) : list
+            the fields to keep, every field found if not given
+        types (optional = None) : dict
+            field name to jrivermcws.schema.INTEGER, FLOAT or STRING, overriding field_types
+        use_numpy (optional = None) : bool
+            use NumPy arrays, by default only if numpy is installed
+        missing (optional = 0) : integer
+            the value of integer fields an item does not have
+        """
+        np = numpy_backend(use_numpy)
+        if fields is None:
+            table = Table.from_items(items)
+            strings = table.columns
+            length = len(table)
+        else:
+            strings = OrderedDict((f, []) for f in fields)
+            length = 0
+            for item in items:
+                get = item.get
+                for (f, values) in strings.items():
+                    values.append(get(f))
+                length += 1
+
+        typed = OrderedDict()
+        for (name, values) in strings.items():
+            t = types.get(name) if types and name in types else field_types.get(name, STRING)
+            typed[name] = convert(values, t, np, missing)
+        return cls(typed, length)
+
+
+def select(fields, query='', cmd='Search', cat='Files', client=None, types=None, use_numpy=None, missing=0, **kwargs):
+    """Fetches only the given fields of a file list as typed columns
+
+    The Fields parameter is filled in from fields, so the server only sends
+    those, and the response is parsed as it arrives.
+
+    Arguments
+    ----------
+    fields : list
+        the names of the fields to fetch
+    query (optional = '') : string
+        the search for Files/Search, ignored by other commands
+    cmd, cat (optional = 'Search', 'Files') : string
+        any command returning an MPL, e.g. 'Files' in 'Browse' or 'Current' in 'Files'
+    client (optional) : jrivermcws.api.Client
+        the client to send through, the shared client for the default server if not given
+    types, use_numpy, missing :
+        see Columns.from_items
+    kwargs :
+        additional parameters sent with the command
+
+    Returns
+    -------
+    A Columns object
+
+    :raises IOError: If the request fails.
+    """
+    fields = list(fields)
+    client = get_client() if client is None else client
+    if cmd.lower() == 'search':
+        kwargs['Query'] = query
+    r = client.request(cmd, cat, stream=True, Fields=','.join(fields), **kwargs)
+    if not r:
+        raise IOError('Could not list files: {}'.format(r))
+    return Columns.from_items(r.iter_items(), fields, types, use_numpy, missing)
@@ -0,0 +1,193 @@
+"""
+jrivermcws.download
+~~~~~~~~~~~~~~~~~~~
+
+Streams File/GetFile media to disk, resuming partial downloads
+
+~~~~~~~~~~~~~~~
+
+Copyright Michael Adkins 2017
+Distributed under the MIT License.
+See accompanying file LICENSE.md file or copy at http://opensource.org/licenses/MIT
+
+"""
+
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from .api import Client, get_client
+from .outcomes import Outcome, Report
+
+default_chunk_size = 2**20
+default_workers = 4
+_partial = '.part'
+
+
+class DownloadResult(Outcome, namedtuple('DownloadResult', ['file', 'path', 'bytes', 'resumed_from', 'elapsed', 'error'])):
+    """The outcome of downloading one file
+
+    bytes is the number of bytes transferred by this call, resumed_from the
+    size of the partial download it continued from.
+    """
+    __slots__ = ()
+
+
+class DownloadReport(Report):
+    """Results and aggregate throughput of download_many, in input order"""
+
+    def __init__(self, results, elapsed, progress_error=None):
+        super(DownloadReport, self).__init__(results, elapsed)
+        # The exception raised by the progress callback, if any, after which it was no longer called
+        self.progress_error = progress_error
+
+    def __repr__(self):
+        return '<DownloadReport {} ok, {} failed, {} bytes in {:.2f}s ({:.1f} MB/s)>'.format(
+            len(self.succeeded), len(self.failed), self.bytes, self.elapsed, self.rate / 1e6)
+
+    @property
+    def results(self):
+        return self.items
+
+    @property
+    def bytes(self):
+        return sum(r.bytes for r in self.items)
+
+    @property
+    def rate(self):
+        """Bytes transferred per second over all downloads"""
+        return self.bytes / self.elapsed if self.elapsed else 0.0
+
+
+def download(file, path, client=None, chunk_size=default_chunk_size, resume=True, progress=None, **kwargs):
+    """Streams a file from File/GetFile to path holding at most chunk_size bytes in memory
+
+    Data is written to path + '.part' and renamed once complete. If a
+    partial file exists and resume is true the transfer continues from its
+    end using an HTTP Range request, starting over if the server ignores it.
+
+    Arguments
+    ----------
+    file : integer, string
+        the file key, or filename with FileType='Filename'
+    path : string
+        where to save the file
+    client (optional = None) : jrivermcws.api.Client
+        the client to download through, the shared default server client if not given
+    chunk_size (optional = 1 MiB) : integer
+        the size of the chunks read from the socket
+    resume (optional = True) : bool
+        continue a previous partial download
+    progress (optional = None) : callable
+        called as progress(file, nbytes) after each chunk is written
+    kwargs :
+        additional parameters for File/GetFile, e.g. Conversion or FileType
+
+    Returns
+    -------
+    A DownloadResult, raises an IOError if the transfer fails. The partial
+    file is kept so the download can be resumed.
+    """
+    client = get_client() if client is None else client
+    start = time.perf_counter()
+    partial = path + _partial
+    offset = os.path.getsize(partial) if resume and os.path.exists(partial) else 0
+
+    headers = {'Range': 'bytes={}-'.format(offset)} if offset else None
+    r = client.request('GetFile', cat='File', File=file, stream=True, headers=headers, **kwargs)
+    if r.response is not None and offset and r.response.status_code == 416:
+        # Nothing left to fetch
+        r.response.close()
+        os.replace(partial, path)
+        return DownloadResult(file, path, 0, offset, time.perf_counter() - start, None)
+    if not r:
+        raise IOError('Could not download file {}: {}'.format(file, r if r.response is not None else 'no response'))
+
+    if offset and r.response.status_code != 206:
+        offset = 0
+    expected = r.response.headers.get('Content-Length')
+
+    written = 0
+    try:
+        with open(partial, 'ab' if offset else 'wb') as f:
+            for chunk in r.response.iter_content(chunk_size):
+                f.write(chunk)
+                written += len(chunk)
+                if progress is not None:
+                    progress(file, len(chunk))
+    finally:
+        r.response.close()
+
+    if expected is not None and written != int(expected):
+        raise IOError('Download of file {} interrupted after {} of {} bytes'.format(file, written, expected))
+    os.replace(partial, path)
+    return DownloadResult(file, path, written, offset, time.perf_counter() - start, None)
+
+
+def download_many(items, client=None, workers=default_workers, chunk_size=default_chunk_size, resume=True, progress=None, **kwargs):
+    """Downloads many files concurrently, see download
+
+    Arguments
+    ----------
+    items : iterable
+        (file, path) pairs
+    workers (optional = 4) : integer
+        the number of downloads running at once
+    progress (optional = None) : callable
+        called as progress(total_bytes, rate) with the bytes transferred by all
+        downloads so far and the aggregate bytes per second. If it raises it
+        is not called again and the exception is kept as
+        DownloadReport.progress_error
+
+    Returns
+    -------
+    A DownloadReport. Failed downloads, including items which are not
+    (file, path) pairs, are recorded with their error and do not stop the
+    others.
+    """
+    owned = client is None
+    if owned:
+        client = Client(pool_size=workers)
+
+    start = time.perf_counter()
+    lock = threading.Lock()
+    total = 0
+    progress_error = None
+
+    def chunk_done(file, nbytes):
+        nonlocal total, progress, progress_error
+        with lock:
+            total += nbytes
+            done = total
+            callback = progress
+        if callback is None:
+            return
+        elapsed = time.perf_counter() - start
+        try:
+            callback(done, done / elapsed if elapsed else 0.0)
+        except Exception as e:
+            with lock:
+                if progress is not None:
+                    progress = None
+                    progress_error = e
+
+    def fetch(item):
+        t = time.perf_counter()
+        try:
+            (file, path) = item
+        except Exception as e:
+            return DownloadResult(item, None, 0, 0, 0.0, e)
+        try:
+            return download(file, path, client, chunk_size, resume, chunk_done, **kwargs)
+        except Exception as e:
+            return DownloadResult(file, path, 0, 0, time.perf_counter() - t, e)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(fetch, items))
+    finally:
+        if owned:
+            client.close()
+
+    return DownloadReport(results, time.perf_counter() - start, progress_error)
@@ -31,3 +31,18 @@ class MissingParametersException(BadCommandException):
 class FailedAuthenticationException(ValueError):
     """Username or password incorrect or no auth?"""
     pass
+
+
+class BadSearchException(ValueError):
+    """A search expression could not be parsed"""
+    pass
+
+
+class UnknownParameterException(BadCommandException):
+    """A parameter that the command does not take was passed"""
+    pass
+
+
+class InvalidParameterException(BadCommandException):
+    """A parameter value is not valid for the command"""
+    pass
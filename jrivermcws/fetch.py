@@ -0,0 +1,218 @@
+"""
+jrivermcws.fetch
+~~~~~~~~~~~~~~~~
+
+Downloads a whole library as concurrent partitions
+
+~~~~~~~~~~~~~~~
+
+Copyright Michael Adkins 2017
+Distributed under the MIT License.
+See accompanying file LICENSE.md file or copy at http://opensource.org/licenses/MIT
+
+"""
+
+import multiprocessing
+import time
+import xml.etree.ElementTree as xmletree
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from .api import get_client
+from .keys import FileKeys, search as search_keys
+from .table import Table
+
+default_workers = 4
+
+# A command returning an MPL of part of the library
+Partition = namedtuple('Partition', ['cmd', 'cat', 'params'])
+
+# The outcome of fetch_library
+#   table       a jrivermcws.table.Table of the files in key order
+#   partitions  the number of partitions fetched
+#   duplicates  items dropped because an earlier partition already held their key
+#   recovered   files not in any partition, fetched afterwards when checking
+#   elapsed     seconds taken
+Fetched = namedtuple('Fetched', ['table', 'partitions', 'duplicates', 'recovered', 'elapsed'])
+
+
+def key_partitions(keys, count):
+    """Splits a library into count searches over ranges of file keys
+
+    Ranges are chosen to hold about the same number of files each.
+
+    Arguments
+    ----------
+    keys : iterable
+        the file keys of the library, e.g. from jrivermcws.keys.search('')
+    count : integer
+        the number of partitions
+    """
+    keys = FileKeys(keys).unique().tolist()
+    if not keys:
+        return []
+    count = max(1, min(count, len(keys)))
+    size = -(-len(keys) // count)
+    parts = []
+    for i in range(0, len(keys), size):
+        chunk = keys[i:i + size]
+        parts.append(Partition('Search', 'Files', {'Query': '[Key]={}-{}'.format(chunk[0], chunk[-1])}))
+    return parts
+
+
+def value_partitions(field, client=None):
+    """Splits a library into one search per value of a field, e.g. 'Album'
+
+    A search for files with no value is included. Files holding several
+    values of list fields appear in more than one partition, fetch_library
+    drops the duplicates.
+    """
+    client = get_client() if client is None else client
+    r = client.request('Values', cat='Library', Field=field)
+    if not r:
+        raise IOError('Could not list values of {}: {}'.format(field, r))
+    values = r.parsed(collapse_singles=False).get('Items', [])
+    parts = [Partition('Search', 'Files', {'Query': '[{}]=[{}]'.format(field, v)}) for v in values]
+    parts.append(Partition('Search', 'Files', {'Query': '[{}]=[]'.format(field)}))
+    return parts
+
+
+def browse_partitions(id=None, client=None):
+    """Splits a library into the files of each child of a browse node, the root by default"""
+    client = get_client() if client is None else client
+    params = {} if id is None else {'ID': id}
+    r = client.request('Children', cat='Browse', **params)
+    if not r:
+        raise IOError('Could not browse {}: {}'.format(id, r))
+    # Children are listed as <Item Name="name">id</Item>
+    return [Partition('Files', 'Browse', {'ID': child}) for (name, child) in r.parsed().items() if name != 'Status']
+
+
+def _runs(library, missing):
+    # (first, last) keys of each run of consecutive library keys that are all missing
+    runs = []
+    first = last = None
+    for k in library.unique():
+        if k in missing:
+            if first is None:
+                first = k
+            last = k
+        elif first is not None:
+            runs.append((first, last))
+            first = None
+    if first is not None:
+        runs.append((first, last))
+    return runs
+
+
+def parse_items(content):
+    """Parses an MPL body into a list of dictionaries of field name to value
+
+    A module level function so it can run in a process pool.
+    """
+    root = xmletree.fromstring(content)
+    return [dict((f.get('Name'), f.text) for f in item.iter('Field')) for item in root.iter('Item')]
+
+
+def fetch_library(partitions=None, client=None, workers=default_workers, processes=0, fields=None, check=True):
+    """Downloads every file in a library by fetching partitions of it concurrently
+
+    The partitions are fetched by up to workers threads, parsed in those
+    threads or in a pool of processes, and merged by file key as they
+    complete, so a key found in several partitions is kept once.
+
+    Arguments
+    ----------
+    partitions (optional = None) : list
+        Partitions to fetch, see key_partitions, value_partitions and
+        browse_partitions. By default the library is split into key ranges,
+        four per worker
+    client (optional = None) : jrivermcws.api.Client
+        the client to send through, the shared default server client if not
+        given. Its pool_size should be at least workers
+    workers (optional = 4) : integer
+        the number of partitions downloaded at once
+    processes (optional = 0) : integer
+        parse responses in a pool of this many processes rather than in the
+        download threads, worthwhile for large libraries as parsing holds the
+        GIL. The processes are spawned, so a script using this must guard its
+        entry point with if __name__ == '__main__'
+    fields (optional = None) : list
+        only fetch these fields, Key is always included
+    check (optional = True) : bool
+        compare the result with the library's file keys and fetch any file
+        no partition returned, so an incomplete partitioning loses nothing
+
+    Returns
+    -------
+    A Fetched tuple
+
+    Examples
+    --------
+    from jrivermcws.fetch import fetch_library, value_partitions
+
+    f = fetch_library(client=jr.Client(pool_size=8), workers=8, processes=4)
+    print(len(f.table), f.elapsed)
+
+    f = fetch_library(value_partitions('Album Artist (auto)'), fields=['Name', 'Album', 'Duration'])
+
+    """
+    client = get_client() if client is None else client
+    start = time.perf_counter()
+
+    params = {}
+    if fields is not None:
+        params['Fields'] = ','.join(['Key'] + [f for f in fields if f != 'Key'])
+
+    library = None
+    if check or partitions is None:
+        library = search_keys('', client)
+    if partitions is None:
+        partitions = key_partitions(library, workers * 4)
+
+    # Workers are started on the first submit, from a download thread, and forking while other
+    # threads hold locks can deadlock the child, so start them fresh instead
+    pool = ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context('spawn')) if processes else None
+
+    def fetch(cmd, cat, kwargs):
+        r = client.request(cmd, cat, **dict(params, **kwargs))
+        if not r:
+            raise IOError('Could not fetch {}/{} {}: {}'.format(cat, cmd, kwargs, r))
+        if pool is not None:
+            return pool.submit(parse_items, r.response.content).result()
+        return parse_items(r.response.content)
+
+    merged = {}
+
+    def merge(futures):
+        # Adds the items of each partition as it completes, returns how many were already present
+        duplicates = 0
+        for future in as_completed(futures):
+            for item in future.result():
+                key = int(item['Key'])
+                if key in merged:
+                    duplicates += 1
+                else:
+                    merged[key] = item
+        return duplicates
+
+    recovered = 0
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            duplicates = merge([executor.submit(fetch, p.cmd, p.cat, p.params) for p in partitions])
+
+            if check:
+                before = len(merged)
+                missing = set(library - FileKeys(merged))
+                if missing:
+                    # Fetch the gaps as key ranges first and anything still missing one by one
+                    runs = _runs(library, missing)
+                    merge([executor.submit(fetch, 'Search', 'Files', {'Query': '[Key]={}-{}'.format(*r)}) for r in runs])
+                    missing.difference_update(merged)
+                    merge([executor.submit(fetch, 'GetInfo', 'File', {'File': k}) for k in missing])
+                recovered = len(merged) - before
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    table = Table.from_items(merged[k] for k in sorted(merged))
+    return Fetched(table, len(partitions), duplicates, recovered, time.perf_counter() - start)
@@ -0,0 +1,176 @@
+"""
+jrivermcws.group
+~~~~~~~~~~~~~~~~
+
+Sends commands to many MCWS servers at once
+
+~~~~~~~~~~~~~~~
+
+Copyright Michael Adkins 2017
+Distributed under the MIT License.
+See accompanying file LICENSE.md file or copy at http://opensource.org/licenses/MIT
+
+"""
+
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from .api import Client, resolve_command, default_username, default_password
+from .outcomes import Outcome, Report
+
+
+class Reply(Outcome, namedtuple('Reply', ['server', 'result', 'elapsed', 'error'])):
+    """The answer of one server in a group
+
+    result is the jrivermcws.models.Result or None if an exception was raised,
+    in which case error holds the exception. elapsed is the seconds the
+    server took to answer.
+    """
+    __slots__ = ()
+
+
+class GroupResult(Report):
+    """Per-server replies, in group order, to a command sent to a ServerGroup"""
+
+    def __repr__(self):
+        return '<GroupResult {} ok, {} failed in {:.3f}s>'.format(len(self.succeeded), len(self.failed), self.elapsed)
+
+    def __getitem__(self, server):
+        """Returns the Reply of a server, given by its address or position in the group"""
+        if isinstance(server, int):
+            return self.items[server]
+        for r in self.items:
+            if r.server == server:
+                return r
+        raise KeyError(server)
+
+    @property
+    def replies(self):
+        return self.items
+
+    @property
+    def slowest(self):
+        return max(self.items, key=lambda r: r.elapsed, default=None)
+
+
+class ServerGroup(object):
+    """A set of MCWS servers controlled together
+
+    Commands are sent to every server concurrently, each through its own
+    pooled Client, so a group action takes about as long as the slowest
+    server's round trip rather than the sum of them all.
+
+    Arguments
+    ----------
+    servers : iterable
+        server addresses ('http://host:52199/MCWS/v1/') or jrivermcws.api.Client
+        objects, which are not closed with the group
+    username : string
+        the username for servers given by address
+    password : string
+        the password for servers given by address
+    kwargs :
+        additional keyword arguments are passed to the Client of each server
+        given by address, e.g. timeout=(1, 5)
+
+    Examples
+    --------
+    from jrivermcws.group import ServerGroup
+
+    rooms = ServerGroup(['http://bar:52199/MCWS/v1/', 'http://lobby:52199/MCWS/v1/'], 'mz', 'pass')
+    rooms.authenticate()                                # optional, saves a round trip on first use
+    rooms.request('Stop', cat='Playback')
+    r = rooms.request('Volume', cat='Playback', Level=0.5,
+                      variants={'http://lobby:52199/MCWS/v1/': {'Level': 0.3}})
+    for reply in r.failed:
+        print(reply.server, reply.error or reply.result)
+
+    """
+
+    def __init__(self, servers, username=default_username, password=default_password, **kwargs):
+        self.clients = []
+        # Clients created by the group, which it closes
+        self._owned = []
+        for s in servers:
+            if isinstance(s, Client):
+                self.clients.append(s)
+            else:
+                c = Client(s, username, password, **kwargs)
+                self.clients.append(c)
+                self._owned.append(c)
+        # One thread per server so every command goes out at once
+        self._executor = ThreadPoolExecutor(max_workers=max(1, len(self.clients)))
+
+    def __repr__(self):
+        return '<ServerGroup [{} servers]>'.format(len(self.clients))
+
+    def __len__(self):
+        return len(self.clients)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def servers(self):
+        return [c.server for c in self.clients]
+
+    def close(self):
+        """Closes the connections of the clients the group created
+
+        Clients passed in are left open for the caller to close.
+        """
+        self._executor.shutdown(wait=False)
+        for c in self._owned:
+            c.close()
+
+    def _each(self, call):
+        # Runs call(client) for every client concurrently and collects Replies
+        def run(client):
+            start = time.perf_counter()
+            try:
+                result = call(client)
+                return Reply(client.server, result, time.perf_counter() - start, None)
+            except Exception as e:
+                return Reply(client.server, None, time.perf_counter() - start, e)
+
+        start = time.perf_counter()
+        replies = list(self._executor.map(run, self.clients))
+        return GroupResult(replies, time.perf_counter() - start)
+
+    def authenticate(self):
+        """Fetches a token from every server concurrently
+
+        Returns a GroupResult whose results are the tokens.
+        """
+        return self._each(lambda c: c.get_token())
+
+    def request(self, cmd, cat=None, variants=None, **kwargs):
+        """Sends a command to every server in the group concurrently
+
+        Takes the same arguments as jrivermcws.api.Client.request. The command
+        and its parameters are checked once first, so an unknown command or a
+        missing MCC command number raises before anything is sent.
+
+        Arguments
+        ----------
+        variants (optional = None) : dict
+            maps server addresses to parameters which replace or add to
+            kwargs for that server only
+
+        Returns
+        -------
+        A GroupResult. Failures are recorded per server and do not affect the others.
+        """
+        resolve_command(cmd, cat, False, **kwargs)
+        variants = variants or {}
+
+        def send(client):
+            params = kwargs
+            if client.server in variants:
+                params = dict(kwargs, **variants[client.server])
+            return client.request(cmd, cat, **params)
+
+        return self._each(send)
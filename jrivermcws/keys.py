@@ -0,0 +1,243 @@
+"""
+jrivermcws.keys
+~~~~~~~~~~~~~~~
+
+Compact file key lists from Action=Serialize responses
+
+~~~~~~~~~~~~~~~
+
+Copyright Michael Adkins 2017
+Distributed under the MIT License.
+See accompanying file LICENSE.md file or copy at http://opensource.org/licenses/MIT
+
+"""
+
+from array import array
+from .api import get_client
+
+# Imported on first use as it is slow to import, False if it is not installed
+_np = None
+
+
+def _numpy():
+    global _np
+    if _np is None:
+        try:
+            import numpy
+            _np = numpy
+        except ImportError:
+            _np = False
+    return _np
+
+
+def numpy_backend(use_numpy):
+    """Returns the numpy module to build arrays with, or None for stdlib arrays
+
+    use_numpy is None to use numpy when it is installed, True to require it
+    (raising an ImportError without it) or False to never use it.
+    """
+    if use_numpy is None:
+        return _numpy() or None
+    if use_numpy:
+        np = _numpy()
+        if not np:
+            raise ImportError('numpy is required for use_numpy=True')
+        return np
+    return None
+
+
+def _np_unique(np, a):
+    # Sorted unique values, np.unique is much slower on integer arrays in some numpy versions
+    a = np.sort(a)
+    if len(a) < 2:
+        return a
+    keep = np.empty(len(a), dtype=bool)
+    keep[0] = True
+    np.not_equal(a[1:], a[:-1], out=keep[1:])
+    return a[keep]
+
+
+def _np_setop(np, op, a, b):
+    a = _np_unique(np, a)
+    b = _np_unique(np, b)
+    if op == 'intersection':
+        return np.intersect1d(a, b, assume_unique=True)
+    if op == 'union':
+        return _np_unique(np, np.concatenate((a, b)))
+    if op == 'difference':
+        if not len(b):
+            return a
+        i = np.minimum(np.searchsorted(b, a), len(b) - 1)
+        return a[b[i] != a]
+    # symmetric_difference, the values found in only one of the sorted unique arrays
+    both = np.sort(np.concatenate((a, b)))
+    single = np.ones(len(both), dtype=bool)
+    if len(both) > 1:
+        dup = both[1:] == both[:-1]
+        single[1:] &= ~dup
+        single[:-1] &= ~dup
+    return both[single]
+
+
+class FileKeys(object):
+    """A list of file keys held in a compact integer array
+
+    keys is an array('l'), or a NumPy int64 array when numpy is installed,
+    so large libraries take a few bytes per file rather than a Python object
+    each. Set operations work directly on the arrays and return FileKeys of
+    sorted unique keys, they also accept any iterable of keys.
+
+    Arguments
+    ----------
+    keys (optional = ()) : iterable
+        the file keys, an array('l') or numpy array of the right backend is used as is
+    position (optional = -1) : integer
+        the index of the active file as reported by the server, -1 if none
+    use_numpy (optional = None) : bool
+        store the keys in a numpy array, by default only if numpy is installed
+
+    Examples
+    --------
+    from jrivermcws import keys
+
+    jazz = keys.search('[Genre]=[Jazz]', client=c)
+    rated = keys.search('[Rating]=>3', client=c)
+    for k in jazz & rated:
+        print(k)
+
+    c.request('PlayByKey', cat='Playback', Key=(jazz - rated).join())
+
+    """
+
+    def __init__(self, keys=(), position=-1, use_numpy=None):
+        self.position = position
+        self._np = numpy_backend(use_numpy)
+        if self._np:
+            if not isinstance(keys, self._np.ndarray):
+                keys = self._np.fromiter(keys, dtype=self._np.int64)
+        elif not isinstance(keys, array):
+            keys = array('l', keys)
+        self.keys = keys
+
+    def __repr__(self):
+        return '<FileKeys [{} keys]>'.format(len(self.keys))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __iter__(self):
+        return (int(k) for k in self.keys)
+
+    def __getitem__(self, i):
+        return int(self.keys[i])
+
+    def __contains__(self, key):
+        return key in self.keys
+
+    def __eq__(self, other):
+        if not isinstance(other, FileKeys):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for (a, b) in zip(self, other))
+
+    def tolist(self):
+        return [int(k) for k in self.keys]
+
+    def join(self, sep=','):
+        """Returns the keys as a delimited string, e.g. for the Key parameter of Playback/PlayByKey"""
+        return sep.join(str(k) for k in self)
+
+    def unique(self):
+        """Returns the sorted unique keys"""
+        if self._np:
+            return self._wrap(_np_unique(self._np, self.keys))
+        return self._wrap(array('l', sorted(set(self.keys))))
+
+    def _other(self, other):
+        if isinstance(other, FileKeys):
+            other = other.keys
+        if self._np:
+            if isinstance(other, self._np.ndarray):
+                return other.astype(self._np.int64, copy=False)
+            return self._np.fromiter(other, dtype=self._np.int64)
+        return set(other)
+
+    def _wrap(self, keys):
+        k = FileKeys.__new__(FileKeys)
+        k.position = -1
+        k._np = self._np
+        k.keys = keys
+        return k
+
+    def _setop(self, other, op):
+        other = self._other(other)
+        if self._np:
+            return self._wrap(_np_setop(self._np, op, self.keys, other))
+        return self._wrap(array('l', sorted(getattr(set, op)(set(self.keys), other))))
+
+    def intersection(self, other):
+        return self._setop(other, 'intersection')
+
+    def union(self, other):
+        return self._setop(other, 'union')
+
+    def difference(self, other):
+        return self._setop(other, 'difference')
+
+    def symmetric_difference(self, other):
+        return self._setop(other, 'symmetric_difference')
+
+    __and__ = intersection
+    __or__ = union
+    __sub__ = difference
+    __xor__ = symmetric_difference
+
+
+def decode(data, use_numpy=None):
+    """Decodes an Action=Serialize response body into FileKeys
+
+    The body is 'version;count;position;key;key;...', given as bytes or a string.
+    Any version is accepted as long as the rest of the body has this layout.
+
+    :raises ValueError: If the body is not a serialized key list.
+    """
+    if isinstance(data, str):
+        data = data.encode('ascii')
+    parts = data.strip().split(b';')
+    try:
+        if len(parts) < 3:
+            raise ValueError
+        int(parts[0])
+        count = int(parts[1])
+        position = int(parts[2])
+    except ValueError:
+        raise ValueError('Not a serialized file list: {!r}'.format(data[:40]))
+    values = parts[3:3 + count]
+    if len(values) != count or (count and not values[-1]):
+        raise ValueError('Serialized file list holds fewer than {} keys'.format(count))
+
+    np = numpy_backend(use_numpy)
+    if np:
+        keys = np.fromiter(map(int, values), dtype=np.int64, count=count)
+    else:
+        keys = array('l', map(int, values))
+    return FileKeys(keys, position, use_numpy)
+
+
+def request(cmd, cat=None, client=None, use_numpy=None, **kwargs):
+    """Sends a command with Action=Serialize and returns the FileKeys it lists
+
+    Works with the commands returning file lists, e.g. Files/Search,
+    Files/Current, Browse/Files, Playlist/Files and File/GetInfo.
+
+    :raises IOError: If the request fails.
+    """
+    client = get_client() if client is None else client
+    r = client.request(cmd, cat, Action='Serialize', **kwargs)
+    if not r:
+        raise IOError('Could not list file keys: {}'.format(r))
+    return r.file_keys(use_numpy)
+
+
+def search(query, client=None, use_numpy=None, **kwargs):
+    """Returns the FileKeys of the files matching a search, see request"""
+    return request('Search', 'Files', client, use_numpy, Query=query, **kwargs)
@@ -12,24 +12,75 @@ See accompanying file LICENSE.md file or copy at http://opensource.org/licenses/
 
 """
 
-import xml.etree.ElementTree as xmletree
-import xmltodict
+import time
 from . import cmds
+from .table import Table
 from collections import OrderedDict
 
 
+def build_response(url, status, reason, headers, encoding, content):
+    """Creates a requests.Response around an already downloaded body so Result works unchanged"""
+    from requests.models import Response
+    from requests.structures import CaseInsensitiveDict
+    r = Response()
+    r.url = url
+    r.status_code = status
+    r.reason = reason
+    r.headers = CaseInsensitiveDict(headers)
+    r.encoding = encoding
+    r._content = content
+    r._content_consumed = True
+    return r
+
+
+def etree_to_dict(elem):
+    """Converts an element to nested OrderedDicts laid out as xmltodict.parse would
+
+    Attributes become '@name' keys, repeated child tags become lists, text
+    alongside attributes or children is stored under '#text' and elements
+    with neither are replaced by their stripped text (or None).
+    """
+    item = OrderedDict(('@' + k, v) for (k, v) in elem.attrib.items())
+    for child in elem:
+        value = etree_to_dict(child)
+        if child.tag in item:
+            existing = item[child.tag]
+            if isinstance(existing, list):
+                existing.append(value)
+            else:
+                item[child.tag] = [existing, value]
+        else:
+            item[child.tag] = value
+    data = (elem.text or '') + ''.join(c.tail or '' for c in elem)
+    data = data.strip() or None
+    if not item:
+        return data
+    if data:
+        item['#text'] = data
+    return item
+
+
 class Result(object):
 
     __attrs__ = [
         'cmd', 'cat', 'response'
     ]
 
-    def __init__(self, cat=None, cmd=None, response=None):
+    def __init__(self, cat=None, cmd=None, response=None, record=None):
 
         self.cmd = cmd
         self.category = cat
         self.response = response
 
+        # Called with (phase, seconds) to time parsing, see jrivermcws.stats
+        self.record = record
+
+        # Parsed views, built on first access
+        self._root = None
+        self._json = None
+        self._parsed = {}
+        self._released = False
+
     def __repr__(self):
         return '<Result of {}/{} [{}]>'.format(self.category, self.cmd, self.response.status_code)
 
@@ -39,25 +90,79 @@ class Result(object):
         if self.response is None: return False
         return self.response.ok
 
+    @property
+    def text(self):
+        """The response body
+
+        After release() this is rebuilt from the parsed tree.
+        """
+        if not self._released:
+            return self.response.text
+        import xml.etree.ElementTree as xmletree
+        return xmletree.tostring(self._root, encoding='unicode')
+
+    def _tree(self):
+        """Parses the body once"""
+        if self._root is None:
+            import xml.etree.ElementTree as xmletree
+            if self.record is None:
+                self._root = xmletree.fromstring(self.response.content)
+            else:
+                start = time.perf_counter()
+                self._root = xmletree.fromstring(self.response.content)
+                self.record('parse', time.perf_counter() - start)
+        return self._root
+
+    def release(self):
+        """Parses the body and drops this result's reference to the raw content
+
+        For large responses which are kept after parsing. response is replaced
+        by a copy with an empty body, the response object originally given is
+        not modified, so the memory is only freed once nothing else holds it.
+
+        :raises ValueError: If the response body does not contain valid xml.
+        """
+        if self._released or self.response is None:
+            return
+        self._tree()
+        r = self.response
+        self.response = build_response(r.url, r.status_code, r.reason, r.headers, r.encoding, b'')
+        self._released = True
+
     def xml(self, **kwargs):
         """Returns an xml.etree.ElementTree parsing of the content
 
+        The same element is returned on every call.
+
         :raises ValueError: If the response body does not contain valid xml.
         """
-        return xmletree.fromstring(self.response.text)
+        return self._tree()
 
     def json(self):
-        """Convert the xml to json/dictionary"""
-        j = xmltodict.parse(self.response.text)
-        if 'Response' in j:
-            return j['Response']
-        else:
-            return j
+        """Convert the xml to json/dictionary
+
+        Parsed once and cached, so the returned dictionary should not be modified.
+        """
+        if self._json is None:
+            root = self._tree()
+            start = time.perf_counter() if self.record is not None else None
+            j = OrderedDict([(root.tag, etree_to_dict(root))])
+            if start is not None:
+                self.record('json', time.perf_counter() - start)
+            if 'Response' in j:
+                self._json = j['Response']
+            else:
+                self._json = j
+        return self._json
 
     def dict(self):
         return self.json()
 
     def parsed(self, collapse_singles=True):
+        """Simplified dictionary of the response items, cached per collapse_singles"""
+        if collapse_singles in self._parsed:
+            return self._parsed[collapse_singles]
+
         j = self.json()
         r = OrderedDict()
 
@@ -71,8 +176,82 @@ class Result(object):
         elif 'Item' in j:
             r = self.parse_json(j['Item'], collapse_singles)
 
+        self._parsed[collapse_singles] = r
         return r
 
+    def iter_items(self, chunk_size=65536):
+        """Yields each <Item> of an MPL response as an OrderedDict of field name to value
+
+        Items are parsed as the body arrives and discarded once yielded, so
+        memory use does not grow with the size of the response. Send the
+        command with stream=True to read directly from the socket, otherwise
+        the already downloaded body is parsed the same way.
+
+        Stopping iteration early closes the response and drops the rest of
+        the body.
+        """
+        if self.response is None:
+            return
+        if self._root is not None:
+            # Already parsed, walk the cached tree
+            for elem in self._root.iter('Item'):
+                item = OrderedDict()
+                for field in elem.iter('Field'):
+                    item[field.get('Name')] = field.text
+                yield item
+            return
+        import xml.etree.ElementTree as xmletree
+        parser = xmletree.XMLPullParser(events=('start', 'end'))
+        root = None
+        start = time.perf_counter() if self.record is not None else None
+        try:
+            for chunk in self.response.iter_content(chunk_size):
+                parser.feed(chunk)
+                for event, elem in parser.read_events():
+                    if root is None:
+                        root = elem
+                    if event != 'end' or elem.tag != 'Item':
+                        continue
+                    item = OrderedDict()
+                    for field in elem.iter('Field'):
+                        item[field.get('Name')] = field.text
+                    # Drop parsed items so the tree never holds more than one
+                    root.clear()
+                    yield item
+            parser.close()
+            if start is not None:
+                self.record('parse', time.perf_counter() - start)
+        finally:
+            self.response.close()
+
+    def columns(self, fields=None, types=None, use_numpy=None):
+        """Collects the items of an MPL response into typed columns
+
+        Returns a jrivermcws.columns.Columns with numeric fields such as
+        Duration and Rating converted to arrays, see Columns.from_items.
+        """
+        from .columns import Columns
+        return Columns.from_items(self.iter_items(), fields, types, use_numpy)
+
+    def file_keys(self, use_numpy=None):
+        """Decodes the file keys of a response to a command sent with Action=Serialize
+
+        Returns a jrivermcws.keys.FileKeys holding the keys in a compact
+        integer array, a NumPy array if numpy is installed unless use_numpy is False.
+
+        :raises ValueError: If the response is not a serialized file list.
+        """
+        from .keys import decode
+        return decode(self.response.content, use_numpy)
+
+    def table(self):
+        """Collects the items of an MPL response into a compact column oriented Table
+
+        Uses iter_items so a response sent with stream=True is never held in
+        memory as a whole.
+        """
+        return Table.from_items(self.iter_items())
+
     def parse_json(self, j, collapse_singles=True):
         # Result dictionary
         r = OrderedDict()
@@ -94,7 +273,7 @@ class Result(object):
                 name = d['@Name']
                 if name not in r:
                     r[name] = []
-                r[name].append(d['#text'])
+                r[name].append(d.get('#text'))
             # Parse weird 'Field' items such as for Playlists/List query
             if 'Field' in d:
                 if 'Fields' not in r:
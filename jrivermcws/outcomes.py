@@ -0,0 +1,60 @@
+"""
+jrivermcws.outcomes
+~~~~~~~~~~~~~~~~~~~
+
+Per-item outcomes of operations sent to many files, servers or zones at once
+
+~~~~~~~~~~~~~~~
+
+Copyright Michael Adkins 2017
+Distributed under the MIT License.
+See accompanying file LICENSE.md file or copy at http://opensource.org/licenses/MIT
+
+"""
+
+
+class Outcome(object):
+    """Base of the namedtuples recording the outcome of one item
+
+    Mixed in ahead of a namedtuple with an error field, holding the exception
+    or failed Result, and optionally a result field holding the
+    jrivermcws.models.Result.
+
+    class Reply(Outcome, namedtuple('Reply', ['server', 'result', 'error'])):
+        __slots__ = ()
+    """
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        """True if no error was recorded and the result, if there is one, succeeded"""
+        return self.error is None and bool(getattr(self, 'result', True))
+
+
+class Report(object):
+    """Base of the containers of Outcomes, in input order, with the time taken"""
+
+    def __init__(self, items, elapsed):
+        self.items = items
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        return '<{} {} ok, {} failed in {:.2f}s>'.format(type(self).__name__, len(self.succeeded), len(self.failed), self.elapsed)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __bool__(self):
+        """Returns true if every item succeeded"""
+        return all(o.ok for o in self.items)
+
+    @property
+    def succeeded(self):
+        return [o for o in self.items if o.ok]
+
+    @property
+    def failed(self):
+        return [o for o in self.items if not o.ok]
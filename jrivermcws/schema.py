@@ -0,0 +1,175 @@
+"""
+jrivermcws.schema
+~~~~~~~~~~~~~~~~~
+
+Structured parameter schemas compiled from the free text command table
+in jrivermcws.cmds, used to validate parameters before a request is sent
+
+~~~~~~~~~~~~~~~
+
+Copyright Michael Adkins 2017
+Distributed under the MIT License.
+See accompanying file LICENSE.md file or copy at http://opensource.org/licenses/MIT
+
+"""
+
+import difflib
+import re
+from collections import namedtuple, OrderedDict
+from .exceptions import UnknownParameterException, InvalidParameterException
+
+# 'Name: Description. (default: value)'
+_param = re.compile(r'^(?P<name>\w+): (?P<desc>.*?)(?: \(default: (?P<default>[^()]*)\))?$', re.S)
+# '(ID: zone id; Index: zone index; Name: zone name)'
+_keyed = re.compile(r'^\s*(-?\w+): ')
+_either = re.compile(r'\((\w+) or (\w+)\)')
+_integer = re.compile(r'^-?\d+$')
+_flag_phrases = ('set to 1', 'set to one', '(0 or 1)', '1 for on and 0 for off')
+# Parameters which take comma separated file key lists although documented with an integer default
+_key_lists = {'Key', 'Keys', 'File', 'Files'}
+# Misspelled choices in the MCWS documentation, the correct spelling is also allowed
+_errata = {'Overwite': 'Overwrite'}
+
+# Parameter types
+STRING = 'string'
+INTEGER = 'integer'
+FLOAT = 'float'
+FLAG = 'flag'
+
+
+class Param(namedtuple('Param', ['name', 'type', 'default', 'choices', 'multiple', 'desc'])):
+    """A command parameter
+
+    choices is a tuple of the allowed values (compared case-insensitively) or
+    None for any value, multiple is True if the value is a comma delimited
+    list of choices.
+    """
+    __slots__ = ()
+
+
+def _choices(desc):
+    """Finds the allowed values listed in a parameter description, or None"""
+    for group in re.findall(r'\(([^()]*)\)', desc) + [desc]:
+        parts = group.split('; ')
+        keys = [_keyed.match(p) for p in parts]
+        if len(parts) > 1 and all(keys):
+            return tuple(k.group(1) for k in keys)
+    either = _either.search(desc)
+    if either:
+        return either.groups()
+    return None
+
+
+def _type_of(name):
+    # The parameter giving the kind of value of another, e.g. Zone1 -> ZoneType1
+    return re.sub(r'(\d*)$', r'Type\1', name, count=1)
+
+
+def parse_param(text, siblings=()):
+    """Parses a parameter line of the command table into a Param
+
+    siblings are the names of the other parameters of the command, a
+    parameter with a '<name>Type' sibling (or Zone1 with ZoneType1) can hold several kinds of value
+    (e.g. Zone as an ID or a name) and so is not given a numeric type.
+    """
+    m = _param.match(text)
+    if m is None:
+        name = text.split(':')[0].strip()
+        return Param(name, STRING, None, None, False, text)
+    name, desc, default = m.group('name'), m.group('desc'), m.group('default')
+    lower = desc.lower()
+    choices = _choices(desc)
+    if choices is not None:
+        choices = choices + tuple(_errata[c] for c in choices if c in _errata)
+    multiple = choices is not None and 'delimited by commas' in lower
+
+    if any(p in lower for p in _flag_phrases):
+        kind = FLAG
+        choices = None
+    elif 'decimal' in lower:
+        kind = FLOAT
+    elif default and _integer.match(default) and _type_of(name) not in siblings and name not in _key_lists:
+        kind = INTEGER
+    else:
+        kind = STRING
+    return Param(name, kind, default or None, choices, multiple, desc)
+
+
+def _checker(param):
+    """Builds a function normalizing a value of the parameter or raising InvalidParameterException"""
+    allowed = None if param.choices is None else {c.lower() for c in param.choices}
+
+    def invalid(value, expected):
+        raise InvalidParameterException("Invalid value {!r} for parameter '{}', expected {}".format(value, param.name, expected))
+
+    def check(value):
+        if value is None or value == '':
+            return value
+        if param.type == FLAG:
+            if value is True or value is False:
+                return int(value)
+            if str(value) not in ('0', '1'):
+                invalid(value, '0 or 1')
+            return value
+        if param.type == INTEGER:
+            if isinstance(value, bool) or not _integer.match(str(value).strip()):
+                invalid(value, 'an integer')
+            if allowed is not None and str(value).strip() not in allowed:
+                invalid(value, 'one of ' + ', '.join(param.choices))
+            return value
+        if param.type == FLOAT:
+            try:
+                float(value)
+            except (TypeError, ValueError):
+                invalid(value, 'a number')
+            return value
+        if allowed is not None:
+            values = str(value).split(',') if param.multiple else [str(value)]
+            for v in values:
+                if v.strip().lower() not in allowed:
+                    invalid(value, 'one of ' + ', '.join(param.choices))
+        return value
+
+    return check
+
+
+class Schema(object):
+    """The parameters of a command with precompiled validators"""
+
+    def __init__(self, cmdstr, params):
+        self.cmdstr = cmdstr
+        self.params = OrderedDict((p.name, p) for p in params)
+        self._names = {name.lower(): name for name in self.params}
+        self._checks = {name: _checker(p) for (name, p) in self.params.items()}
+
+    def __repr__(self):
+        return '<Schema {} ({})>'.format(self.cmdstr, ', '.join(self.params))
+
+    def validate(self, kwargs):
+        """Returns the parameters with canonical names and normalized values
+
+        Raises UnknownParameterException for a parameter the command does not
+        take and InvalidParameterException for a value that is not allowed.
+        """
+        validated = {}
+        for (key, value) in kwargs.items():
+            name = self._names.get(key.lower())
+            if name is None:
+                close = difflib.get_close_matches(key, list(self.params), n=1)
+                hint = " (did you mean '{}'?)".format(close[0]) if close else ''
+                raise UnknownParameterException("{} does not take a parameter '{}'{}".format(self.cmdstr, key, hint))
+            validated[name] = self._checks[name](value)
+        return validated
+
+
+# Compiled schemas by command string
+_schemas = {}
+
+
+def of(det):
+    """Returns the Schema of a command given its entry in jrivermcws.cmds.details"""
+    schema = _schemas.get(det['cmdstr'])
+    if schema is None:
+        siblings = [p.split(':')[0] for p in det['params']]
+        schema = _schemas[det['cmdstr']] = Schema(det['cmdstr'], [parse_param(p, siblings) for p in det['params']])
+    return schema
@@ -0,0 +1,374 @@
+"""
+jrivermcws.search
+~~~~~~~~~~~~~~~~~
+
+Evaluates MCWS search expressions against a local snapshot of the library
+
+Supports the parts of the JRiver search language used with Files/Search and
+Library/Values:
+
+    [Artist]=[Radiohead]        exact value (each '; ' separated value of list fields)
+    [Artist]=radio              a word in the field starts with 'radio'
+    [Name]="paranoid android"   the phrase appears in the field at a word boundary
+    [Rating]=>3  [Rating]=<3    numeric greater / less than
+    [Rating]=2-4                numeric range, inclusive
+    [Genre]=                    field is empty
+    -[Genre]=[Rock], -word      negation
+    a b, a and b, a or b, (...) boolean combinations, 'and' binds tighter
+    radiohead                   a word in any field starts with 'radiohead'
+    ~sort=[Artist],[Rating]-d   sort, descending with -d
+    ~n=10                       limit the number of results
+
+Indexes are built per field on first use: a value index for exact matches,
+a word index for prefix matches and a sorted numeric index for ranges.
+
+~~~~~~~~~~~~~~~
+
+Copyright Michael Adkins 2017
+Distributed under the MIT License.
+See accompanying file LICENSE.md file or copy at http://opensource.org/licenses/MIT
+
+"""
+
+import re
+from bisect import bisect_left, bisect_right
+from .exceptions import BadSearchException
+from .table import Table
+
+_words = re.compile(r'\w+', re.UNICODE)
+_number = re.compile(r'^-?\d+(\.\d+)?$')
+
+# Separator of values in list fields such as Genre
+list_separator = '; '
+
+
+def _tokenize(query):
+    """Splits a query into ('(' | ')' | 'or' | 'and' | 'not' | 'cmp' | 'any' | 'mod', ...) tokens"""
+    tokens = []
+    i = 0
+    n = len(query)
+    while i < n:
+        c = query[i]
+        if c.isspace():
+            i += 1
+        elif c in '()':
+            tokens.append((c,))
+            i += 1
+        elif c == '-' and i + 1 < n and not query[i + 1].isspace():
+            tokens.append(('not',))
+            i += 1
+        elif c == '[':
+            end = query.find(']', i)
+            if end < 0 or not query.startswith('=', end + 1):
+                raise BadSearchException("Expected '[Field]=' at position {}".format(i))
+            field = query[i + 1:end]
+            value, i = _read_value(query, end + 2)
+            tokens.append(('cmp', field, value))
+        elif c == '~':
+            eq = query.find('=', i)
+            if eq < 0 or any(ch.isspace() for ch in query[i:eq]):
+                raise BadSearchException("Expected '=' after modifier at position {}".format(i))
+            # The value runs to the next space outside [...], e.g. ~sort=[Album Artist (auto)],[Date]-d
+            end = eq + 1
+            while end < n and not query[end].isspace():
+                if query[end] == '[':
+                    close = query.find(']', end)
+                    if close < 0:
+                        raise BadSearchException("Unterminated '[' at position {}".format(end))
+                    end = close
+                end += 1
+            tokens.append(('mod', query[i + 1:eq].lower(), query[eq + 1:end]))
+            i = end
+        else:
+            value, i = _read_value(query, i)
+            if value[0] == 'word' and value[1].lower() in ('or', 'and'):
+                tokens.append((value[1].lower(),))
+            else:
+                tokens.append(('any', value))
+    return tokens
+
+
+def _read_value(query, i):
+    """Reads a [exact], "phrase" or bare value starting at i, returns ((kind, text), next index)"""
+    n = len(query)
+    if i < n and query[i] == '[':
+        end = query.find(']', i)
+        if end < 0:
+            raise BadSearchException("Unterminated '[' at position {}".format(i))
+        return ('exact', query[i + 1:end]), end + 1
+    if i < n and query[i] == '"':
+        end = query.find('"', i + 1)
+        if end < 0:
+            raise BadSearchException("Unterminated '\"' at position {}".format(i))
+        return ('phrase', query[i + 1:end]), end + 1
+    end = i
+    while end < n and not query[end].isspace() and query[end] not in '()':
+        end += 1
+    return ('word', query[i:end]), end
+
+
+class _Parser(object):
+    """Recursive descent parser producing nested tuples
+
+    expr := term ('or' term)*
+    term := factor (['and'] factor)*
+    factor := 'not'? ('(' expr ')' | cmp | any)
+    """
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.i = 0
+
+    def peek(self):
+        return self.tokens[self.i][0] if self.i < len(self.tokens) else None
+
+    def parse(self):
+        if self.peek() is None:
+            return ('all',)
+        node = self.expr()
+        if self.peek() is not None:
+            raise BadSearchException('Unexpected {!r}'.format(self.tokens[self.i]))
+        return node
+
+    def expr(self):
+        nodes = [self.term()]
+        while self.peek() == 'or':
+            self.i += 1
+            nodes.append(self.term())
+        return nodes[0] if len(nodes) == 1 else ('or', nodes)
+
+    def term(self):
+        nodes = [self.factor()]
+        while self.peek() not in (None, 'or', ')'):
+            if self.peek() == 'and':
+                self.i += 1
+            nodes.append(self.factor())
+        return nodes[0] if len(nodes) == 1 else ('and', nodes)
+
+    def factor(self):
+        kind = self.peek()
+        if kind == 'not':
+            self.i += 1
+            return ('not', self.factor())
+        if kind == '(':
+            self.i += 1
+            node = self.expr()
+            if self.peek() != ')':
+                raise BadSearchException("Missing ')'")
+            self.i += 1
+            return node
+        if kind in ('cmp', 'any'):
+            token = self.tokens[self.i]
+            self.i += 1
+            return token
+        raise BadSearchException('Unexpected {!r}'.format(self.tokens[self.i] if kind else 'end of search'))
+
+
+def parse(query):
+    """Parses a search into (tree, modifiers) where modifiers maps '~name' to its value"""
+    tokens = _tokenize(query)
+    modifiers = {t[1]: t[2] for t in tokens if t[0] == 'mod'}
+    tree = _Parser([t for t in tokens if t[0] != 'mod']).parse()
+    return tree, modifiers
+
+
+def _number_of(value):
+    if value is None or not _number.match(value):
+        return None
+    return float(value)
+
+
+class SearchIndex(object):
+    """Answers searches against a Table of library files without the server
+
+    Arguments
+    ----------
+    table : jrivermcws.table.Table or iterable of mappings
+        the library snapshot, e.g. Result.table() or a LibraryMirror
+
+    Examples
+    --------
+    from jrivermcws.search import SearchIndex
+
+    idx = SearchIndex(jr.request('Search', Query='', stream=True).table())
+    for row in idx.search('[Album Artist (auto)]=[Radiohead] [Rating]=>3 ~sort=[Date]'):
+        print(row['Name'])
+    idx.values('Album', '[Album Artist (auto)]=[Radiohead]')
+
+    """
+
+    def __init__(self, table):
+        if not isinstance(table, Table):
+            table = Table.from_items(table)
+        self.table = table
+        self._all = frozenset(range(len(table)))
+        self._exact = {}
+        self._words = {}
+        self._numeric = {}
+
+    def __repr__(self):
+        return '<SearchIndex [{} items]>'.format(len(self.table))
+
+    # Indexes, built per field on first use
+
+    def _column(self, field):
+        for name in self.table.fields:
+            if name.lower() == field.lower():
+                return self.table.columns[name]
+        return [None] * len(self.table)
+
+    def _exact_index(self, field):
+        key = field.lower()
+        index = self._exact.get(key)
+        if index is None:
+            index = {}
+            for (i, value) in enumerate(self._column(field)):
+                value = (value or '').lower()
+                index.setdefault(value, set()).add(i)
+                if list_separator in value:
+                    for v in value.split(list_separator):
+                        index.setdefault(v, set()).add(i)
+            self._exact[key] = index
+        return index
+
+    def _word_index(self, field):
+        key = field.lower() if field is not None else None
+        index = self._words.get(key)
+        if index is None:
+            words = {}
+            columns = [self._column(field)] if field is not None else list(self.table.columns.values())
+            for column in columns:
+                for (i, value) in enumerate(column):
+                    if value:
+                        for w in _words.findall(value.lower()):
+                            words.setdefault(w, set()).add(i)
+            index = self._words[key] = (sorted(words), words)
+        return index
+
+    def _numeric_index(self, field):
+        key = field.lower()
+        index = self._numeric.get(key)
+        if index is None:
+            pairs = sorted((n, i) for (i, n) in ((i, _number_of(v)) for (i, v) in enumerate(self._column(field))) if n is not None)
+            index = self._numeric[key] = ([p[0] for p in pairs], [p[1] for p in pairs])
+        return index
+
+    # Matching
+
+    def _prefix(self, field, word):
+        keys, words = self._word_index(field)
+        rows = set()
+        start = bisect_left(keys, word)
+        for k in keys[start:]:
+            if not k.startswith(word):
+                break
+            rows |= words[k]
+        return rows
+
+    def _phrase(self, field, text):
+        words = _words.findall(text.lower())
+        if not words:
+            return set(self._all)
+        rows = None
+        for w in words:
+            found = self._prefix(field, w)
+            rows = found if rows is None else rows & found
+        if len(words) == 1:
+            return rows
+        # Verify the words appear together, in order
+        pattern = re.compile(r'\b' + r'\W+'.join(re.escape(w) for w in words), re.IGNORECASE)
+        columns = [self._column(field)] if field is not None else list(self.table.columns.values())
+        return {i for i in rows if any(c[i] and pattern.search(c[i]) for c in columns)}
+
+    def _range(self, field, low, high, low_inclusive=True, high_inclusive=True):
+        values, rows = self._numeric_index(field)
+        start = 0 if low is None else (bisect_left if low_inclusive else bisect_right)(values, low)
+        end = len(values) if high is None else (bisect_right if high_inclusive else bisect_left)(values, high)
+        return set(rows[start:end])
+
+    def _compare(self, field, value):
+        kind, text = value
+        if kind == 'exact':
+            return set(self._exact_index(field).get(text.lower(), ()))
+        if kind == 'phrase':
+            return self._phrase(field, text)
+        if text == '':
+            return set(self._exact_index(field).get('', ()))
+        if text.startswith('>') and _number_of(text[1:]) is not None:
+            return self._range(field, float(text[1:]), None, low_inclusive=False)
+        if text.startswith('<') and _number_of(text[1:]) is not None:
+            return self._range(field, None, float(text[1:]), high_inclusive=False)
+        if '-' in text[1:]:
+            (low, high) = text.rsplit('-', 1) if text.count('-') == 1 or text.startswith('-') else text.split('-', 1)
+            if _number_of(low) is not None and _number_of(high) is not None:
+                return self._range(field, float(low), float(high))
+        return self._phrase(field, text)
+
+    def _evaluate(self, node):
+        kind = node[0]
+        if kind == 'all':
+            return set(self._all)
+        if kind == 'and':
+            rows = None
+            for child in node[1]:
+                found = self._evaluate(child)
+                rows = found if rows is None else rows & found
+                if not rows:
+                    break
+            return rows
+        if kind == 'or':
+            rows = set()
+            for child in node[1]:
+                rows |= self._evaluate(child)
+            return rows
+        if kind == 'not':
+            return self._all - self._evaluate(node[1])
+        if kind == 'cmp':
+            return self._compare(node[1], node[2])
+        if kind == 'any':
+            return self._phrase(None, node[1][1])
+        raise BadSearchException('Unknown search node {!r}'.format(node))
+
+    def _order(self, rows, modifiers):
+        rows = sorted(rows)
+        sort = modifiers.get('sort')
+        if sort:
+            # Apply the sort keys from last to first, relying on sort stability
+            for spec in reversed(sort.split(',')):
+                descending = spec.endswith('-d')
+                field = spec[:-2] if descending else spec
+                column = self._column(field.strip('[]'))
+                numeric = [_number_of(column[i]) for i in rows]
+                if all(n is not None for n in numeric):
+                    keys = dict(zip(rows, numeric))
+                else:
+                    keys = {i: (column[i] or '').lower() for i in rows}
+                rows.sort(key=keys.__getitem__, reverse=descending)
+        limit = modifiers.get('n')
+        if limit:
+            rows = rows[:int(limit)]
+        return rows
+
+    def indices(self, query):
+        """Returns the table row indices of the files matching a search, in result order"""
+        tree, modifiers = parse(query)
+        return self._order(self._evaluate(tree), modifiers)
+
+    def search(self, query):
+        """Returns the jrivermcws.table.Row of each file matching a search"""
+        return [self.table[i] for i in self.indices(query)]
+
+    def count(self, query):
+        tree, _ = parse(query)
+        return len(self._evaluate(tree))
+
+    def values(self, field, files=''):
+        """Returns the sorted distinct values of a field over the files matching a search, as Library/Values"""
+        column = self._column(field)
+        tree, _ = parse(files)
+        found = set()
+        for i in self._evaluate(tree):
+            value = column[i]
+            if value:
+                found.update(value.split(list_separator))
+        return sorted(found, key=str.lower)
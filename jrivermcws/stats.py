@@ -0,0 +1,182 @@
+"""
+jrivermcws.stats
+~~~~~~~~~~~~~~~~
+
+Per-command timing and payload size instrumentation
+
+~~~~~~~~~~~~~~~
+
+Copyright Michael Adkins 2017
+Distributed under the MIT License.
+See accompanying file LICENSE.md file or copy at http://opensource.org/licenses/MIT
+
+"""
+
+import bisect
+import json
+import threading
+from collections import namedtuple
+
+# A single measurement, passed to hooks as it is recorded
+#   cmd     the command string, e.g. 'Files/Search'
+#   phase   one of the phases listed in Instrumentation
+#   seconds time spent in the phase
+#   bytes   bytes sent for 'wait', received for 'download' and 'cache', otherwise None
+Timing = namedtuple('Timing', ['cmd', 'phase', 'seconds', 'bytes'])
+
+# Upper bounds of the histogram buckets in seconds, doubling from 0.25 ms to about 2 minutes
+bucket_bounds = tuple(0.00025 * 2**i for i in range(20))
+
+
+class Histogram(object):
+    """Counts of timings in exponentially sized buckets along with their sum, min and max"""
+
+    __slots__ = ('count', 'total', 'min', 'max', 'bytes', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.bytes = 0
+        # One extra bucket for timings above the last bound
+        self.buckets = [0] * (len(bucket_bounds) + 1)
+
+    def add(self, seconds, nbytes=None):
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if self.max is None or seconds > self.max:
+            self.max = seconds
+        if nbytes:
+            self.bytes += nbytes
+        self.buckets[bisect.bisect_left(bucket_bounds, seconds)] += 1
+
+    def percentile(self, q):
+        """Returns an upper bound for the q-th percentile (0-100), accurate to the bucket width"""
+        if not self.count:
+            return None
+        rank = self.count * q / 100.0
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= rank:
+                return min(bucket_bounds[i], self.max) if i < len(bucket_bounds) else self.max
+        return self.max
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.total / self.count if self.count else None,
+            'min': self.min,
+            'max': self.max,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'bytes': self.bytes,
+            'buckets': self.buckets[:],
+        }
+
+
+class Instrumentation(object):
+    """Collects per-command timings, payload sizes and latency histograms
+
+    Pass one to a Client to enable it, clients without one do no timing at
+    all. Each command is timed in these phases
+
+        connect   opening a new connection, including any TLS handshake,
+                  only recorded when no pooled connection could be reused
+        wait      sending the request until the response headers arrive,
+                  the server processing time plus a network round trip
+        download  reading the response body
+        request   wait and download together, the full round trip
+        cache     a response served from the client's ResponseCache
+        parse     parsing the XML body, for streamed responses read with
+                  iter_items this includes downloading the body
+        json      converting the parsed XML to dictionaries
+        error     time until a request failed without a response
+
+    Arguments
+    ----------
+    hooks (optional) : iterable of callables
+        called with a Timing for every measurement, see add_hook
+
+    Examples
+    --------
+    stats = Instrumentation()
+    c = jr.Client(instrument=stats)
+    c.request('Search', Query='[Genre]=[Jazz]').parsed()
+    print(stats.snapshot()['Files/Search']['wait']['p99'])
+
+    # Log slow commands as they happen
+    stats.add_hook(lambda t: t.seconds > 1 and print(t))
+
+    """
+
+    def __init__(self, hooks=()):
+        self._hooks = list(hooks)
+        # cmd -> phase -> Histogram
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<Instrumentation [{} commands]>'.format(len(self._stats))
+
+    def add_hook(self, hook):
+        """Registers a callable to be called with each Timing as it is recorded
+
+        Hooks run on the thread that sent the command and should be quick.
+        Exceptions raised by a hook are not caught.
+        """
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook):
+        self._hooks.remove(hook)
+
+    def record(self, cmd, phase, seconds, nbytes=None):
+        """Adds a measurement for a command and calls the hooks"""
+        with self._lock:
+            phases = self._stats.get(cmd)
+            if phases is None:
+                phases = self._stats[cmd] = {}
+            hist = phases.get(phase)
+            if hist is None:
+                hist = phases[phase] = Histogram()
+            hist.add(seconds, nbytes)
+        if self._hooks:
+            timing = Timing(cmd, phase, seconds, nbytes)
+            for hook in self._hooks:
+                hook(timing)
+
+    def recorder(self, cmd):
+        """Returns a function recording phases of a single command, as used by Result"""
+        def record(phase, seconds, nbytes=None):
+            self.record(cmd, phase, seconds, nbytes)
+        return record
+
+    def snapshot(self):
+        """Returns the aggregated statistics as nested dictionaries
+
+        The result maps each command to its phases, and each phase to the
+        count, total, mean, min and max seconds, approximate p50, p90 and p99,
+        total bytes and the raw histogram bucket counts (see bucket_bounds).
+        """
+        with self._lock:
+            return {cmd: {phase: hist.as_dict() for (phase, hist) in phases.items()}
+                    for (cmd, phases) in self._stats.items()}
+
+    def export(self, fp):
+        """Writes a snapshot as JSON to a file object or path"""
+        doc = {'bucket_bounds': bucket_bounds, 'commands': self.snapshot()}
+        if isinstance(fp, str):
+            with open(fp, 'w') as f:
+                json.dump(doc, f, indent=1)
+        else:
+            json.dump(doc, fp, indent=1)
+
+    def reset(self):
+        """Drops all recorded statistics"""
+        with self._lock:
+            self._stats.clear()
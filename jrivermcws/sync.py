@@ -0,0 +1,205 @@
+"""
+jrivermcws.sync
+~~~~~~~~~~~~~~~
+
+Keeps a local on-disk mirror of a library up to date incrementally
+
+The first sync downloads every file with Files/Search. Later syncs list the
+key and modification fields of every file, which is a small fraction of the
+full export, and only download the files whose fields differ from the stored
+copy, dropping files whose keys are no longer in the library.
+
+~~~~~~~~~~~~~~~
+
+Copyright Michael Adkins 2017
+Distributed under the MIT License.
+See accompanying file LICENSE.md file or copy at http://opensource.org/licenses/MIT
+
+"""
+
+import json
+import sqlite3
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from .api import get_client
+from .keys import search as search_keys
+
+
+SyncStats = namedtuple('SyncStats', ['revision', 'changed', 'deleted', 'full', 'elapsed'])
+
+# Fields listed for every file to find the ones which changed
+default_signature_fields = ('Date Modified',)
+
+
+def signature(item, fields=default_signature_fields):
+    """The stored signature of a file, the values of the signature fields"""
+    return json.dumps([item.get(f) for f in fields])
+
+
+class LibraryMirror(object):
+    """A local copy of the files in a library stored in an sqlite database
+
+    A sync lists the signature fields of every file with Files/Search and
+    downloads the files whose values differ from the stored ones with
+    File/GetInfo, or the whole library again when too many have changed.
+    The revision synced to is only recorded once the mirror matches the
+    library, so a failed or unrecognized response leaves the previous
+    revision in place and the next sync tries again.
+
+    Arguments
+    ----------
+    path : string
+        the database file, created if it does not exist
+    client (optional = None) : jrivermcws.api.Client
+        the client to sync through, the shared default server client if not given
+    fields (optional = ('Date Modified',)) : tuple
+        the fields compared to find changed files. Date Modified changes when
+        tags are written to the file, add fields such as 'Rating' or
+        'Number Plays' to also follow changes only made in the library
+    workers (optional = 4) : integer
+        the number of changed files downloaded at once
+    full_ratio (optional = 0.2) : float
+        download the whole library when more than this fraction of it changed
+
+    Examples
+    --------
+    from jrivermcws.sync import LibraryMirror
+
+    m = LibraryMirror('library.db', client=c)
+    print(m.sync())
+    print(len(m), m[6659617]['Name'])
+
+    """
+
+    def __init__(self, path, client=None, fields=default_signature_fields, workers=4, full_ratio=0.2):
+        self.path = path
+        self.client = get_client() if client is None else client
+        self.fields = tuple(fields)
+        self.workers = workers
+        self.full_ratio = full_ratio
+
+        self.db = sqlite3.connect(path)
+        self.db.execute('CREATE TABLE IF NOT EXISTS files (key INTEGER PRIMARY KEY, signature TEXT, fields TEXT)')
+        self.db.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)')
+        self.db.commit()
+
+    def __repr__(self):
+        return '<LibraryMirror {} [{} files, revision {}]>'.format(self.path, len(self), self.revision)
+
+    def __len__(self):
+        return self.db.execute('SELECT COUNT(*) FROM files').fetchone()[0]
+
+    def __contains__(self, key):
+        return self.db.execute('SELECT 1 FROM files WHERE key = ?', (int(key),)).fetchone() is not None
+
+    def __getitem__(self, key):
+        row = self.db.execute('SELECT fields FROM files WHERE key = ?', (int(key),)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return json.loads(row[0])
+
+    def __iter__(self):
+        """Yields the fields of every file in key order"""
+        for (fields,) in self.db.execute('SELECT fields FROM files ORDER BY key'):
+            yield json.loads(fields)
+
+    def keys(self):
+        return [k for (k,) in self.db.execute('SELECT key FROM files ORDER BY key')]
+
+    @property
+    def revision(self):
+        """The library master revision of the last sync, or None"""
+        row = self.db.execute("SELECT value FROM meta WHERE name = 'revision'").fetchone()
+        return None if row is None else row[0]
+
+    def close(self):
+        self.db.close()
+
+    def sync(self, full=False):
+        """Brings the mirror up to the current library revision
+
+        Returns a SyncStats of the revision synced to, the number of files
+        written and deleted, whether a full download was made and the time taken.
+
+        :raises IOError: If a request fails or the library could not be listed
+            completely, the mirror is then left as it was.
+        """
+        start = time.perf_counter()
+        r = self.client.request('GetRevision', cat='Library')
+        if not r:
+            raise IOError('Could not get the library revision: {}'.format(r))
+        revision = r.parsed().get('Master')
+        if revision is None:
+            raise IOError('No revision in the response to Library/GetRevision')
+
+        previous = self.revision
+        if not full and previous is not None and previous == revision:
+            return SyncStats(revision, 0, 0, False, time.perf_counter() - start)
+
+        try:
+            full = full or previous is None
+            if not full:
+                current = self._signatures()
+                stored = dict(self.db.execute('SELECT key, signature FROM files'))
+                changed = [k for (k, sig) in current.items() if stored.get(k) != sig]
+                if len(changed) > self.full_ratio * len(current):
+                    full = True
+                else:
+                    self._fetch(changed)
+                    stale = [(k,) for k in stored if k not in current]
+                    self.db.executemany('DELETE FROM files WHERE key = ?', stale)
+                    changed, deleted = len(changed), len(stale)
+            if full:
+                before = set(self.keys())
+                changed = self._download_all()
+                deleted = len(before.difference(self.keys()))
+
+            self.db.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('revision', ?)", (revision,))
+            self.db.commit()
+        except BaseException:
+            self.db.rollback()
+            raise
+        return SyncStats(revision, changed, deleted, full, time.perf_counter() - start)
+
+    def _row(self, item):
+        return (int(item['Key']), signature(item, self.fields), json.dumps(item))
+
+    def _signatures(self):
+        # Maps the key of every file in the library to its signature
+        r = self.client.request('Search', cat='Files', Query='', Fields=','.join(('Key',) + self.fields))
+        if not r:
+            raise IOError('Could not list library files: {}'.format(r))
+        if r.xml().tag != 'MPL':
+            raise IOError('Expected an MPL file list from Files/Search but got <{}>'.format(r.xml().tag))
+        return dict((int(item['Key']), signature(item, self.fields)) for item in r.iter_items())
+
+    def _fetch(self, keys):
+        # Downloads the given files one by one
+        def get(key):
+            r = self.client.request('GetInfo', cat='File', File=key)
+            if not r:
+                raise IOError('Could not download file {}: {}'.format(key, r))
+            items = [item for item in r.iter_items() if item.get('Key') == str(key)]
+            if not items:
+                raise IOError('File/GetInfo did not return file {}'.format(key))
+            return self._row(items[0])
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for row in executor.map(get, keys):
+                self.db.execute('INSERT OR REPLACE INTO files (key, signature, fields) VALUES (?, ?, ?)', row)
+
+    def _download_all(self):
+        # Replaces every file, checking the download against the library's key list
+        library = search_keys('', self.client)
+        r = self.client.request('Search', cat='Files', Query='', stream=True)
+        if not r:
+            raise IOError('Could not download library files: {}'.format(r))
+        self.db.execute('DELETE FROM files')
+        count = 0
+        for item in r.iter_items():
+            self.db.execute('INSERT OR REPLACE INTO files (key, signature, fields) VALUES (?, ?, ?)', self._row(item))
+            count += 1
+        if count != len(library):
+            raise IOError('Files/Search returned {} files but the library holds {}'.format(count, len(library)))
+        return count
@@ -0,0 +1,128 @@
+"""
+jrivermcws.table
+~~~~~~~~~~~~~~~~
+
+Compact column oriented storage for MPL file lists
+
+~~~~~~~~~~~~~~~
+
+Copyright Michael Adkins 2017
+Distributed under the MIT License.
+See accompanying file LICENSE.md file or copy at http://opensource.org/licenses/MIT
+
+"""
+
+import sys
+from collections.abc import Mapping
+
+
+class Row(Mapping):
+    """A lightweight read-only view of one item in a Table
+
+    Behaves like a dictionary of the fields set on the item. Only a reference
+    to the table and the row index are stored.
+    """
+
+    __slots__ = ('_table', '_index')
+
+    def __init__(self, table, index):
+        self._table = table
+        self._index = index
+
+    def __repr__(self):
+        return '<Row {} of {}>'.format(self._index, dict(self))
+
+    def __getitem__(self, name):
+        value = self._table.columns[name][self._index]
+        if value is None:
+            raise KeyError(name)
+        return value
+
+    def __iter__(self):
+        i = self._index
+        for (name, column) in self._table.columns.items():
+            if column[i] is not None:
+                yield name
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+class Table(object):
+    """Items of an MPL stored as one list per field
+
+    Field names are interned and repeated values within a column share a
+    single string, so a large library costs a pointer per field per item
+    rather than a dictionary per item. Fields missing from an item are None.
+
+    Examples
+    --------
+    t = jr.request('Search', Query='', stream=True).table()
+    len(t)
+    t.column('Artist')[:10]
+    for row in t:
+        print(row['Name'], row.get('Rating'))
+
+    """
+
+    def __init__(self):
+        self.fields = []
+        self.columns = {}
+        self._length = 0
+        # Per-column value caches used to share repeated strings while building
+        self._values = {}
+
+    def __repr__(self):
+        return '<Table [{} items, {} fields]>'.format(self._length, len(self.fields))
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('Table index out of range')
+        return Row(self, index)
+
+    def __iter__(self):
+        for i in range(self._length):
+            yield Row(self, i)
+
+    def column(self, name):
+        """Returns the list of values of a field, None where an item lacks it"""
+        return self.columns[name]
+
+    def append(self, item):
+        """Adds an item given as a mapping of field name to value"""
+        n = self._length
+        for (name, value) in item.items():
+            column = self.columns.get(name)
+            if column is None:
+                name = sys.intern(name)
+                column = self.columns[name] = [None] * n
+                self.fields.append(name)
+            values = self._values.get(name)
+            if values is None:
+                values = self._values[name] = {}
+            if value is not None:
+                value = values.setdefault(value, value)
+            column.append(value)
+        self._length = n + 1
+        # Pad the fields this item did not have
+        for column in self.columns.values():
+            if len(column) == n:
+                column.append(None)
+
+    def compact(self):
+        """Drops the caches used to share strings while appending"""
+        self._values = {}
+
+    @classmethod
+    def from_items(cls, items):
+        """Builds a table from an iterable of mappings, such as Result.iter_items()"""
+        table = cls()
+        for item in items:
+            table.append(item)
+        table.compact()
+        return table
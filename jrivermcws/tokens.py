@@ -0,0 +1,77 @@
+"""
+jrivermcws.tokens
+~~~~~~~~~~~~~~~~~
+
+Caches authentication tokens so commands don't need an extra
+round trip to /Authenticate
+
+~~~~~~~~~~~~~~~
+
+Copyright Michael Adkins 2017
+Distributed under the MIT License.
+See accompanying file LICENSE.md file or copy at http://opensource.org/licenses/MIT
+
+"""
+
+import threading
+
+
+class TokenCache(object):
+    """Thread-safe store of tokens keyed by (server, username)
+
+    Also remembers the RuntimeGUID last reported by each server's Alive
+    command. A changed GUID means the server restarted and every token
+    issued by it is dropped.
+    """
+
+    def __init__(self):
+        self._tokens = {}
+        self._guids = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<TokenCache [{}]>'.format(len(self._tokens))
+
+    def __len__(self):
+        return len(self._tokens)
+
+    def get(self, server, username):
+        """Returns the cached token or None"""
+        with self._lock:
+            return self._tokens.get((server, username))
+
+    def set(self, server, username, token):
+        with self._lock:
+            self._tokens[(server, username)] = token
+
+    def invalidate(self, server, username=None):
+        """Drops the token for a user or, without a username, every token for the server"""
+        with self._lock:
+            if username is not None:
+                self._tokens.pop((server, username), None)
+                return
+            for key in [k for k in self._tokens if k[0] == server]:
+                del self._tokens[key]
+
+    def check_runtime(self, server, guid):
+        """Records the RuntimeGUID of a server
+
+        Returns True if the GUID differs from the one previously seen, in
+        which case the tokens for that server have been invalidated.
+        """
+        with self._lock:
+            previous = self._guids.get(server)
+            self._guids[server] = guid
+        if previous is None or previous == guid:
+            return False
+        self.invalidate(server)
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._tokens.clear()
+            self._guids.clear()
+
+
+# Shared by all clients unless one is given its own
+token_cache = TokenCache()
@@ -0,0 +1,224 @@
+"""
+jrivermcws.watch
+~~~~~~~~~~~~~~~~
+
+Watches Playback/Info for changes, polling quickly only when needed
+
+~~~~~~~~~~~~~~~
+
+Copyright Michael Adkins 2017
+Distributed under the MIT License.
+See accompanying file LICENSE.md file or copy at http://opensource.org/licenses/MIT
+
+"""
+
+import asyncio
+import threading
+from collections import namedtuple
+from .api import get_client
+
+# Playback/Info State values
+STOPPED = 0
+PAUSED = 1
+PLAYING = 2
+WAITING = 3
+
+
+class Event(namedtuple('Event', ['zone', 'old', 'new', 'info'])):
+    """A change between two Playback/Info snapshots
+
+    old and new are the changed values and info the full parsed new snapshot.
+    """
+    __slots__ = ()
+
+
+class TrackChanged(Event):
+    """FileKey changed, old and new are the file keys"""
+    __slots__ = ()
+
+
+class StateChanged(Event):
+    """State changed, old and new are STOPPED, PAUSED, PLAYING or WAITING"""
+    __slots__ = ()
+
+
+class VolumeChanged(Event):
+    """Volume changed, old and new are floats between 0 and 1"""
+    __slots__ = ()
+
+
+def _number(info, name, cast=int):
+    try:
+        return cast(info[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class PlaybackWatcher(object):
+    """Polls Playback/Info for a zone and emits an Event for each change
+
+    While playing, polls are spaced out until the end of the track is near
+    (using PositionMS and DurationMS) and then sent every fast_interval so
+    the track change is seen promptly. Paused or stopped zones are polled
+    every idle_interval.
+
+    Events are delivered to callbacks and by iterating the watcher. With an
+    AsyncClient iterate with 'async for'. A callback that raises does not
+    stop the others or the watcher, nor does a failed poll, after which the
+    watcher waits idle_interval before trying again. The last such exception
+    is kept as error.
+
+    Arguments
+    ----------
+    client (optional = None) : jrivermcws.api.Client or jrivermcws.aio.AsyncClient
+        the client to poll through, the shared default server client if not given
+    zone (optional = -1) : integer
+        the zone to watch, -1 for the current zone
+    fast_interval (optional = 0.25) : float
+        seconds between polls near a track boundary
+    play_interval (optional = 2.0) : float
+        the longest wait between polls while playing
+    idle_interval (optional = 5.0) : float
+        seconds between polls while paused or stopped
+    boundary_window (optional = 3.0) : float
+        how many seconds before the end of a track to start polling fast
+
+    Examples
+    --------
+    from jrivermcws.watch import PlaybackWatcher, TrackChanged
+
+    w = PlaybackWatcher(c)
+    w.add_callback(lambda e: print('Now playing', e.info['Name']), TrackChanged)
+    w.start()
+
+    async for event in PlaybackWatcher(async_client):
+        print(event)
+
+    """
+
+    def __init__(self, client=None, zone=-1, fast_interval=0.25, play_interval=2.0, idle_interval=5.0, boundary_window=3.0):
+        self.client = get_client() if client is None else client
+        self.zone = zone
+        self.fast_interval = fast_interval
+        self.play_interval = play_interval
+        self.idle_interval = idle_interval
+        self.boundary_window = boundary_window
+
+        self.info = None
+        # The last exception raised by a poll or a callback
+        self.error = None
+        self._callbacks = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __repr__(self):
+        return '<PlaybackWatcher zone {}>'.format(self.zone)
+
+    def add_callback(self, callback, event_type=Event):
+        """Calls callback(event) for every event that is an instance of event_type"""
+        self._callbacks.append((event_type, callback))
+
+    def remove_callback(self, callback):
+        self._callbacks = [(t, c) for (t, c) in self._callbacks if c is not callback]
+
+    def interval(self, info=None):
+        """Seconds to wait before the next poll given the last snapshot"""
+        info = self.info if info is None else info
+        if info is None or _number(info, 'State') != PLAYING:
+            return self.idle_interval
+        position = _number(info, 'PositionMS')
+        duration = _number(info, 'DurationMS')
+        if position is None or not duration:
+            return self.play_interval
+        remaining = (duration - position) / 1000 - self.boundary_window
+        return min(self.play_interval, max(self.fast_interval, remaining))
+
+    def diff(self, old, new):
+        """Returns the events between two parsed Playback/Info snapshots"""
+        if old is None:
+            return []
+        events = []
+        if old.get('FileKey') != new.get('FileKey'):
+            events.append(TrackChanged(self.zone, _number(old, 'FileKey'), _number(new, 'FileKey'), new))
+        if old.get('State') != new.get('State'):
+            events.append(StateChanged(self.zone, _number(old, 'State'), _number(new, 'State'), new))
+        if old.get('Volume') != new.get('Volume'):
+            events.append(VolumeChanged(self.zone, _number(old, 'Volume', float), _number(new, 'Volume', float), new))
+        return events
+
+    def _update(self, result):
+        if not result:
+            return []
+        info = result.parsed()
+        events = self.diff(self.info, info)
+        self.info = info
+        for event in events:
+            for (event_type, callback) in self._callbacks:
+                if isinstance(event, event_type):
+                    try:
+                        callback(event)
+                    except Exception as e:
+                        self.error = e
+                        print("An exception occured in a callback for {}. Details: {}".format(event, e))
+        return events
+
+    def poll(self):
+        """Sends one Playback/Info request and returns the resulting events"""
+        return self._update(self.client.request('Info', cat='Playback', Zone=self.zone))
+
+    def _poll_failed(self, e):
+        self.error = e
+        print("An exception occured polling zone {}. Details: {}".format(self.zone, e))
+
+    def __iter__(self):
+        """Yields events as they happen until stop() is called"""
+        self._stop.clear()
+        return self._events()
+
+    def _events(self):
+        while not self._stop.is_set():
+            try:
+                result = self.client.request('Info', cat='Playback', Zone=self.zone)
+            except Exception as e:
+                self._poll_failed(e)
+                result = None
+            if not result:
+                # Back off while the server is unreachable
+                self._stop.wait(self.idle_interval)
+                continue
+            for event in self._update(result):
+                yield event
+            self._stop.wait(self.interval())
+
+    async def __aiter__(self):
+        self._stop.clear()
+        while not self._stop.is_set():
+            try:
+                result = await self.client.request('Info', cat='Playback', Zone=self.zone)
+            except Exception as e:
+                self._poll_failed(e)
+                result = None
+            if not result:
+                await asyncio.sleep(self.idle_interval)
+                continue
+            for event in self._update(result):
+                yield event
+            await asyncio.sleep(self.interval())
+
+    def run(self):
+        """Polls until stop() is called, delivering events to the callbacks"""
+        for _ in self._events():
+            pass
+
+    def start(self):
+        """Runs the watcher on a daemon thread"""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name=repr(self), daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+            self._thread = None
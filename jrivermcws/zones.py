@@ -0,0 +1,234 @@
+"""
+jrivermcws.zones
+~~~~~~~~~~~~~~~~
+
+Status of every playback zone, fetched concurrently
+
+~~~~~~~~~~~~~~~
+
+Copyright Michael Adkins 2017
+Distributed under the MIT License.
+See accompanying file LICENSE.md file or copy at http://opensource.org/licenses/MIT
+
+"""
+
+import threading
+import time
+import weakref
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from .api import get_client
+from .outcomes import Outcome, Report
+
+default_ttl = 60.0
+
+Zone = namedtuple('Zone', ['id', 'name', 'index'])
+
+
+class ZoneStatus(Outcome, namedtuple('ZoneStatus', ['zone', 'info', 'volume', 'position', 'error'])):
+    """The state of one zone in a Snapshot
+
+    info is the parsed Playback/Info response, volume and position the parsed
+    Playback/Volume and Playback/Position responses when they were asked for
+    and None otherwise. If a request failed error holds the exception or the
+    failed Result.
+    """
+    __slots__ = ()
+
+
+class Snapshot(Report):
+    """The status of every zone at about the same moment
+
+    Iterates over ZoneStatus objects in zone order, which can also be looked
+    up by zone ID or name.
+    """
+
+    def __init__(self, zones, current, elapsed):
+        super(Snapshot, self).__init__(zones, elapsed)
+        self.current = current
+
+    def __repr__(self):
+        return '<Snapshot of {} zones in {:.3f}s>'.format(len(self.items), self.elapsed)
+
+    def __getitem__(self, zone):
+        """Returns the ZoneStatus of a zone given by ID or name"""
+        for z in self.items:
+            if z.zone.id == zone or z.zone.name == zone:
+                return z
+        raise KeyError(zone)
+
+    @property
+    def zones(self):
+        return self.items
+
+
+class Zones(object):
+    """The playback zones of a server
+
+    Keeps the zone list from Playback/Zones for ttl seconds, so zones can be
+    addressed by name without a ZoneType=Name lookup on the server each time,
+    and fetches the status of all zones concurrently.
+
+    Arguments
+    ----------
+    client (optional) : jrivermcws.api.Client
+        the client to send through, the shared client for the default server if not given
+    ttl (optional = 60.0) : float
+        seconds the zone list is kept before it is fetched again
+    hidden (optional = False) : bool
+        include hidden zones
+
+    Examples
+    --------
+    from jrivermcws.zones import Zones
+
+    zones = Zones(c)
+    for z in zones.snapshot(volume=True):
+        print(z.zone.name, z.info['Status'], z.volume['Level'])
+
+    c.request('Pause', cat='Playback', Zone=zones.id_of('Kitchen'))
+
+    """
+
+    def __init__(self, client=None, ttl=default_ttl, hidden=False):
+        self.client = get_client() if client is None else client
+        self.ttl = ttl
+        self.hidden = hidden
+
+        self._zones = None
+        self._current = None
+        self._fetched = 0.0
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def __repr__(self):
+        return '<Zones of {}>'.format(self.client.server)
+
+    def close(self):
+        """Stops the threads used for snapshots"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def invalidate(self):
+        """Drops the cached zone list, e.g. after zones were added or renamed"""
+        with self._lock:
+            self._zones = None
+
+    def zones(self, refresh=False):
+        """Returns the list of Zones, from the cache unless it is older than ttl"""
+        with self._lock:
+            if not refresh and self._zones is not None and time.monotonic() - self._fetched < self.ttl:
+                return self._zones
+        params = {'Hidden': 1} if self.hidden else {}
+        r = self.client.request('Zones', cat='Playback', **params)
+        if not r:
+            raise ValueError('Could not list zones: {}'.format(r.response and r.response.status_code))
+        p = r.parsed()
+        zones = []
+        for i in range(int(p.get('NumberZones', 0))):
+            zones.append(Zone(int(p['ZoneID{}'.format(i)]), p.get('ZoneName{}'.format(i)), i))
+        with self._lock:
+            self._zones = zones
+            self._current = int(p['CurrentZoneID']) if 'CurrentZoneID' in p else None
+            self._fetched = time.monotonic()
+        return zones
+
+    def current(self):
+        """Returns the ID of the current zone"""
+        self.zones()
+        return self._current
+
+    def id_of(self, zone):
+        """Returns the ID of a zone given by ID or name
+
+        An unknown name refreshes the zone list once before a KeyError is raised.
+        """
+        if isinstance(zone, int):
+            return zone
+        for refresh in (False, True):
+            for z in self.zones(refresh):
+                if z.name == zone or str(z.id) == zone:
+                    return z.id
+        raise KeyError(zone)
+
+    def snapshot(self, volume=False, position=False, zones=None):
+        """Fetches the status of every zone concurrently
+
+        All requests are sent at once, so a snapshot takes about as long as
+        the slowest of them rather than their sum.
+
+        Arguments
+        ----------
+        volume (optional = False) : bool
+            also fetch Playback/Volume for each zone
+        position (optional = False) : bool
+            also fetch Playback/Position for each zone
+        zones (optional = None) : iterable
+            IDs or names of the zones to include, all zones if not given
+
+        Returns
+        -------
+        A Snapshot. A zone whose requests failed has its error set rather
+        than failing the whole snapshot.
+        """
+        start = time.perf_counter()
+        listed = self.zones()
+        if zones is not None:
+            wanted = set(self.id_of(z) for z in zones)
+            listed = [z for z in listed if z.id in wanted]
+
+        commands = ['Info']
+        if volume:
+            commands.append('Volume')
+        if position:
+            commands.append('Position')
+
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=getattr(self.client, 'pool_size', 10))
+            executor = self._executor
+
+        def fetch(cmd, zone):
+            return self.client.request(cmd, cat='Playback', Zone=zone.id)
+
+        futures = [[executor.submit(fetch, cmd, z) for cmd in commands] for z in listed]
+
+        statuses = []
+        for (z, fs) in zip(listed, futures):
+            parts = {}
+            error = None
+            for (cmd, f) in zip(commands, fs):
+                try:
+                    r = f.result()
+                except Exception as e:
+                    error = e
+                    continue
+                if r:
+                    parts[cmd] = r.parsed()
+                elif error is None:
+                    error = r
+            statuses.append(ZoneStatus(z, parts.get('Info'), parts.get('Volume'), parts.get('Position'), error))
+
+        return Snapshot(statuses, self._current, time.perf_counter() - start)
+
+
+# Zones shared by snapshot(), one per client
+_shared = weakref.WeakKeyDictionary()
+_shared_lock = threading.Lock()
+
+
+def snapshot(client=None, volume=False, position=False, zones=None):
+    """Fetches the status of every zone of a server concurrently
+
+    Uses a Zones object kept for the client, so the zone list is cached
+    between calls. See Zones.snapshot for the arguments.
+    """
+    if client is None:
+        client = get_client()
+    with _shared_lock:
+        z = _shared.get(client)
+        if z is None:
+            # Through a proxy so the entry does not keep its own key alive
+            z = _shared[client] = Zones(weakref.proxy(client))
+    return z.snapshot(volume, position, zones)
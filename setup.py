@@ -6,5 +6,6 @@ setup(name='jrivermcws',
       version='0.0.1',
       author='Michael Adkins',
       install_requires=['requests'],
+      extras_require={'async': ['aiohttp']},
       entry_points={'console_scripts': ['jriverctl = jrivermcws.__main__:main']},
     )
@@ -0,0 +1,101 @@
+import importlib.util
+import re
+from collections import OrderedDict
+from xml.sax.saxutils import escape, quoteattr
+
+import pytest
+
+from jrivermcws.models import Result, build_response
+
+
+def response(cat, cmd, body, status=200):
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    return Result(cat, cmd, build_response('http://fake/MCWS/v1/{}/{}'.format(cat, cmd), status,
+                                           'OK' if status < 400 else 'Error', {}, 'utf-8', body))
+
+
+def items_xml(items, status='OK'):
+    rows = ''.join('<Item Name={}>{}</Item>'.format(quoteattr(name), escape(str(value))) for (name, value) in items)
+    return '<?xml version="1.0" encoding="UTF-8" standalone="yes" ?>\n<Response Status="{}">{}</Response>'.format(status, rows)
+
+
+def mpl_xml(files):
+    rows = []
+    for f in files:
+        fields = ''.join('<Field Name={}>{}</Field>'.format(quoteattr(n), escape(v)) for (n, v) in f.items())
+        rows.append('<Item>{}</Item>'.format(fields))
+    return '<?xml version="1.0" encoding="UTF-8" standalone="yes" ?>\n<MPL Version="2.0" Title="MCWS - Files">{}</MPL>'.format(''.join(rows))
+
+
+class FakeLibrary(object):
+    """An in memory library answering the file commands of a jrivermcws Client"""
+
+    def __init__(self, count=0):
+        self.files = OrderedDict()
+        self.revision = 1
+        self.sent = []
+        # Keys left out of [Key]=first-last searches, but still listed and found by File/GetInfo
+        self.unsearchable = set()
+        for k in range(1, count + 1):
+            self.add(k, Name='Track {}'.format(k), Artist='Artist {}'.format(k % 3), Duration='{}.5'.format(100 + k),
+                     Rating=str(k % 6))
+
+    def add(self, key, **fields):
+        f = OrderedDict([('Key', str(key))])
+        f['Date Modified'] = '1500000000'
+        f.update(fields)
+        self.files[key] = f
+        self.revision += 1
+
+    def modify(self, key, **fields):
+        self.files[key].update(fields)
+        self.files[key]['Date Modified'] = str(int(self.files[key]['Date Modified']) + 1)
+        self.revision += 1
+
+    def remove(self, key):
+        del self.files[key]
+        self.revision += 1
+
+    def _select(self, files, fields):
+        if not fields:
+            return list(files)
+        names = fields.split(',')
+        return [OrderedDict((n, f[n]) for n in names if n in f) for f in files]
+
+    def request(self, cmd, cat=None, **kwargs):
+        kwargs.pop('stream', None)
+        self.sent.append((cat, cmd, kwargs))
+        if (cat, cmd) == ('Library', 'GetRevision'):
+            return response(cat, cmd, items_xml([('Master', self.revision), ('Sync', self.revision)]))
+        if (cat, cmd) == ('Files', 'Search'):
+            files = list(self.files.values())
+            # Other queries are not evaluated and return every file
+            m = re.match(r'\[Key\]=(\d+)-(\d+)$', kwargs.get('Query', ''))
+            if m is not None:
+                (first, last) = (int(m.group(1)), int(m.group(2)))
+                files = [f for (k, f) in self.files.items() if first <= k <= last and k not in self.unsearchable]
+        elif (cat, cmd) == ('File', 'GetInfo'):
+            key = int(kwargs['File'])
+            if key not in self.files:
+                return response(cat, cmd, items_xml([], 'Failure'), 500)
+            files = [self.files[key]]
+        else:
+            return response(cat, cmd, items_xml([]))
+        if kwargs.get('Action') == 'Serialize':
+            keys = [f['Key'] for f in files]
+            return response(cat, cmd, ';'.join(['1', str(len(keys)), '-1'] + keys))
+        return response(cat, cmd, mpl_xml(self._select(files, kwargs.get('Fields'))))
+
+
+@pytest.fixture
+def library():
+    return FakeLibrary(50)
+
+
+@pytest.fixture(params=[False, pytest.param(True, marks=pytest.mark.skipif(importlib.util.find_spec('numpy') is None,
+                                                                         reason='numpy is not installed'))],
+                ids=['array', 'numpy'])
+def use_numpy(request):
+    """Runs a test with stdlib arrays and, when it is installed, with numpy"""
+    return request.param
@@ -0,0 +1,138 @@
+import os
+import socket
+import sys
+import threading
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+from jrivermcws import agent
+from jrivermcws.__main__ import main
+from jrivermcws.api import get_client
+from jrivermcws.models import build_response
+from conftest import items_xml
+
+SERVER = 'http://agent-test/MCWS/v1/'
+DOWN = 'http://agent-down/MCWS/v1/'
+ALIVE = items_xml([('RuntimeGUID', '{1234}'), ('ProgramVersion', '24.0.1')]).encode()
+
+
+class AliveAdapter(BaseAdapter):
+
+    def send(self, request, **kwargs):
+        return build_response(request.url, 200, 'OK', {'Content-Type': 'text/xml'}, 'utf-8', ALIVE)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def running(tmp_path):
+    get_client(SERVER, 'mz', 'pass').session.mount('http://', AliveAdapter())
+    a = agent.Agent(str(tmp_path / 'agent.sock'))
+    t = threading.Thread(target=a.serve_forever, daemon=True)
+    t.start()
+    for _ in range(100):
+        if os.path.exists(a.path):
+            break
+        threading.Event().wait(0.01)
+    yield a
+    a.shutdown()
+    t.join(5)
+
+
+def test_forwarded_alive_keeps_body(running):
+    with agent.connect(running.path) as conn:
+        r = conn.request('Alive', server=SERVER, username='mz', password='pass')
+    assert r
+    assert r.response.content == ALIVE
+    assert r.parsed()['RuntimeGUID'] == '{1234}'
+
+
+def test_socket_is_private(running):
+    assert os.stat(running.path).st_mode & 0o777 == 0o600
+
+
+def test_no_agent(tmp_path):
+    assert agent.connect(str(tmp_path / 'none.sock')) is None
+
+
+def test_refuses_socket_of_another_user(running, monkeypatch):
+    monkeypatch.setattr(os, 'getuid', lambda: os.geteuid() + 1)
+    with pytest.raises(PermissionError):
+        agent.connect(running.path)
+
+
+def test_refuses_symlink(running, tmp_path):
+    link = str(tmp_path / 'link.sock')
+    os.symlink(running.path, link)
+    with pytest.raises(PermissionError):
+        agent.connect(link)
+
+
+def test_peer_uid(running):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(running.path)
+        assert agent.peer_uid(sock) in (None, os.getuid())
+    finally:
+        sock.close()
+
+
+def test_default_path_is_in_private_directory(tmp_path, monkeypatch):
+    monkeypatch.delenv('XDG_RUNTIME_DIR', raising=False)
+    monkeypatch.setenv('TMPDIR', str(tmp_path))
+    monkeypatch.setattr(agent.tempfile, 'tempdir', None)
+    path = agent.default_path()
+    assert os.path.dirname(os.path.dirname(path)) == str(tmp_path)
+
+    a = agent.Agent()
+    t = threading.Thread(target=a.serve_forever, daemon=True)
+    t.start()
+    for _ in range(100):
+        if os.path.exists(path):
+            break
+        threading.Event().wait(0.01)
+    try:
+        assert os.stat(os.path.dirname(path)).st_mode & 0o777 == 0o700
+        conn = agent.connect()
+        assert conn is not None
+        conn.close()
+    finally:
+        a.shutdown()
+        t.join(5)
+
+
+def test_refuses_shared_default_directory(tmp_path, monkeypatch):
+    monkeypatch.delenv('XDG_RUNTIME_DIR', raising=False)
+    monkeypatch.setenv('TMPDIR', str(tmp_path))
+    monkeypatch.setattr(agent.tempfile, 'tempdir', None)
+    os.mkdir(os.path.dirname(agent.default_path()), 0o755)
+    os.chmod(os.path.dirname(agent.default_path()), 0o755)
+    with pytest.raises(PermissionError):
+        agent.Agent().serve_forever()
+
+
+class DownAdapter(BaseAdapter):
+
+    def send(self, request, **kwargs):
+        raise requests.exceptions.ConnectionError('Connection refused')
+
+    def close(self):
+        pass
+
+
+def test_server_down_raises_connection_error(running):
+    get_client(DOWN, 'mz', 'pass').session.mount('http://', DownAdapter())
+    with agent.connect(running.path) as conn:
+        with pytest.raises(ConnectionError):
+            conn.request('Next', cat='Playback', server=DOWN, username='mz', password='pass')
+
+
+def test_main_reports_server_down(running, monkeypatch, capsys):
+    get_client(DOWN, 'mz', 'pass').session.mount('http://', DownAdapter())
+    monkeypatch.setattr(agent, 'default_path', lambda: running.path)
+    monkeypatch.setattr(sys, 'argv', ['jriverctl', '--server', DOWN, '--auth', 'mz', 'pass', 'Playback/Next'])
+    main()
+    assert 'Could not establish connection to JRiver' in capsys.readouterr().out
@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+aiohttp = pytest.importorskip('aiohttp')
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from jrivermcws.aio import AsyncClient
+from jrivermcws.tokens import TokenCache
+from conftest import items_xml
+
+
+class Server(object):
+    """Accepts only the token most recently issued by Authenticate"""
+
+    def __init__(self):
+        self.issued = 0
+        self.token = None
+        app = web.Application()
+        app.router.add_get('/MCWS/v1/Authenticate', self.authenticate)
+        app.router.add_get('/MCWS/v1/Playback/Info', self.info)
+        self.app = app
+
+    def xml(self, items, status=200):
+        return web.Response(text=items_xml(items), status=status, content_type='text/xml')
+
+    async def authenticate(self, request):
+        await asyncio.sleep(0.01)
+        self.issued += 1
+        self.token = 't{}'.format(self.issued)
+        return self.xml([('Token', self.token)])
+
+    async def info(self, request):
+        if request.query.get('Token') != self.token:
+            # Spread the rejections out so some arrive after the first re-authentication
+            await asyncio.sleep(int(request.query['Zone']) * 0.002)
+            return self.xml([], 401)
+        return self.xml([('Zone', request.query['Zone'])])
+
+
+def test_gather_reauthenticates_once():
+    async def main():
+        server = Server()
+        async with TestServer(server.app) as ts:
+            url = str(ts.make_url('/MCWS/v1/'))
+            cache = TokenCache()
+            cache.set(url, 'mz', 'expired')
+            async with AsyncClient(url, 'mz', 'pass', token_cache=cache) as c:
+                results = await asyncio.gather(*[c.request('Info', cat='Playback', Zone=z) for z in range(50)])
+        return server, results
+
+    server, results = asyncio.run(main())
+    assert server.issued == 1
+    assert all(results)
+    assert [r.parsed()['Zone'] for r in results] == [str(z) for z in range(50)]
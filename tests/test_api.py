@@ -0,0 +1,193 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from requests.adapters import BaseAdapter
+from requests.exceptions import ConnectionError, ConnectTimeout, ReadTimeout
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+import jrivermcws as jr
+from jrivermcws.api import hedge_min_samples, not_sent
+from jrivermcws.models import build_response
+from jrivermcws.stats import Instrumentation
+from conftest import items_xml
+
+
+def test_session_trusts_environment():
+    c = jr.Client('http://mcws.example:52199/MCWS/v1/')
+    assert c.session.trust_env
+
+
+@pytest.fixture
+def server():
+    body = items_xml([('Master', '1')]).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/xml')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    t = threading.Thread(target=httpd.serve_forever, daemon=True)
+    t.start()
+    yield 'http://127.0.0.1:{}/MCWS/v1/'.format(httpd.server_address[1])
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_connect_recorded_only_for_new_connections(server):
+    stats = Instrumentation()
+    timings = []
+    stats.add_hook(timings.append)
+    with jr.Client(server, token='t', instrument=stats) as c:
+        assert c.request('GetRevision', cat='Library')
+        assert c.request('GetRevision', cat='Library')
+    phases = [t.phase for t in timings]
+    assert phases == ['connect', 'wait', 'download', 'request', 'wait', 'download', 'request']
+    connect, wait = timings[0].seconds, timings[1].seconds
+    assert connect > 0 and wait > 0
+    # The phases add up to the round trip
+    assert connect + wait + timings[2].seconds == pytest.approx(timings[3].seconds, abs=1e-3)
+
+
+class Raw(object):
+    """Stands in for the urllib3 response so closing a Response can be observed"""
+
+    def __init__(self):
+        self.closed = False
+
+    def release_conn(self):
+        self.closed = True
+
+
+class ScriptedAdapter(BaseAdapter):
+    """Replies to each request with the next step: an exception to raise, a status, or (delay, status)"""
+
+    def __init__(self, steps, default=200):
+        super(ScriptedAdapter, self).__init__()
+        self.steps = list(steps)
+        self.default = default
+        self.sent = 0
+        self.responses = []
+        self._lock = threading.Lock()
+
+    def send(self, request, **kwargs):
+        with self._lock:
+            self.sent += 1
+            step = self.steps.pop(0) if self.steps else self.default
+        if isinstance(step, Exception):
+            raise step
+        if isinstance(step, tuple):
+            (delay, step) = step
+            time.sleep(delay)
+        resp = build_response(request.url, step, 'Reason', {}, 'utf-8', items_xml([('Step', step)]).encode())
+        resp.request = request
+        resp.raw = Raw()
+        with self._lock:
+            self.responses.append(resp)
+        return resp
+
+    def close(self):
+        pass
+
+
+def scripted(steps, **kwargs):
+    c = jr.Client('http://fake/MCWS/v1/', token='t', backoff=0, **kwargs)
+    c.adapter = ScriptedAdapter(steps)
+    c.session.mount('http://', c.adapter)
+    return c
+
+
+def refused():
+    return ConnectionError(MaxRetryError(None, '/', NewConnectionError(None, 'refused')))
+
+
+def test_not_sent():
+    assert not_sent(ConnectTimeout())
+    assert not_sent(refused())
+    assert not not_sent(ConnectionError('reset by peer'))
+    assert not not_sent(ReadTimeout())
+    assert not not_sent(ValueError())
+
+
+def test_readonly_retried_after_any_error():
+    c = scripted([ReadTimeout('read timed out'), ConnectionError('reset by peer')])
+    assert c.request('Info', cat='Playback')
+    assert c.adapter.sent == 3
+
+
+def test_changing_command_retried_only_when_not_sent():
+    c = scripted([refused(), refused()])
+    assert c.request('Stop', cat='Playback')
+    assert c.adapter.sent == 3
+
+    c = scripted([ReadTimeout('read timed out')])
+    r = c.request('Stop', cat='Playback')
+    assert r.response is None
+    assert c.adapter.sent == 1
+
+
+def test_retries_are_limited():
+    c = scripted([refused()] * 3, retries=2)
+    assert c.request('Info', cat='Playback').response is None
+    assert c.adapter.sent == 3
+
+
+@pytest.mark.parametrize('status', [502, 503, 504])
+def test_readonly_retried_on_gateway_errors(status):
+    c = scripted([status, status])
+    assert c.request('Info', cat='Playback')
+    assert c.adapter.sent == 3
+    assert [r.raw.closed for r in c.adapter.responses] == [True, True, False]
+
+
+def test_gateway_errors_not_retried_for_changing_commands():
+    c = scripted([503])
+    assert c.request('Stop', cat='Playback').response.status_code == 503
+    assert c.adapter.sent == 1
+
+
+def test_gateway_error_returned_once_retries_run_out():
+    c = scripted([503] * 3, retries=2)
+    assert c.request('Info', cat='Playback').response.status_code == 503
+    assert c.adapter.sent == 3
+
+
+def test_hedge_threshold():
+    c = scripted([], hedge=50)
+    assert c.hedge_after('Playback/Info') is None
+    for _ in range(hedge_min_samples):
+        c.request('Info', cat='Playback')
+    assert c.hedge_after('Playback/Info') is not None
+    # Commands which change the server state are never hedged
+    c.request('Stop', cat='Playback')
+    assert c.hedge_after('Playback/Stop') is None
+
+
+def test_hedge_uses_first_answer_and_closes_the_other():
+    stats = Instrumentation()
+    c = scripted([], hedge=50, instrument=stats)
+    for _ in range(hedge_min_samples):
+        c.request('Info', cat='Playback')
+    c.adapter.steps = [(0.3, 200), 200]
+    c.adapter.responses = []
+    start = time.perf_counter()
+    r = c.request('Info', cat='Playback')
+    assert r
+    assert time.perf_counter() - start < 0.25
+    assert stats.snapshot()['Playback/Info']['hedge']['count'] == 1
+    time.sleep(0.4)
+    losers = [resp for resp in c.adapter.responses if resp is not r.response]
+    assert len(losers) == 1
+    assert losers[0].raw.closed
+    assert not r.response.raw.closed
+    c.close()
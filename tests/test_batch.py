@@ -0,0 +1,53 @@
+import io
+import json
+import time
+
+import pytest
+
+from jrivermcws import batch
+from jrivermcws.exceptions import BadCommandException
+from conftest import items_xml, mpl_xml, response
+
+
+def test_parse_line():
+    assert batch.parse_line('Playback/Volume Level=0.5') == ('Volume', 'Playback', {'Level': '0.5'})
+    assert batch.parse_line('Search Query="[Artist]=[Miles Davis]"') == ('Search', None, {'Query': '[Artist]=[Miles Davis]'})
+    assert batch.parse_line('-m MCC_VOLUME_UP 5') == ('MCC', 'Control', {'Command': 'MCC_VOLUME_UP', 'Parameter': '5'})
+    assert batch.parse_line('   # a comment') is None
+    assert batch.parse_line('') is None
+
+
+@pytest.mark.parametrize('line', ['Next Zone', 'Next =1', '-m MCC_VOLUME_UP', 'Search Query="open'])
+def test_parse_line_errors(line):
+    with pytest.raises(BadCommandException):
+        batch.parse_line(line)
+
+
+def send(cmd, cat=None, **params):
+    # Later lines answer sooner so concurrent runs finish out of order
+    time.sleep(0.02 / (1 + int(params.get('N', 0))))
+    if cmd == 'Fail':
+        raise BadCommandException('Command could not be found')
+    if cmd == 'Search':
+        return response(cat, cmd, mpl_xml([{'Key': params['N']}]))
+    if cmd == 'Serialize':
+        return response(cat, cmd, '1;1;-1;' + params['N'])
+    return response(cat, cmd, items_xml([('N', params.get('N'))]))
+
+
+SCRIPT = ['Info N=0', '# skipped', 'Files/Search N=1', 'Fail N=2', 'Serialize N=3', 'Info N=4']
+
+
+@pytest.mark.parametrize('jobs', [1, 4])
+def test_run_writes_records_in_order(jobs):
+    out = io.StringIO()
+    failed = batch.run(SCRIPT, send, jobs=jobs, out=out)
+    records = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert failed == 1
+    assert [r['line'] for r in records] == [1, 3, 4, 5, 6]
+    assert records[0]['result'] == {'N': '0'}
+    assert records[1]['cmd'] == 'Files/Search'
+    assert records[1]['result'] == [{'Key': '1'}]
+    assert not records[2]['ok']
+    assert records[2]['error'].startswith('BadCommandException')
+    assert records[3]['result'] == '1;1;-1;3'
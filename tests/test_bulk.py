@@ -0,0 +1,59 @@
+from jrivermcws import bulk
+from jrivermcws.models import Result, build_response
+
+
+class FakeClient(object):
+    """Answers SetInfo with OK, or raises for files in fail"""
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.sent = []
+
+    def request(self, cmd, cat=None, **kwargs):
+        self.sent.append(kwargs)
+        if kwargs['File'] in self.fail:
+            raise ConnectionError('refused')
+        body = b'<Response Status="OK"/>'
+        return Result(cat, cmd, build_response('http://fake/', 200, 'OK', {}, 'utf-8', body))
+
+
+def test_all_written_in_order():
+    c = FakeClient()
+    r = bulk.set_info(((k, 'Genre', 'Jazz') for k in range(20)), client=c, workers=4)
+    assert r
+    assert len(r) == 20
+    assert [o.file for o in r.outcomes] == list(range(20))
+    assert len(c.sent) == 20
+
+
+def test_request_failure_does_not_stop_batch():
+    c = FakeClient(fail=[3, 7])
+    r = bulk.set_info([(k, 'Genre', 'Jazz') for k in range(10)], client=c, workers=2)
+    assert not r
+    assert [o.file for o in r.failed] == [3, 7]
+    assert all(isinstance(o.error, ConnectionError) for o in r.failed)
+    assert len(r.succeeded) == 8
+
+
+def test_malformed_item_is_recorded():
+    c = FakeClient()
+    r = bulk.set_info([(1, 'Genre', 'Jazz'), (2, 'Genre'), None, (4, 'Genre', 'Jazz')], client=c, workers=2)
+    assert [o.ok for o in r.outcomes] == [True, False, False, True]
+    assert r.outcomes[1].file == (2, 'Genre')
+    assert isinstance(r.outcomes[1].error, ValueError)
+    assert isinstance(r.outcomes[2].error, TypeError)
+    assert len(c.sent) == 2
+
+
+def test_progress_error_does_not_stop_batch():
+    calls = []
+
+    def progress(done, outcome):
+        calls.append(done)
+        raise RuntimeError('bad callback')
+
+    r = bulk.set_info([(k, 'Genre', 'Jazz') for k in range(10)], client=FakeClient(), workers=2, progress=progress)
+    assert r
+    assert len(r) == 10
+    assert calls == [1]
+    assert isinstance(r.progress_error, RuntimeError)
@@ -0,0 +1,114 @@
+from jrivermcws.cache import ResponseCache
+from conftest import items_xml, response
+
+
+class RevisionServer(object):
+    """Answers Library/GetRevision with a settable revision"""
+
+    def __init__(self, server='http://a/MCWS/v1/', revision=1):
+        self.server = server
+        self.revision = revision
+        self.polls = 0
+
+    def request(self, cmd, cat=None, **kwargs):
+        self.polls += 1
+        if self.revision is None:
+            return response(cat, cmd, items_xml([], 'Failure'), 500)
+        return response(cat, cmd, items_xml([('Master', self.revision)]))
+
+
+def put(cache, key, content=b'x'):
+    cache.put(key, 200, 'OK', {}, 'utf-8', content)
+
+
+def test_key_ignores_token():
+    a = ResponseCache.key('s', 'Library/Values', {'Field': 'Artist', 'Token': 'abc'})
+    b = ResponseCache.key('s', 'Library/Values', {'Token': 'def', 'Field': 'Artist'})
+    assert a == b
+    assert a != ResponseCache.key('s', 'Library/Values', {'Field': 'Album'})
+
+
+def test_hits_and_misses():
+    c = ResponseCache()
+    assert c.get('k') is None
+    put(c, 'k', b'body')
+    assert c.get('k') == (200, 'OK', {}, 'utf-8', b'body')
+    assert (c.hits, c.misses) == (1, 1)
+
+
+def test_lru_eviction_by_entries():
+    c = ResponseCache(max_entries=2)
+    put(c, 'a')
+    put(c, 'b')
+    c.get('a')
+    put(c, 'c')
+    assert c.get('b') is None
+    assert c.get('a') is not None
+    assert c.get('c') is not None
+
+
+def test_eviction_by_bytes():
+    c = ResponseCache(max_bytes=10)
+    put(c, 'a', b'12345')
+    put(c, 'b', b'12345')
+    put(c, 'c', b'123')
+    assert c.get('a') is None
+    assert len(c) == 2
+    put(c, 'huge', b'x' * 11)
+    assert c.get('huge') is None
+
+
+def test_replace_updates_size():
+    c = ResponseCache(max_bytes=10)
+    put(c, 'a', b'12345678')
+    put(c, 'a', b'1')
+    put(c, 'b', b'123456789')
+    assert len(c) == 2
+
+
+def test_invalidate_per_server():
+    c = ResponseCache()
+    put(c, ('s1', 'cmd', ()))
+    put(c, ('s2', 'cmd', ()))
+    c.invalidate('s1')
+    assert c.get(('s1', 'cmd', ())) is None
+    assert c.get(('s2', 'cmd', ())) is not None
+    c.invalidate()
+    assert len(c) == 0
+    assert repr(c) == '<ResponseCache [0 entries, 0 bytes]>'
+
+
+def test_validate_drops_entries_on_revision_change():
+    server = RevisionServer()
+    c = ResponseCache(revision_interval=0)
+    c.validate(server)
+    key = (server.server, 'Library/Values', ())
+    put(c, key)
+    c.validate(server)
+    assert c.get(key) is not None
+    server.revision = 2
+    c.validate(server)
+    assert c.get(key) is None
+
+
+def test_validate_drops_entries_when_revision_unknown():
+    server = RevisionServer()
+    c = ResponseCache(revision_interval=0)
+    c.validate(server)
+    key = (server.server, 'Library/Values', ())
+    put(c, key)
+    server.revision = None
+    c.validate(server)
+    assert c.get(key) is None
+
+
+def test_validate_polls_at_most_once_per_interval():
+    server = RevisionServer()
+    c = ResponseCache(revision_interval=60)
+    c.validate(server)
+    key = (server.server, 'Library/Values', ())
+    put(c, key)
+    server.revision = 2
+    c.validate(server)
+    assert server.polls == 1
+    assert c.get(key) is not None
@@ -0,0 +1,77 @@
+import math
+
+import pytest
+
+from jrivermcws import columns
+from jrivermcws.columns import Columns, convert
+from jrivermcws.keys import numpy_backend
+from jrivermcws.schema import FLOAT, INTEGER, STRING
+
+
+@pytest.fixture
+def np(use_numpy):
+    return numpy_backend(use_numpy)
+
+
+def test_convert_float(np):
+    c = convert(['1.5', None, '', '2'], FLOAT, np)
+    assert [c[0], c[3]] == [1.5, 2.0]
+    assert math.isnan(c[1]) and math.isnan(c[2])
+
+
+def test_convert_integer(np):
+    assert list(convert(['3', None, '12.0', '-1'], INTEGER, np)) == [3, 0, 12, -1]
+    assert list(convert(['3', ''], INTEGER, np, missing=-1)) == [3, -1]
+
+
+def test_convert_string(np):
+    assert convert(['a', None], STRING, np) == ['a', None]
+
+
+def test_convert_invalid(np):
+    with pytest.raises(ValueError):
+        convert(['x'], INTEGER, np)
+
+
+ITEMS = [
+    {'Key': '1', 'Name': 'a', 'Duration': '60.5', 'Rating': '4'},
+    {'Key': '2', 'Name': 'b', 'Duration': '30'},
+    {'Key': '3', 'Name': 'c', 'Rating': '2', 'Genre': 'Rock'},
+]
+
+
+def test_from_items_selected_fields(np):
+    c = Columns.from_items(ITEMS, ['Key', 'Duration', 'Rating'], use_numpy=bool(np))
+    assert len(c) == 3
+    assert c.fields == ['Key', 'Duration', 'Rating']
+    d = c.to_dict()
+    assert d['Key'] == [1, 2, 3]
+    assert d['Rating'] == [4, 0, 2]
+    assert d['Duration'][:2] == [60.5, 30.0]
+    assert math.isnan(d['Duration'][2])
+
+
+def test_from_items_all_fields_and_types(np):
+    c = Columns.from_items(ITEMS, types={'Name': STRING, 'Key': FLOAT}, use_numpy=bool(np))
+    assert set(c) == {'Key', 'Name', 'Duration', 'Rating', 'Genre'}
+    assert c['Name'] == ['a', 'b', 'c']
+    assert c['Genre'] == [None, None, 'Rock']
+    assert list(c['Key']) == [1.0, 2.0, 3.0]
+    assert 'Rating' in c
+
+
+def test_to_dataframe():
+    pandas = pytest.importorskip('pandas')
+    df = Columns.from_items(ITEMS, ['Name', 'Rating']).to_dataframe()
+    assert isinstance(df, pandas.DataFrame)
+    assert list(df['Rating']) == [4, 0, 2]
+
+
+def test_select_sends_fields(library, np):
+    c = columns.select(['Key', 'Duration'], query='[Artist]=[Artist 1]', client=library, use_numpy=bool(np))
+    cat, cmd, kwargs = library.sent[-1]
+    assert (cat, cmd) == ('Files', 'Search')
+    assert kwargs == {'Query': '[Artist]=[Artist 1]', 'Fields': 'Key,Duration'}
+    assert len(c) == 50
+    assert list(c['Key'][:3]) == [1, 2, 3]
+    assert list(c['Duration'][:2]) == [101.5, 102.5]
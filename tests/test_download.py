@@ -0,0 +1,123 @@
+import pytest
+
+from jrivermcws import download
+from jrivermcws.models import Result, build_response
+
+DATA = {1: b'0123456789' * 10, 2: b'abcdefghij' * 5, 3: b''}
+
+
+class FakeClient(object):
+    """Serves File/GetFile from DATA, honouring Range headers unless ranges is false"""
+
+    def __init__(self, ranges=True, truncate=None):
+        self.ranges = ranges
+        self.truncate = truncate
+        self.sent = []
+
+    def request(self, cmd, cat=None, File=None, stream=False, headers=None, **kwargs):
+        self.sent.append((File, headers))
+        data = DATA[File]
+        status = 200
+        if headers and self.ranges:
+            offset = int(headers['Range'][len('bytes='):-1])
+            if offset >= len(data):
+                return Result(cat, cmd, build_response('http://fake/', 416, 'Range Not Satisfiable', {}, None, b''))
+            data = data[offset:]
+            status = 206
+        body = data if self.truncate is None else data[:self.truncate]
+        resp = build_response('http://fake/', status, 'OK', {'Content-Length': str(len(data))}, None, body)
+        return Result(cat, cmd, resp)
+
+
+def test_download(tmp_path):
+    path = str(tmp_path / 'f')
+    seen = []
+    r = download.download(1, path, FakeClient(), chunk_size=16, progress=lambda f, n: seen.append(n))
+    assert r.ok
+    assert (r.bytes, r.resumed_from) == (100, 0)
+    assert open(path, 'rb').read() == DATA[1]
+    assert sum(seen) == 100 and max(seen) == 16
+    assert not (tmp_path / 'f.part').exists()
+
+
+def test_resume_with_range(tmp_path):
+    path = str(tmp_path / 'f')
+    (tmp_path / 'f.part').write_bytes(DATA[1][:30])
+    c = FakeClient()
+    r = download.download(1, path, c)
+    assert c.sent == [(1, {'Range': 'bytes=30-'})]
+    assert (r.bytes, r.resumed_from) == (70, 30)
+    assert open(path, 'rb').read() == DATA[1]
+
+
+def test_resume_ignored_by_server_starts_over(tmp_path):
+    path = str(tmp_path / 'f')
+    (tmp_path / 'f.part').write_bytes(b'stale')
+    r = download.download(1, path, FakeClient(ranges=False))
+    assert (r.bytes, r.resumed_from) == (100, 0)
+    assert open(path, 'rb').read() == DATA[1]
+
+
+def test_resume_of_complete_partial(tmp_path):
+    path = str(tmp_path / 'f')
+    (tmp_path / 'f.part').write_bytes(DATA[2])
+    r = download.download(2, path, FakeClient())
+    assert (r.bytes, r.resumed_from) == (0, 50)
+    assert open(path, 'rb').read() == DATA[2]
+
+
+def test_no_resume(tmp_path):
+    path = str(tmp_path / 'f')
+    (tmp_path / 'f.part').write_bytes(b'stale')
+    c = FakeClient()
+    download.download(1, path, c, resume=False)
+    assert c.sent == [(1, None)]
+    assert open(path, 'rb').read() == DATA[1]
+
+
+def test_interrupted_download_keeps_partial(tmp_path):
+    path = str(tmp_path / 'f')
+    with pytest.raises(IOError):
+        download.download(1, path, FakeClient(truncate=40))
+    assert (tmp_path / 'f.part').read_bytes() == DATA[1][:40]
+    r = download.download(1, path, FakeClient())
+    assert r.resumed_from == 40
+    assert open(path, 'rb').read() == DATA[1]
+
+
+def test_download_many(tmp_path):
+    items = [(k, str(tmp_path / str(k))) for k in DATA]
+    totals = []
+    r = download.download_many(items, FakeClient(), workers=2, chunk_size=8, progress=lambda total, rate: totals.append(total))
+    assert r
+    assert [x.file for x in r.results] == [1, 2, 3]
+    assert r.bytes == 150
+    assert max(totals) == 150
+    assert r.progress_error is None
+    for (k, path) in items:
+        assert open(path, 'rb').read() == DATA[k]
+
+
+def test_download_many_records_malformed_items(tmp_path):
+    r = download.download_many([(1, str(tmp_path / '1')), None, (2,)], FakeClient(), workers=2)
+    assert [x.ok for x in r] == [True, False, False]
+    assert isinstance(r.results[1].error, TypeError)
+    assert isinstance(r.results[2].error, ValueError)
+    assert r.results[2].file == (2,)
+
+
+def test_download_many_progress_error(tmp_path):
+    calls = []
+
+    def progress(total, rate):
+        calls.append(total)
+        1 / 0
+
+    items = [(k, str(tmp_path / str(k))) for k in (1, 2)]
+    r = download.download_many(items, FakeClient(), workers=2, chunk_size=8, progress=progress)
+    assert r
+    # At most one call per worker can start before the first one fails
+    assert 1 <= len(calls) <= 2
+    assert isinstance(r.progress_error, ZeroDivisionError)
+    for (k, path) in items:
+        assert open(path, 'rb').read() == DATA[k]
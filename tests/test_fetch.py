@@ -0,0 +1,83 @@
+import pytest
+
+from jrivermcws import fetch
+from jrivermcws.fetch import Partition, fetch_library, key_partitions
+from jrivermcws.keys import FileKeys
+
+
+def search(first, last):
+    return Partition('Search', 'Files', {'Query': '[Key]={}-{}'.format(first, last)})
+
+
+def test_key_partitions():
+    parts = key_partitions([5, 1, 2, 3, 4, 3, 9], 3)
+    assert [p.params['Query'] for p in parts] == ['[Key]=1-2', '[Key]=3-4', '[Key]=5-9']
+    assert key_partitions([], 4) == []
+    assert len(key_partitions([1, 2], 8)) == 2
+
+
+def test_runs():
+    library = FileKeys([1, 2, 3, 5, 6, 8, 9])
+    assert fetch._runs(library, {2, 3, 8}) == [(2, 3), (8, 8)]
+    # Keys missing from the library do not break a run
+    assert fetch._runs(library, {3, 5, 9}) == [(3, 5), (9, 9)]
+    assert fetch._runs(library, set()) == []
+
+
+def test_fetch_library(library):
+    f = fetch_library(client=library, workers=3)
+    assert len(f.table) == 50
+    # 12 ranges asked for, of ceil(50 / 12) = 5 keys each
+    assert f.partitions == 10
+    assert (f.duplicates, f.recovered) == (0, 0)
+    assert f.table.column('Key') == [str(k) for k in range(1, 51)]
+    assert f.table[0]['Name'] == 'Track 1'
+
+
+def test_overlapping_partitions_are_merged_once(library):
+    f = fetch_library([search(1, 30), search(20, 50), search(45, 50)], client=library)
+    assert len(f.table) == 50
+    assert f.duplicates == 11 + 6
+    assert f.table.column('Key') == [str(k) for k in range(1, 51)]
+
+
+def test_gaps_are_recovered_as_ranges(library):
+    f = fetch_library([search(1, 10), search(21, 30)], client=library)
+    assert len(f.table) == 50
+    assert f.recovered == 30
+    queries = [kwargs['Query'] for (cat, cmd, kwargs) in library.sent if cmd == 'Search' and kwargs.get('Query')]
+    assert sorted(queries[2:]) == ['[Key]=11-20', '[Key]=31-50']
+    assert not [s for s in library.sent if s[1] == 'GetInfo']
+
+
+def test_files_missed_by_range_searches_fetched_one_by_one(library):
+    library.unsearchable = {15, 40}
+    f = fetch_library([search(1, 10), search(21, 30)], client=library)
+    assert len(f.table) == 50
+    assert f.recovered == 30
+    assert sorted(kwargs['File'] for (cat, cmd, kwargs) in library.sent if cmd == 'GetInfo') == [15, 40]
+    assert f.table[14]['Key'] == '15'
+
+
+def test_no_check(library):
+    f = fetch_library([search(1, 10)], client=library, check=False)
+    assert len(f.table) == 10
+    assert f.recovered == 0
+
+
+def test_fields(library):
+    f = fetch_library([search(1, 50)], client=library, fields=['Name'])
+    assert f.table.fields == ['Key', 'Name']
+    assert all(kwargs.get('Fields') == 'Key,Name' for (cat, cmd, kwargs) in library.sent if kwargs.get('Query'))
+
+
+def test_failed_partition_raises(library):
+    library.remove(50)
+    with pytest.raises(IOError):
+        fetch_library([Partition('GetInfo', 'File', {'File': 50})], client=library, check=False)
+
+
+def test_parse_in_processes(library):
+    f = fetch_library(client=library, workers=2, processes=2)
+    assert len(f.table) == 50
+    assert f.table.column('Key') == [str(k) for k in range(1, 51)]
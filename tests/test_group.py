@@ -0,0 +1,107 @@
+from urllib.parse import urlsplit, parse_qs
+
+import pytest
+from requests.adapters import BaseAdapter
+from requests.exceptions import ConnectionError
+
+import jrivermcws as jr
+from jrivermcws.exceptions import BadCommandException, MissingParametersException
+from jrivermcws.group import ServerGroup
+from jrivermcws.models import build_response
+from conftest import items_xml
+
+
+class RecordingAdapter(BaseAdapter):
+    """Answers every request with OK, or refuses the connection when down"""
+
+    def __init__(self, down=False):
+        super(RecordingAdapter, self).__init__()
+        self.down = down
+        self.sent = []
+
+    def send(self, request, **kwargs):
+        url = urlsplit(request.url)
+        self.sent.append((url.path.split('/MCWS/v1/')[1], {k: v[0] for (k, v) in parse_qs(url.query).items()}))
+        if self.down:
+            raise ConnectionError('refused')
+        return build_response(request.url, 200, 'OK', {}, 'utf-8', items_xml([]).encode())
+
+    def close(self):
+        pass
+
+
+def client(name, down=False):
+    c = jr.Client('http://{}/MCWS/v1/'.format(name), token='t', retries=0)
+    c.adapter = RecordingAdapter(down)
+    c.session.mount('http://', c.adapter)
+    return c
+
+
+@pytest.fixture
+def group():
+    g = ServerGroup([client('bar'), client('lobby'), client('patio')])
+    yield g
+    g.close()
+
+
+def test_broadcast_with_parameters(group):
+    r = group.request('MCC', Command='MCC_VOLUME_UP', Parameter=5)
+    assert r
+    assert len(r) == 3
+    for c in group.clients:
+        assert c.adapter.sent == [('Control/MCC', {'Command': '10018', 'Parameter': '5', 'Token': 't'})]
+
+
+def test_variants(group):
+    r = group.request('Volume', cat='Playback', Level=0.5, variants={'http://lobby/MCWS/v1/': {'Level': 0.2}})
+    assert r
+    levels = [c.adapter.sent[0][1]['Level'] for c in group.clients]
+    assert levels == ['0.5', '0.2', '0.5']
+
+
+def test_invalid_command_raises_before_sending(group):
+    with pytest.raises(BadCommandException):
+        group.request('Bogus')
+    with pytest.raises(MissingParametersException):
+        group.request('MCC', Parameter=5)
+    assert all(c.adapter.sent == [] for c in group.clients)
+
+
+def test_failures_are_per_server():
+    down = client('down', down=True)
+    g = ServerGroup([client('up'), down])
+    try:
+        r = g.request('Stop', cat='Playback')
+    finally:
+        g.close()
+    assert not r
+    assert [reply.server for reply in r.succeeded] == ['http://up/MCWS/v1/']
+    assert [reply.server for reply in r.failed] == ['http://down/MCWS/v1/']
+    assert r['http://up/MCWS/v1/'].ok
+    assert r[1] is r.failed[0]
+    with pytest.raises(KeyError):
+        r['http://elsewhere/MCWS/v1/']
+
+
+def test_exceptions_are_recorded():
+    class Broken(jr.Client):
+        def request(self, *args, **kwargs):
+            raise RuntimeError('broken')
+
+    g = ServerGroup([client('up'), Broken('http://broken/MCWS/v1/', token='t')])
+    try:
+        r = g.request('Stop', cat='Playback')
+    finally:
+        g.close()
+    assert [reply.ok for reply in r] == [True, False]
+    assert isinstance(r[1].error, RuntimeError)
+    assert r[1].result is None
+
+
+def test_close_leaves_given_clients_open(monkeypatch):
+    closed = []
+    monkeypatch.setattr(jr.Client, 'close', lambda self: closed.append(self.server))
+    given = client('given')
+    g = ServerGroup([given, 'http://created/MCWS/v1/'])
+    g.close()
+    assert closed == ['http://created/MCWS/v1/']
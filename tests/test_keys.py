@@ -0,0 +1,58 @@
+import pytest
+
+from jrivermcws import keys
+from jrivermcws.keys import FileKeys, decode
+
+
+def test_decode(use_numpy):
+    k = decode(b'1;3;1;10;20;30', use_numpy)
+    assert k.tolist() == [10, 20, 30]
+    assert k.position == 1
+    assert len(k) == 3
+    assert k[0] == 10
+    assert 20 in k
+
+
+def test_decode_string_and_whitespace(use_numpy):
+    assert decode('1;2;-1;5;6\r\n', use_numpy).tolist() == [5, 6]
+
+
+def test_decode_empty(use_numpy):
+    k = decode(b'1;0;-1;', use_numpy)
+    assert len(k) == 0
+    assert k.position == -1
+
+
+def test_decode_other_versions(use_numpy):
+    assert decode(b'2;2;0;7;8', use_numpy).tolist() == [7, 8]
+
+
+@pytest.mark.parametrize('body', [b'', b'<Response Status="OK"/>', b'x;1;0;5', b'1;3;0;1;2', b'1;2;0;1;'])
+def test_decode_errors(body, use_numpy):
+    with pytest.raises(ValueError):
+        decode(body, use_numpy)
+
+
+def test_set_operations(use_numpy):
+    a = FileKeys([5, 1, 3, 3, 9], use_numpy=use_numpy)
+    b = FileKeys([3, 4, 5], use_numpy=use_numpy)
+    assert (a & b).tolist() == [3, 5]
+    assert (a | b).tolist() == [1, 3, 4, 5, 9]
+    assert (a - b).tolist() == [1, 9]
+    assert (a ^ b).tolist() == [1, 4, 9]
+    assert a.unique().tolist() == [1, 3, 5, 9]
+    assert (a - []).tolist() == [1, 3, 5, 9]
+    assert (a & {9, 100}).tolist() == [9]
+
+
+def test_join_and_equality(use_numpy):
+    a = FileKeys([3, 1, 2], use_numpy=use_numpy)
+    assert a.join() == '3,1,2'
+    assert a == FileKeys([3, 1, 2], use_numpy=use_numpy)
+    assert a != FileKeys([1, 2, 3], use_numpy=use_numpy)
+
+
+def test_search_sends_serialize(library):
+    k = keys.search('', client=library)
+    assert k.tolist() == list(range(1, 51))
+    assert library.sent[-1][2]['Action'] == 'Serialize'
@@ -0,0 +1,58 @@
+from jrivermcws.models import Result, build_response
+
+ALIVE = (b'<?xml version="1.0" encoding="UTF-8" standalone="yes" ?>\n'
+         b'<Response Status="OK">\n'
+         b'<Item Name="RuntimeGUID">{1234}</Item>\n'
+         b'<Item Name="LibraryVersion">24</Item>\n'
+         b'<Item Name="AccessKey"/>\n'
+         b'</Response>\n')
+
+
+def result(body, cmd='Alive', cat='System'):
+    return Result(cat, cmd, build_response('http://fake/', 200, 'OK', {}, 'utf-8', body))
+
+
+def test_parsed_items():
+    r = result(ALIVE)
+    p = r.parsed()
+    assert p['RuntimeGUID'] == '{1234}'
+    assert p['LibraryVersion'] == '24'
+    assert p['AccessKey'] is None
+
+
+def test_parse_once():
+    r = result(ALIVE)
+    assert r.xml() is r.xml()
+    assert r.json() is r.json()
+    assert r.parsed() is r.parsed()
+    assert r.parsed(collapse_singles=False)['LibraryVersion'] == ['24']
+
+
+def test_response_body_kept_after_parsing():
+    response = build_response('http://fake/', 200, 'OK', {}, 'utf-8', ALIVE)
+    r = Result('System', 'Alive', response)
+    r.parsed()
+    assert response.content == ALIVE
+    assert r.response.content == ALIVE
+    assert r.text == ALIVE.decode()
+
+
+def test_release():
+    response = build_response('http://fake/', 200, 'OK', {}, 'utf-8', ALIVE)
+    r = Result('System', 'Alive', response)
+    r.release()
+    assert response.content == ALIVE
+    assert r.response.content == b''
+    assert r
+    assert r.parsed()['LibraryVersion'] == '24'
+    assert 'RuntimeGUID' in r.text
+
+
+def test_iter_items_after_parsing():
+    body = (b'<MPL Version="2.0" Title="MCWS - Files">'
+            b'<Item><Field Name="Key">1</Field><Field Name="Name">a</Field></Item>'
+            b'<Item><Field Name="Key">2</Field><Field Name="Name">b</Field></Item>'
+            b'</MPL>')
+    r = result(body, 'Search', 'Files')
+    assert r.xml().tag == 'MPL'
+    assert [dict(i) for i in r.iter_items()] == [{'Key': '1', 'Name': 'a'}, {'Key': '2', 'Name': 'b'}]
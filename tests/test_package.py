@@ -0,0 +1,28 @@
+import subprocess
+import sys
+
+import pytest
+
+import jrivermcws as jr
+
+
+@pytest.mark.parametrize('name', ['api', 'models', 'mcc', 'cmds', 'exceptions', 'search'])
+def test_submodules_are_attributes(name):
+    assert getattr(jr, name).__name__ == 'jrivermcws.' + name
+
+
+def test_api_names():
+    from jrivermcws import api
+    assert jr.Client is api.Client
+    assert jr.request is api.request
+
+
+def test_unknown_attribute():
+    with pytest.raises(AttributeError):
+        jr.no_such_module
+
+
+def test_import_does_not_load_requests():
+    code = 'import sys, jrivermcws; print("requests" in sys.modules)'
+    out = subprocess.check_output([sys.executable, '-c', code])
+    assert out.strip() == b'False'
@@ -0,0 +1,37 @@
+import pytest
+
+from jrivermcws import cmds, schema
+from jrivermcws.api import resolve_command
+from jrivermcws.exceptions import InvalidParameterException, UnknownParameterException
+
+
+def schema_of(cmd, cat):
+    return schema.of(cmds.lookup(cmd, cat)[1])
+
+
+def test_parse_param_types():
+    s = schema_of('PlayByIndex', 'Playback')
+    assert s.params['Index'].type == schema.INTEGER
+    assert schema_of('Volume', 'Playback').params['Level'].type == schema.FLOAT
+    assert schema_of('Pause', 'Playback').params['State'].type == schema.INTEGER
+
+
+def test_key_lists_are_not_integers():
+    assert schema_of('PlayByKey', 'Playback').params['Key'].type == schema.STRING
+    assert resolve_command('PlayByKey', 'Playback', Key='1,2,3')[2] == {'Key': '1,2,3'}
+    assert resolve_command('PlayByKey', 'Playback', Key=42)[2] == {'Key': 42}
+
+
+def test_canonical_names():
+    assert resolve_command('playbykey', 'playback', key=1)[2] == {'Key': 1}
+
+
+def test_invalid_integer():
+    with pytest.raises(InvalidParameterException):
+        resolve_command('PlayByIndex', 'Playback', Index='first')
+
+
+def test_unknown_parameter_hint():
+    with pytest.raises(UnknownParameterException) as e:
+        resolve_command('PlayByIndex', 'Playback', Indx=1)
+    assert "did you mean 'Index'" in str(e.value)
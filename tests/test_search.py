@@ -0,0 +1,86 @@
+import pytest
+
+from jrivermcws.exceptions import BadSearchException
+from jrivermcws.search import SearchIndex, parse
+
+FILES = [
+    {'Key': '1', 'Name': 'Paranoid Android', 'Album Artist (auto)': 'Radiohead', 'Genre': 'Rock; Alternative', 'Rating': '5'},
+    {'Key': '2', 'Name': 'Karma Police', 'Album Artist (auto)': 'Radiohead', 'Genre': 'Rock', 'Rating': '3'},
+    {'Key': '3', 'Name': 'So What', 'Album Artist (auto)': 'Miles Davis', 'Genre': 'Jazz', 'Rating': '4'},
+    {'Key': '4', 'Name': 'Blue in Green', 'Album Artist (auto)': 'Miles Davis', 'Genre': 'Jazz', 'Rating': ''},
+    {'Key': '5', 'Name': 'Android Dreams', 'Album Artist (auto)': 'Another Artist', 'Genre': '', 'Rating': '1'},
+]
+
+
+@pytest.fixture
+def index():
+    return SearchIndex(FILES)
+
+
+def keys(index, query):
+    return [row['Key'] for row in index.search(query)]
+
+
+def test_parse_comparisons():
+    tree, modifiers = parse('[Artist]=[Radiohead] -[Genre]=rock')
+    assert tree == ('and', [('cmp', 'Artist', ('exact', 'Radiohead')), ('not', ('cmp', 'Genre', ('word', 'rock')))])
+    assert modifiers == {}
+
+
+def test_parse_modifiers():
+    tree, modifiers = parse('[Genre]=[Jazz] ~sort=[Rating]-d ~n=10')
+    assert tree == ('cmp', 'Genre', ('exact', 'Jazz'))
+    assert modifiers == {'sort': '[Rating]-d', 'n': '10'}
+
+
+def test_parse_bracketed_modifier_with_spaces():
+    tree, modifiers = parse('~sort=[Album Artist (auto)],[Date Imported]-d [Genre]=[Rock]')
+    assert tree == ('cmp', 'Genre', ('exact', 'Rock'))
+    assert modifiers == {'sort': '[Album Artist (auto)],[Date Imported]-d'}
+
+
+def test_parse_only_modifier():
+    tree, modifiers = parse('~sort=[Album Artist (auto)]')
+    assert tree == ('all',)
+    assert modifiers == {'sort': '[Album Artist (auto)]'}
+
+
+@pytest.mark.parametrize('query', ['[Artist', '[Artist]=[Radio', '~sort', '~sort=[Album Artist', '(a b', 'a )'])
+def test_parse_errors(query):
+    with pytest.raises(BadSearchException):
+        parse(query)
+
+
+def test_exact_and_list_values(index):
+    assert keys(index, '[Album Artist (auto)]=[radiohead]') == ['1', '2']
+    assert keys(index, '[Genre]=[Alternative]') == ['1']
+    assert keys(index, '[Genre]=') == ['5']
+
+
+def test_words_and_phrases(index):
+    assert keys(index, 'android') == ['1', '5']
+    assert keys(index, '[Name]="paranoid android"') == ['1']
+    assert keys(index, '[Name]=andr') == ['1', '5']
+
+
+def test_numeric(index):
+    assert keys(index, '[Rating]=>3') == ['1', '3']
+    assert keys(index, '[Rating]=<3') == ['5']
+    assert keys(index, '[Rating]=3-4') == ['2', '3']
+
+
+def test_boolean(index):
+    assert keys(index, '[Genre]=[Jazz] or [Rating]=5') == ['1', '3', '4']
+    assert keys(index, '-[Genre]=[Rock] [Rating]=>0') == ['3', '5']
+    assert keys(index, '([Genre]=[Jazz] or [Genre]=[Rock]) -[Rating]=>3') == ['2', '4']
+
+
+def test_sort_by_bracketed_field_with_spaces(index):
+    assert keys(index, '~sort=[Album Artist (auto)]') == ['5', '3', '4', '1', '2']
+    assert keys(index, '[Rating]=>0 ~sort=[Rating]-d ~n=2') == ['1', '3']
+
+
+def test_values(index):
+    assert index.values('Genre') == ['Alternative', 'Jazz', 'Rock']
+    assert index.values('Name', '[Genre]=[Jazz]') == ['Blue in Green', 'So What']
+    assert index.count('[Album Artist (auto)]=[Miles Davis]') == 2
@@ -0,0 +1,94 @@
+import pytest
+
+from jrivermcws.sync import LibraryMirror
+from conftest import response
+
+
+def test_first_sync_is_full(tmp_path, library):
+    m = LibraryMirror(str(tmp_path / 'lib.db'), client=library)
+    s = m.sync()
+    assert s.full
+    assert s.changed == 50
+    assert len(m) == 50
+    assert m[7]['Name'] == 'Track 7'
+    assert m.revision == str(library.revision)
+
+
+def test_unchanged_revision_sends_nothing_else(tmp_path, library):
+    m = LibraryMirror(str(tmp_path / 'lib.db'), client=library)
+    m.sync()
+    library.sent = []
+    s = m.sync()
+    assert (s.changed, s.deleted, s.full) == (0, 0, False)
+    assert [(cat, cmd) for (cat, cmd, _) in library.sent] == [('Library', 'GetRevision')]
+
+
+def test_incremental_sync_fetches_only_changes(tmp_path, library):
+    m = LibraryMirror(str(tmp_path / 'lib.db'), client=library)
+    m.sync()
+    library.modify(3, Name='Renamed')
+    library.add(51, Name='New')
+    library.remove(10)
+    library.sent = []
+
+    s = m.sync()
+    assert not s.full
+    assert (s.changed, s.deleted) == (2, 1)
+    assert m[3]['Name'] == 'Renamed'
+    assert m[51]['Name'] == 'New'
+    assert 10 not in m
+    assert len(m) == 50
+    assert m.revision == str(library.revision)
+    # The listing only asks for the signature fields
+    listing = [kw for (cat, cmd, kw) in library.sent if cmd == 'Search']
+    assert listing == [{'Query': '', 'Fields': 'Key,Date Modified'}]
+    fetched = sorted(int(kw['File']) for (cat, cmd, kw) in library.sent if cmd == 'GetInfo')
+    assert fetched == [3, 51]
+
+
+def test_many_changes_fall_back_to_full(tmp_path, library):
+    m = LibraryMirror(str(tmp_path / 'lib.db'), client=library)
+    m.sync()
+    for k in range(1, 21):
+        library.modify(k, Name='x')
+    s = m.sync()
+    assert s.full
+    assert m[20]['Name'] == 'x'
+
+
+class BrokenSearch(object):
+    """Passes everything but Files/Search to a library, which answers with a non MPL body"""
+
+    def __init__(self, library):
+        self.library = library
+
+    def request(self, cmd, cat=None, **kwargs):
+        if cmd == 'Search' and kwargs.get('Action') != 'Serialize':
+            return response(cat, cmd, '<Response Status="OK"/>')
+        return self.library.request(cmd, cat, **kwargs)
+
+
+def test_unrecognized_listing_keeps_revision(tmp_path, library):
+    path = str(tmp_path / 'lib.db')
+    LibraryMirror(path, client=library).sync()
+    old = str(library.revision)
+    library.modify(1, Name='changed')
+
+    m = LibraryMirror(path, client=BrokenSearch(library))
+    with pytest.raises(IOError):
+        m.sync()
+    assert m.revision == old
+    assert m[1]['Name'] == 'Track 1'
+
+
+def test_unrecognized_full_download_keeps_mirror(tmp_path, library):
+    path = str(tmp_path / 'lib.db')
+    LibraryMirror(path, client=library).sync()
+    old = str(library.revision)
+    library.modify(1, Name='changed')
+
+    m = LibraryMirror(path, client=BrokenSearch(library))
+    with pytest.raises(IOError):
+        m.sync(full=True)
+    assert m.revision == old
+    assert len(m) == 50
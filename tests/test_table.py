@@ -0,0 +1,55 @@
+import pytest
+
+from jrivermcws.table import Table
+
+ITEMS = [
+    {'Key': '1', 'Name': 'a', 'Artist': 'X'},
+    {'Key': '2', 'Artist': 'X'},
+    {'Key': '3', 'Name': 'c', 'Genre': 'Rock'},
+]
+
+
+@pytest.fixture
+def table():
+    return Table.from_items(ITEMS)
+
+
+def test_append_pads_missing_fields(table):
+    assert len(table) == 3
+    assert table.fields == ['Key', 'Name', 'Artist', 'Genre']
+    assert table.column('Name') == ['a', None, 'c']
+    assert table.column('Genre') == [None, None, 'Rock']
+    assert all(len(c) == 3 for c in table.columns.values())
+
+
+def test_append_shares_repeated_values():
+    t = Table()
+    t.append({'Artist': ''.join(['X', 'Y'])})
+    t.append({'Artist': ''.join(['X', 'Y'])})
+    assert t.column('Artist')[0] is t.column('Artist')[1]
+
+
+def test_row_mapping(table):
+    row = table[1]
+    assert dict(row) == {'Key': '2', 'Artist': 'X'}
+    assert len(row) == 2
+    assert list(row) == ['Key', 'Artist']
+    assert 'Name' not in row
+    assert row.get('Name') is None
+    assert row == {'Key': '2', 'Artist': 'X'}
+
+
+def test_row_missing_fields(table):
+    with pytest.raises(KeyError):
+        table[1]['Name']
+    with pytest.raises(KeyError):
+        table[0]['Rating']
+
+
+def test_indexing(table):
+    assert table[-1]['Key'] == '3'
+    assert table[-3]['Key'] == '1'
+    for index in (3, -4):
+        with pytest.raises(IndexError):
+            table[index]
+    assert [row['Key'] for row in table] == ['1', '2', '3']
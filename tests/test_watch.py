@@ -0,0 +1,109 @@
+import threading
+
+import pytest
+from requests.exceptions import ConnectionError
+
+from jrivermcws.watch import PlaybackWatcher, TrackChanged, StateChanged, VolumeChanged, PLAYING, PAUSED
+from conftest import items_xml, response
+
+
+def info(key=1, state=PLAYING, volume='0.5', position=None, duration=None):
+    d = {'FileKey': str(key), 'State': str(state), 'Volume': volume}
+    if position is not None:
+        d['PositionMS'] = str(position)
+    if duration is not None:
+        d['DurationMS'] = str(duration)
+    return d
+
+
+class ScriptedClient(object):
+    """Answers Playback/Info with each snapshot in turn, raising those that are exceptions"""
+
+    def __init__(self, snapshots):
+        self.snapshots = list(snapshots)
+        self.polls = 0
+        self.done = threading.Event()
+
+    def request(self, cmd, cat=None, **kwargs):
+        self.polls += 1
+        if not self.snapshots:
+            self.done.set()
+            return response(cat, cmd, items_xml([]), 500)
+        s = self.snapshots.pop(0)
+        if isinstance(s, Exception):
+            raise s
+        return response(cat, cmd, items_xml(s.items()))
+
+
+@pytest.fixture
+def watcher():
+    return PlaybackWatcher(ScriptedClient([]), zone=0, fast_interval=0.25, play_interval=2.0, idle_interval=5.0,
+                           boundary_window=3.0)
+
+
+def test_interval(watcher):
+    assert watcher.interval() == 5.0
+    assert watcher.interval(info(state=PAUSED)) == 5.0
+    assert watcher.interval(info()) == 2.0
+    assert watcher.interval(info(position=0, duration=0)) == 2.0
+    # 4 seconds left, 1 second before the boundary window
+    assert watcher.interval(info(position=6000, duration=10000)) == 1.0
+    assert watcher.interval(info(position=9000, duration=10000)) == 0.25
+    assert watcher.interval(info(position=0, duration=600000)) == 2.0
+
+
+def test_diff(watcher):
+    assert watcher.diff(None, info()) == []
+    assert watcher.diff(info(), info()) == []
+    new = info(key=2, state=PAUSED, volume='0.75')
+    events = watcher.diff(info(), new)
+    assert events == [TrackChanged(0, 1, 2, new), StateChanged(0, PLAYING, PAUSED, new), VolumeChanged(0, 0.5, 0.75, new)]
+
+
+def test_callbacks_by_type(watcher):
+    seen = []
+    watcher.add_callback(seen.append, TrackChanged)
+    watcher.add_callback(lambda e: seen.append(type(e).__name__))
+    watcher.client.snapshots = [info(), info(key=2, volume='0.6')]
+    watcher.poll()
+    watcher.poll()
+    assert [type(e) for e in seen] == [TrackChanged, str, str]
+    assert seen[1:] == ['TrackChanged', 'VolumeChanged']
+
+
+def fast(client):
+    return PlaybackWatcher(client, fast_interval=0.001, play_interval=0.001, idle_interval=0.001)
+
+
+def test_failing_callback_does_not_stop_the_others():
+    w = fast(ScriptedClient([info(key=k) for k in range(1, 4)]))
+    seen = []
+    w.add_callback(lambda e: 1 / 0)
+    w.add_callback(seen.append, TrackChanged)
+    w.start()
+    assert w.client.done.wait(5)
+    w.stop()
+    assert [e.new for e in seen] == [2, 3]
+    assert isinstance(w.error, ZeroDivisionError)
+
+
+def test_failed_polls_back_off_and_continue():
+    client = ScriptedClient([info(key=1), ConnectionError('restarting'), info(key=2)])
+    w = PlaybackWatcher(client, fast_interval=0.001, play_interval=0.001, idle_interval=0.05)
+    seen = []
+    w.add_callback(seen.append)
+    w.start()
+    assert client.done.wait(5)
+    w.stop()
+    assert [e.new for e in seen] == [2]
+    assert isinstance(w.error, ConnectionError)
+
+
+def test_iteration_skips_failed_polls():
+    w = fast(ScriptedClient([info(key=1), ConnectionError('restarting'), info(key=2), info(key=2, state=PAUSED)]))
+    events = iter(w)
+    assert isinstance(next(events), TrackChanged)
+    assert isinstance(next(events), StateChanged)
+    w.stop()
+    assert isinstance(w.error, ConnectionError)
+    assert list(events) == []
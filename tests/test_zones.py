@@ -0,0 +1,73 @@
+import gc
+
+import pytest
+
+from jrivermcws import zones
+from conftest import items_xml, response
+
+
+class ZoneServer(object):
+    """Answers Playback/Zones and per zone Playback/Info, failing for zones in down"""
+
+    server = 'http://zones/MCWS/v1/'
+    pool_size = 4
+
+    def __init__(self, down=()):
+        self.down = set(down)
+        self.sent = []
+
+    def request(self, cmd, cat=None, **kwargs):
+        self.sent.append((cmd, kwargs))
+        if cmd == 'Zones':
+            return response(cat, cmd, items_xml([('NumberZones', 2), ('CurrentZoneID', 0), ('ZoneID0', 0), ('ZoneName0', 'Player'),
+                                                 ('ZoneID1', 5), ('ZoneName1', 'Kitchen')]))
+        if kwargs.get('Zone') in self.down:
+            raise ConnectionError('zone down')
+        return response(cat, cmd, items_xml([('ZoneID', kwargs.get('Zone')), ('Level', '0.5')]))
+
+
+def test_snapshot():
+    server = ZoneServer()
+    z = zones.Zones(server)
+    try:
+        s = z.snapshot(volume=True)
+    finally:
+        z.close()
+    assert s
+    assert len(s) == 2
+    assert s.current == 0
+    assert s['Kitchen'].info['ZoneID'] == '5'
+    assert s[5].volume['Level'] == '0.5'
+
+
+def test_snapshot_failures_are_per_zone():
+    z = zones.Zones(ZoneServer(down=[5]))
+    try:
+        s = z.snapshot()
+    finally:
+        z.close()
+    assert not s
+    assert [st.zone.name for st in s.failed] == ['Kitchen']
+    assert isinstance(s['Kitchen'].error, ConnectionError)
+    assert s['Player'].ok
+
+
+def test_zone_list_is_cached():
+    server = ZoneServer()
+    z = zones.Zones(server, ttl=60)
+    z.id_of('Kitchen')
+    z.id_of('Player')
+    assert [cmd for (cmd, _) in server.sent] == ['Zones']
+    with pytest.raises(KeyError):
+        z.id_of('Garage')
+    assert [cmd for (cmd, _) in server.sent] == ['Zones', 'Zones']
+
+
+def test_shared_zones_do_not_keep_clients_alive():
+    server = ZoneServer()
+    assert len(zones.snapshot(server)) == 2
+    assert server in zones._shared
+    count = len(zones._shared)
+    del server
+    gc.collect()
+    assert len(zones._shared) == count - 1